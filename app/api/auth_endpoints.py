@@ -1,31 +1,38 @@
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.auth.auth import create_access_token
-from app.schemas.user import UserCreate, UserResponse, Token
-from app.db.crud.user_crud import get_user_by_username, create_user, verify_user_password
-
-router = APIRouter()
-
-@router.post("/register", response_model=UserResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    # Check if the user already exists
-    existing_user = get_user_by_username(db, user.username)
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Username already registered")
-    
-    # Create a new user
-    new_user = create_user(db, user.username, user.password)
-    return new_user
-
-@router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    # Retrieve user and verify password
-    user = get_user_by_username(db, form_data.username)
-    if not user or not verify_user_password(form_data.password, user.password_hash):
-        raise HTTPException(status_code=401, detail="Invalid username or password")
-    
-    # Create JWT token with the user's ID as subject
-    access_token = create_access_token(data={"sub": str(user.id)})
-    return {"access_token": access_token, "token_type": "bearer"}
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
+from app.auth.auth import create_access_token
+from app.schemas.user import UserCreate, UserResponse, Token
+from app.auth.passwords import PasswordHashingBusy
+from app.db.crud.user_crud import aget_user_by_username, acreate_user, aauthenticate_user
+
+router = APIRouter()
+
+@router.post("/register", response_model=UserResponse)
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    # Check if the user already exists
+    existing_user = await aget_user_by_username(db, user.username)
+    if existing_user:
+        raise HTTPException(status_code=400, detail="Username already registered")
+    
+    # Create a new user
+    try:
+        new_user = await acreate_user(db, user.username, user.password)
+    except PasswordHashingBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    return new_user
+
+@router.post("/login", response_model=Token)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    # Retrieve user and verify password (upgrading its hash if the hashing parameters changed)
+    try:
+        user = await aauthenticate_user(db, form_data.username, form_data.password)
+    except PasswordHashingBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid username or password")
+    
+    # Create JWT token with the user's ID as subject
+    access_token = create_access_token(data={"sub": str(user.id)})
+    return {"access_token": access_token, "token_type": "bearer"}
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.library_search import LibrarySearchRequest, LibrarySearchResponse
+from app.core.database import get_async_db
+from app.db.crud.book_crud import alist_books_for_search
+from app.services.library_search import search_library
+from app.auth.auth import get_current_user  # Enforce authentication
+
+library_search_router = APIRouter()
+
+MAX_TOP_K = 50
+
+@library_search_router.post("/library", response_model=LibrarySearchResponse)
+async def search_user_library(
+    request: LibrarySearchRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)  # Authentication required
+):
+    """Search passages across the current user's books, combining keyword (BM25) and
+       embedding similarity rankings. Each result carries its book and page.
+    """
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty.")
+    if not 1 <= request.top_k <= MAX_TOP_K:
+        raise HTTPException(status_code=400, detail=f"top_k must be between 1 and {MAX_TOP_K}.")
+
+    books = await alist_books_for_search(db, current_user.id, request.book_ids)
+    if not books:
+        raise HTTPException(status_code=404, detail="No books found.")
+
+    try:
+        results = await run_in_threadpool(search_library, books, request.query, request.top_k)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {"query": request.query, "results": results}
@@ -0,0 +1,23 @@
+from fastapi import APIRouter, HTTPException, Depends
+from app.core.model_registry import model_registry
+from app.llm.client import metrics as llm_metrics
+from app.services.history_writer import history_writer
+from app.services.search_clients import search_stats
+from app.auth.auth import get_current_user, principal_cache  # Enforce authentication
+
+metrics_router = APIRouter()
+
+@metrics_router.get("/")
+async def get_metrics(current_user = Depends(get_current_user)):
+    """Per-endpoint LLM call metrics, search client, principal cache, history writer and shared
+       model stats (admin only).
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required.")
+    return {
+        "llm": llm_metrics.snapshot(),
+        "search": search_stats(),
+        "auth": principal_cache.stats(),
+        "history": history_writer.stats(),
+        "models": model_registry.stats(),
+    }
@@ -1,84 +1,108 @@
-import os
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.llm.embeddings import create_embeddings
-from app.db.crud.pdf_crud import (
-    save_pdf_file,
-    extract_text_from_pdf,
-    save_embeddings_to_file,
-    store_pdf_in_db,
-    list_uploaded_books,
-)
-from app.models.book import Book
-from app.auth.auth import get_current_user
-
-pdf_router = APIRouter()
-
-# Define central data storage paths
-DATA_FOLDER = "data"
-BOOKS_FOLDER = os.path.join(DATA_FOLDER, "books")
-EMBEDDINGS_FOLDER = os.path.join(DATA_FOLDER, "embeddings")
-MAX_FILE_SIZE = 200 * 1024 * 1024  # 200MB
-
-# Ensure directories exist
-os.makedirs(BOOKS_FOLDER, exist_ok=True)
-os.makedirs(EMBEDDINGS_FOLDER, exist_ok=True)
-
-@pdf_router.post("/upload_pdf")
-def upload_pdf(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
-):
-    """Upload and save a PDF file, then store embeddings in both SQLite and a file with a 200MB limit.
-       The book is associated with the current user.
-    """
-
-    file_path = os.path.join(BOOKS_FOLDER, file.filename)
-    embedding_path = os.path.join(EMBEDDINGS_FOLDER, f"{file.filename}.pkl")
-
-    # Check file size before processing
-    file.file.seek(0, os.SEEK_END)  # Move to end of file
-    file_size = file.file.tell()  # Get file size in bytes
-    file.file.seek(0)  # Reset cursor
-
-    if file_size > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="File too large. Maximum allowed size is 200MB.")
-
-    # Check if the book already exists for this user
-    existing_book = db.query(Book).filter(
-        Book.filename == file.filename,
-        Book.user_id == current_user.id
-    ).first()
-    if existing_book:
-        raise HTTPException(status_code=400, detail="This book is already uploaded.")
-
-    # Save the uploaded file in chunks (memory efficient)
-    save_pdf_file(file, file_path)
-
-    # Extract text safely
-    text = extract_text_from_pdf(file_path)
-
-    # Generate OpenAI embeddings (pass text as a string)
-    embeddings = create_embeddings(text)
-
-    # Save embeddings as a file
-    save_embeddings_to_file(embedding_path, embeddings)
-
-    # Store the book & embeddings in the database, associating with current user
-    new_book = store_pdf_in_db(db, file.filename, text, embeddings, current_user.id)
-
-    return {
-        "message": "PDF uploaded and stored successfully!",
-        "book_id": new_book.id,
-        "embedding_file": embedding_path,
-    }
-
-@pdf_router.get("/list_books")
-def list_books_endpoint(
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
-):
-    """List all previously uploaded and embedded books for the current user."""
-    return list_uploaded_books(db, current_user.id)
+import os
+from typing import List
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
+from app.db.crud.pdf_crud import save_pdf_file, extract_text_from_pdf
+from app.db.crud.book_crud import afind_book_id_by_filename, alist_books
+from app.db.crud.job_crud import new_job_id, acreate_job, aget_job, alist_jobs, ahas_active_job, arequest_cancel, job_to_dict
+from app.schemas.job import IngestionJobResponse
+from app.services.ingestion import submit_ingestion
+from app.auth.auth import get_current_user
+
+pdf_router = APIRouter()
+
+# Define central data storage paths
+DATA_FOLDER = "data"
+BOOKS_FOLDER = os.path.join(DATA_FOLDER, "books")
+EMBEDDINGS_FOLDER = os.path.join(DATA_FOLDER, "embeddings")
+MAX_FILE_SIZE = 200 * 1024 * 1024  # 200MB
+
+# Ensure directories exist
+os.makedirs(BOOKS_FOLDER, exist_ok=True)
+os.makedirs(EMBEDDINGS_FOLDER, exist_ok=True)
+
+@pdf_router.post("/upload_pdf", status_code=202)
+async def upload_pdf(
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """Upload and save a PDF file (200MB limit) and queue it for background processing.
+       Text extraction, embedding and storage run in a worker; poll the returned job ID
+       for status. The book is associated with the current user.
+    """
+
+    # Stored under the job ID, not the upload's name: users may upload different files with the
+    # same name, and cancelling one job deletes its file
+    job_id = new_job_id()
+    file_path = os.path.join(BOOKS_FOLDER, f"{job_id}.pdf")
+
+    # Check file size before processing
+    file.file.seek(0, os.SEEK_END)  # Move to end of file
+    file_size = file.file.tell()  # Get file size in bytes
+    file.file.seek(0)  # Reset cursor
+
+    if file_size > MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail="File too large. Maximum allowed size is 200MB.")
+
+    # Check if the book already exists or is already being processed for this user
+    if await afind_book_id_by_filename(db, file.filename, current_user.id):
+        raise HTTPException(status_code=400, detail="This book is already uploaded.")
+    if await ahas_active_job(db, current_user.id, file.filename):
+        raise HTTPException(status_code=400, detail="This book is already being processed.")
+
+    # Save the uploaded file in chunks (memory efficient); the upload stream is closed after the request
+    await run_in_threadpool(save_pdf_file, file, file_path)
+
+    job = await acreate_job(db, current_user.id, file.filename, file_path, job_id=job_id)
+    submit_ingestion(job.id)
+
+    return {
+        "message": "PDF uploaded and queued for processing.",
+        "job_id": job.id,
+        "status": job.status,
+    }
+
+@pdf_router.get("/jobs", response_model=List[IngestionJobResponse])
+async def list_jobs_endpoint(
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """List the current user's recent ingestion jobs."""
+    return [job_to_dict(job) for job in await alist_jobs(db, current_user.id)]
+
+@pdf_router.get("/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_job_status(
+    job_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """Get the status, progress and per-stage timings of an ingestion job."""
+    job = await aget_job(db, job_id, user_id=current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job_to_dict(job)
+
+@pdf_router.post("/jobs/{job_id}/cancel", response_model=IngestionJobResponse)
+async def cancel_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """Cancel a queued or running ingestion job. Running jobs stop at the next stage boundary."""
+    job = await aget_job(db, job_id, user_id=current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if job.status not in ("queued", "running"):
+        raise HTTPException(status_code=400, detail=f"Job is already {job.status}.")
+    return job_to_dict(await arequest_cancel(db, job))
+
+@pdf_router.get("/list_books")
+async def list_books_endpoint(
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """List all previously uploaded and embedded books for the current user."""
+    return await alist_books(db, current_user.id)
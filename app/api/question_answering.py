@@ -1,61 +1,120 @@
-import pickle
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from app.schemas.question_answering import QuestionRequest, AnswerResponse
-from app.core.database import get_db
-from app.db.crud.question_answering_crud import get_book_by_id, get_latest_book, log_query, get_query_history
-from app.llm.question_answering_llm import generate_answer
-from app.auth.auth import get_current_user  # Enforce authentication
-
-qa_router = APIRouter()
-
-@qa_router.post("/ask", response_model=AnswerResponse)
-def ask_question(
-    request: QuestionRequest, 
-    db: Session = Depends(get_db), 
-    book_id: int = Query(None, description="ID of the book to use"),
-    current_user = Depends(get_current_user)  # Authentication required
-):
-    """Answer questions using a selected or the latest stored book for the current user."""
-    
-    # Retrieve the book scoped to the current user
-    if book_id:
-        book = get_book_by_id(db, book_id, user_id=current_user.id)
-    else:
-        book = get_latest_book(db, user_id=current_user.id)
-
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found.")
-
-    # Generate answer using the LLM based on the book's text
-    try:
-        answer_text = generate_answer(book.text_content, request.question)
-    except RuntimeError as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-    # Log the query (recording the interaction in history)
-    log_query(db, book.id, request.question, answer_text)
-
-    return {"question": request.question, "answer": answer_text}
-
-
-@qa_router.get("/history")
-def get_query_history_endpoint(
-    db: Session = Depends(get_db), 
-    book_id: int = Query(None, description="Filter history by book ID"),
-    current_user = Depends(get_current_user)  # Authentication required
-):
-    """Retrieve past queries and responses for the current user."""
-    history = get_query_history(db, book_id, user_id=current_user.id)
-
-    if not history:
-        return {"message": "No query history found."}
-
-    return [
-        {
-            "query": h.query, 
-            "response": h.response, 
-            "timestamp": h.created_at, 
-            "book_id": h.book_id
-        } for h in history
-    ]
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.schemas.question_answering import QuestionRequest, AnswerResponse
+from app.core.database import get_async_db
+from app.db.crud.question_answering_crud import log_query, aget_query_history
+from app.db.crud.book_crud import aget_book_by_id, aget_latest_book, aget_book_text
+from app.llm.question_answering_llm import generate_answer, stream_answer
+from app.core.streaming import sse_event, sse_response, ndjson_response
+from app.llm.vector_index import search_book
+from app.auth.auth import get_current_user  # Enforce authentication
+
+qa_router = APIRouter()
+
+@qa_router.post("/ask", response_model=AnswerResponse)
+async def ask_question(
+    request: QuestionRequest, 
+    db: AsyncSession = Depends(get_async_db), 
+    book_id: int = Query(None, description="ID of the book to use"),
+    current_user = Depends(get_current_user)  # Authentication required
+):
+    """Answer questions using a selected or the latest stored book for the current user."""
+    
+    # Retrieve the book scoped to the current user
+    if book_id:
+        book = await aget_book_by_id(db, book_id, user_id=current_user.id)
+    else:
+        book = await aget_latest_book(db, user_id=current_user.id)
+
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found.")
+
+    # Retrieve the most relevant chunks and answer from as many of those as fit the context budget
+    try:
+        passages = await run_in_threadpool(search_book, book, request.question, settings.CONTEXT_RETRIEVAL_TOP_K)
+        # The book's text is only needed when there are no passages to fall back from
+        book_text = None if passages else await aget_book_text(db, book.id)
+        answer_text = await generate_answer(book_text, request.question, passages=passages, book_id=book.id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # Log the query (queued for the history writer, so the response doesn't wait for a commit)
+    log_query(book.id, request.question, answer_text, user_id=current_user.id)
+
+    return {"question": request.question, "answer": answer_text}
+
+@qa_router.post("/ask/stream")
+async def ask_question_stream(
+    request: QuestionRequest,
+    db: AsyncSession = Depends(get_async_db),
+    book_id: int = Query(None, description="ID of the book to use"),
+    current_user = Depends(get_current_user)  # Authentication required
+):
+    """Answer a question like /ask, streaming the answer as Server-Sent Events.
+       Emits {"delta": ...} events, then a "done" event with the full answer.
+    """
+    if book_id:
+        book = await aget_book_by_id(db, book_id, user_id=current_user.id)
+    else:
+        book = await aget_latest_book(db, user_id=current_user.id)
+
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found.")
+
+    # Retrieval happens before streaming starts so its errors are still plain HTTP errors
+    try:
+        passages = await run_in_threadpool(search_book, book, request.question, settings.CONTEXT_RETRIEVAL_TOP_K)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    book_id, user_id = book.id, current_user.id
+    book_text = None if passages else await aget_book_text(db, book_id)
+
+    async def events():
+        parts = []
+        try:
+            async for delta in stream_answer(book_text, request.question, passages=passages, book_id=book_id):
+                parts.append(delta)
+                yield sse_event({"delta": delta})
+        except RuntimeError as e:
+            yield sse_event({"detail": str(e)}, event="error")
+            return
+        answer_text = "".join(parts).strip()
+        # Log the complete answer once the stream has finished
+        log_query(book_id, request.question, answer_text, user_id=user_id)
+        yield sse_event({"question": request.question, "answer": answer_text}, event="done")
+
+    return sse_response(events())
+
+
+MAX_HISTORY_PAGE_SIZE = 200
+
+@qa_router.get("/history")
+async def get_query_history_endpoint(
+    db: AsyncSession = Depends(get_async_db), 
+    book_id: int = Query(None, description="Filter history by book ID"),
+    limit: int = Query(50, ge=1, le=MAX_HISTORY_PAGE_SIZE, description="Entries per page"),
+    cursor: str = Query(None, description="X-Next-Cursor of the previous page"),
+    current_user = Depends(get_current_user)  # Authentication required
+):
+    """Retrieve past queries and responses for the current user, newest first, one page at a time.
+       Entries are streamed as JSON lines; the X-Next-Cursor header, if present, fetches the next page.
+    """
+    try:
+        history, next_cursor = await aget_query_history(
+            db, book_id, user_id=current_user.id, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    entries = (
+        {
+            "query": h.query, 
+            "response": h.response, 
+            "timestamp": h.created_at, 
+            "book_id": h.book_id
+        } for h in history
+    )
+    return ndjson_response(entries, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
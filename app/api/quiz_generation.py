@@ -1,31 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from app.schemas.quiz import QuizRequest, QuizResponse
-from app.core.database import get_db
-from app.db.crud.quiz_crud import get_book_by_id
-from app.llm.quiz_llm import generate_quiz_questions
-from app.auth.auth import get_current_user  # Enforce authentication
-
-quiz_router = APIRouter()
-
-@quiz_router.post("/generate", response_model=QuizResponse)
-def generate_quiz(
-    request: QuizRequest, 
-    book_id: int, 
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)  # Authentication required
-):
-    """Generate quiz questions and answers from a previously uploaded book for the current user."""
-    
-    # Retrieve the book scoped to the current user
-    book = get_book_by_id(db, book_id, user_id=current_user.id)
-    if not book:
-        raise HTTPException(status_code=400, detail="Book not found.")
-
-    # Generate quiz using LLM
-    try:
-        quiz_questions = generate_quiz_questions(book.text_content, request.num_questions)
-    except RuntimeError as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-    return {"quiz_questions": quiz_questions}
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.quiz import QuizRequest, QuizResponse
+from app.core.database import get_async_db
+from app.db.crud.book_crud import aget_book_by_id, aget_book_text
+from app.llm.quiz_llm import generate_quiz_questions
+from app.llm.vector_index import central_chunks
+from app.auth.auth import get_current_user  # Enforce authentication
+
+quiz_router = APIRouter()
+
+@quiz_router.post("/generate", response_model=QuizResponse)
+async def generate_quiz(
+    request: QuizRequest, 
+    book_id: int, 
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)  # Authentication required
+):
+    """Generate quiz questions and answers from a previously uploaded book for the current user."""
+    
+    # Retrieve the book scoped to the current user
+    book = await aget_book_by_id(db, book_id, user_id=current_user.id)
+    if not book:
+        raise HTTPException(status_code=400, detail="Book not found.")
+
+    # Generate quiz using LLM, from the passages most representative of the book
+    try:
+        passages = await run_in_threadpool(central_chunks, book)
+        # The book's text is only needed when there are no passages to fall back from
+        book_text = None if passages else await aget_book_text(db, book.id)
+        quiz_questions = await generate_quiz_questions(
+            book_text, request.num_questions, book_id=book.id, passages=passages
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {"quiz_questions": quiz_questions}
@@ -1,31 +1,98 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from sqlalchemy.orm import Session
-from app.schemas.study_plan import StudyPlanRequest, StudyPlanResponse
-from app.core.database import get_db
-from app.db.crud.study_plan_crud import get_book_by_id
-from app.llm.study_plan_llm import generate_study_plan_from_text
-from app.auth.auth import get_current_user  # Enforce authentication
-
-study_router = APIRouter()
-
-@study_router.post("/generate", response_model=StudyPlanResponse)
-def generate_study_plan(
-    request: StudyPlanRequest, 
-    book_id: int, 
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)  # Authentication required
-):
-    """Generate a study plan from a stored book for the current user."""
-    
-    # Retrieve the book scoped to the current user
-    book = get_book_by_id(db, book_id, user_id=current_user.id)
-    if not book:
-        raise HTTPException(status_code=400, detail="Book not found.")
-
-    # Generate the study plan using the book's text and the provided duration
-    try:
-        study_plan = generate_study_plan_from_text(book.text_content, request.duration)
-    except RuntimeError as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-    return {"study_plan": study_plan}
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.study_plan import StudyPlanRequest, StudyPlanResponse
+from app.core.database import get_async_db
+from app.db.crud.artifact_crud import aget_artifact, aget_or_create_artifact, asave_artifact_detached
+from app.db.crud.book_crud import aget_book_by_id, aget_book_text
+from app.db.crud.question_answering_crud import log_query
+from app.llm.study_plan_llm import generate_study_plan_from_text, stream_study_plan_from_text
+from app.llm.vector_index import central_chunks
+from app.core.streaming import sse_event, sse_response
+from app.auth.auth import get_current_user  # Enforce authentication
+
+study_router = APIRouter()
+
+@study_router.post("/generate", response_model=StudyPlanResponse)
+async def generate_study_plan(
+    request: StudyPlanRequest, 
+    book_id: int, 
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)  # Authentication required
+):
+    """Generate a study plan from a stored book for the current user."""
+    
+    # Retrieve the book scoped to the current user
+    book = await aget_book_by_id(db, book_id, user_id=current_user.id)
+    if not book:
+        raise HTTPException(status_code=400, detail="Book not found.")
+
+    # Generate the study plan from the book's most representative passages (or, if the book has
+    # no index, its text) and the provided duration, once per book and duration
+    async def build():
+        passages = await run_in_threadpool(central_chunks, book)
+        book_text = None if passages else await aget_book_text(db, book.id)
+        return await generate_study_plan_from_text(book_text, request.duration, book_id=book.id, passages=passages)
+
+    try:
+        study_plan = await aget_or_create_artifact(
+            db, book.id, "study_plan", build, params={"duration": request.duration}
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {"study_plan": study_plan}
+
+@study_router.post("/generate/stream")
+async def generate_study_plan_stream(
+    request: StudyPlanRequest,
+    book_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)  # Authentication required
+):
+    """Generate a study plan like /generate, streaming it as Server-Sent Events.
+       Emits {"delta": ...} events, then a "done" event with the full plan.
+       A plan already stored for this book and duration is sent as a single delta.
+    """
+    book = await aget_book_by_id(db, book_id, user_id=current_user.id)
+    if not book:
+        raise HTTPException(status_code=400, detail="Book not found.")
+
+    params = {"duration": request.duration}
+    book_id, user_id = book.id, current_user.id
+    stored_plan = await aget_artifact(db, book_id, "study_plan", params)
+    passages, book_text = None, None
+    if stored_plan is None:
+        try:
+            passages = await run_in_threadpool(central_chunks, book)
+        except RuntimeError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        if not passages:
+            book_text = await aget_book_text(db, book_id)
+
+    async def events():
+        if stored_plan is not None:
+            yield sse_event({"delta": stored_plan})
+            log_query(
+                book_id, f"Study plan ({request.duration} days)", stored_plan, user_id=user_id
+            )
+            yield sse_event({"study_plan": stored_plan}, event="done")
+            return
+        parts = []
+        try:
+            async for delta in stream_study_plan_from_text(
+                book_text, request.duration, book_id=book_id, passages=passages
+            ):
+                parts.append(delta)
+                yield sse_event({"delta": delta})
+        except RuntimeError as e:
+            yield sse_event({"detail": str(e)}, event="error")
+            return
+        study_plan = "".join(parts).strip()
+        await asave_artifact_detached(book_id, "study_plan", study_plan, params)
+        log_query(
+            book_id, f"Study plan ({request.duration} days)", study_plan, user_id=user_id
+        )
+        yield sse_event({"study_plan": study_plan}, event="done")
+
+    return sse_response(events())
@@ -1,71 +1,154 @@
-import os
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
-from sqlalchemy.orm import Session
-from app.schemas.syllabus import SyllabusTopicsResponse, SyllabusSummaryRequest, SyllabusSummaryResponse
-from app.core.database import get_db
-from app.db.crud.syllabus_crud import save_syllabus_file, extract_syllabus_text, get_book_by_id, get_latest_book
-from app.llm.syllabus_llm import extract_syllabus_topics, generate_syllabus_summary
-from app.auth.auth import get_current_user
-
-syllabus_router = APIRouter()
-
-@syllabus_router.post("/upload_syllabus", response_model=SyllabusTopicsResponse)
-def upload_syllabus_and_extract_topics(
-    file: UploadFile = File(...),
-    current_user = Depends(get_current_user)
-):
-    """Upload a syllabus PDF and extract topics.
-       If the same syllabus is uploaded again by the current user, reuse the existing file.
-    """
-    SYLLABUS_FOLDER = os.path.join("data", "syllabus")
-    os.makedirs(SYLLABUS_FOLDER, exist_ok=True)
-    
-    # Create a unique filename for the current user
-    unique_filename = f"{current_user.id}_{file.filename}"
-    syllabus_path = os.path.join(SYLLABUS_FOLDER, unique_filename)
-    
-    # If the file already exists, reuse it
-    if not os.path.exists(syllabus_path):
-        try:
-            syllabus_path = save_syllabus_file(file, unique_filename)
-        except RuntimeError as e:
-            raise HTTPException(status_code=500, detail=str(e))
-    
-    try:
-        syllabus_text = extract_syllabus_text(syllabus_path)
-    except RuntimeError as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    
-    try:
-        topics = extract_syllabus_topics(syllabus_text)
-    except RuntimeError as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    
-    return {"topics": topics}
-
-@syllabus_router.post("/summarize", response_model=SyllabusSummaryResponse)
-def summarize_syllabus(
-    request: SyllabusSummaryRequest,
-    db: Session = Depends(get_db),
-    book_id: int = Query(None, description="ID of the book to use for summarization"),
-    current_user = Depends(get_current_user)
-):
-    """Generate a summary for syllabus topics based on a selected book for the current user."""
-    if not request.topics:
-        raise HTTPException(status_code=400, detail="No topics provided for summarization.")
-    
-    # Retrieve the book for the current user
-    if book_id:
-        book = get_book_by_id(db, book_id, user_id=current_user.id)
-    else:
-        book = get_latest_book(db, user_id=current_user.id)
-    
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found.")
-    
-    try:
-        summaries = generate_syllabus_summary(book.text_content, request.topics, request.summary_type)
-    except RuntimeError as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    
-    return {"summaries": summaries}
+import os
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.schemas.syllabus import SyllabusTopicsResponse, SyllabusSummaryRequest, SyllabusSummaryResponse
+from app.core.database import get_async_db
+from app.db.crud.syllabus_crud import save_syllabus_file, extract_syllabus_text
+from app.db.crud.book_crud import aget_book_by_id, aget_latest_book, aget_book_text
+from app.db.crud.question_answering_crud import log_query
+from app.llm.syllabus_llm import extract_syllabus_topics, generate_syllabus_summary, stream_syllabus_summary
+from app.llm.vector_index import search_book_many
+from app.core.streaming import sse_event, sse_response
+from app.auth.auth import get_current_user
+
+syllabus_router = APIRouter()
+
+SUMMARY_MODES = ("concurrent", "batched")
+
+@syllabus_router.post("/upload_syllabus", response_model=SyllabusTopicsResponse)
+async def upload_syllabus_and_extract_topics(
+    file: UploadFile = File(...),
+    current_user = Depends(get_current_user)
+):
+    """Upload a syllabus PDF and extract topics.
+       If the same syllabus is uploaded again by the current user, reuse the existing file.
+    """
+    SYLLABUS_FOLDER = os.path.join("data", "syllabus")
+    os.makedirs(SYLLABUS_FOLDER, exist_ok=True)
+    
+    # Create a unique filename for the current user
+    unique_filename = f"{current_user.id}_{file.filename}"
+    syllabus_path = os.path.join(SYLLABUS_FOLDER, unique_filename)
+    
+    # If the file already exists, reuse it
+    if not os.path.exists(syllabus_path):
+        try:
+            syllabus_path = await run_in_threadpool(save_syllabus_file, file, unique_filename)
+        except RuntimeError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    try:
+        syllabus_text = await run_in_threadpool(extract_syllabus_text, syllabus_path)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    try:
+        topics = await extract_syllabus_topics(syllabus_text)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {"topics": topics}
+
+@syllabus_router.post("/summarize", response_model=SyllabusSummaryResponse)
+async def summarize_syllabus(
+    request: SyllabusSummaryRequest,
+    db: AsyncSession = Depends(get_async_db),
+    book_id: int = Query(None, description="ID of the book to use for summarization"),
+    current_user = Depends(get_current_user)
+):
+    """Generate a summary for syllabus topics based on a selected book for the current user."""
+    if not request.topics:
+        raise HTTPException(status_code=400, detail="No topics provided for summarization.")
+    
+    # Retrieve the book for the current user
+    if book_id:
+        book = await aget_book_by_id(db, book_id, user_id=current_user.id)
+    else:
+        book = await aget_latest_book(db, user_id=current_user.id)
+    
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found.")
+    
+    if request.mode not in SUMMARY_MODES:
+        raise HTTPException(status_code=400, detail="mode must be 'concurrent' or 'batched'.")
+
+    # Summarise each topic from the passages of the book most relevant to it
+    try:
+        topic_passages = await run_in_threadpool(
+            search_book_many, book, request.topics, settings.CONTEXT_RETRIEVAL_TOP_K
+        )
+        # The book's text is only needed for topics without passages to fall back from
+        book_text = None if all(topic_passages) else await aget_book_text(db, book.id)
+        summaries = await generate_syllabus_summary(
+            book_text, request.topics, request.summary_type,
+            topic_passages=topic_passages, mode=request.mode, book_id=book.id
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {"summaries": summaries}
+
+@syllabus_router.post("/summarize/stream")
+async def summarize_syllabus_stream(
+    request: SyllabusSummaryRequest,
+    db: AsyncSession = Depends(get_async_db),
+    book_id: int = Query(None, description="ID of the book to use for summarization"),
+    current_user = Depends(get_current_user)
+):
+    """Summarize syllabus topics like /summarize, streaming the summaries as Server-Sent Events.
+       Emits {"index": ..., "topic": ..., "delta": ...} events, index being the topic's position
+       in the request, then a "done" event with all summaries. Topics are streamed one request
+       each, so only mode "concurrent" is accepted.
+    """
+    if not request.topics:
+        raise HTTPException(status_code=400, detail="No topics provided for summarization.")
+    if request.mode not in SUMMARY_MODES:
+        raise HTTPException(status_code=400, detail="mode must be 'concurrent' or 'batched'.")
+    if request.mode == "batched":
+        raise HTTPException(status_code=400, detail="Streaming summarises one topic per request; use mode 'concurrent'.")
+
+    if book_id:
+        book = await aget_book_by_id(db, book_id, user_id=current_user.id)
+    else:
+        book = await aget_latest_book(db, user_id=current_user.id)
+
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found.")
+
+    try:
+        topic_passages = await run_in_threadpool(
+            search_book_many, book, request.topics, settings.CONTEXT_RETRIEVAL_TOP_K
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    book_id, user_id = book.id, current_user.id
+    book_text = None if all(topic_passages) else await aget_book_text(db, book_id)
+
+    async def events():
+        # Kept by position: a request may list the same topic twice
+        parts = [[] for _ in request.topics]
+        try:
+            async for index, delta in stream_syllabus_summary(
+                book_text, request.topics, request.summary_type, topic_passages, book_id=book_id
+            ):
+                parts[index].append(delta)
+                yield sse_event({"index": index, "topic": request.topics[index], "delta": delta})
+        except RuntimeError as e:
+            yield sse_event({"detail": str(e)}, event="error")
+            return
+        summaries = [
+            {"topic": topic, "summary": "".join(topic_parts).strip()}
+            for topic, topic_parts in zip(request.topics, parts)
+        ]
+        log_query(
+            book_id,
+            f"Syllabus summary ({request.summary_type}): " + "; ".join(request.topics),
+            "\n\n".join(f"{s['topic']}\n{s['summary']}" for s in summaries),
+            user_id=user_id,
+        )
+        yield sse_event({"summaries": summaries}, event="done")
+
+    return sse_response(events())
@@ -1,49 +1,124 @@
-import os
-from datetime import datetime, timedelta
-from typing import Optional
-import jwt
-from fastapi import HTTPException, Depends
-from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.models.user import User
-
-# Use a secret key from your environment or a default for development
-SECRET_KEY = os.getenv("JWT_SECRET_KEY", "mysecretkey")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60
-
-# OAuth2 scheme expects the token URL for login (we'll use /api/auth/login)
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    """
-    Create a JWT token containing the provided data.
-    """
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta if expires_delta else timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    """
-    Dependency that extracts the user from the JWT token.
-    Raises an HTTPException if token is invalid or user not found.
-    """
-    credentials_exception = HTTPException(
-        status_code=401,
-        detail="Could not validate credentials",
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except Exception as e:
-        raise credentials_exception from e
-
-    user = db.query(User).filter(User.id == int(user_id)).first()
-    if user is None:
-        raise credentials_exception
-    return user
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict, Counter
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+import jwt
+from fastapi import HTTPException, Depends
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.user import User
+
+# Use a secret key from your environment or a default for development
+SECRET_KEY = os.getenv("JWT_SECRET_KEY", "mysecretkey")
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = 60
+
+# OAuth2 scheme expects the token URL for login (we'll use /api/auth/login)
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    """
+    Create a JWT token containing the provided data.
+    """
+    to_encode = data.copy()
+    expire = datetime.utcnow() + (expires_delta if expires_delta else timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+class Principal(NamedTuple):
+    """The authenticated user as request handlers see it: the user's columns, detached from any session."""
+    id: int
+    username: str
+    role: str
+
+class PrincipalCache:
+    """Principals resolved from tokens, keyed by token ID (jti), so repeated requests with the same
+       token skip the users table. Entries live for at most ttl_seconds and never past the token's
+       expiry; the least recently used are evicted past max_entries.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # token ID -> (expires_at, principal)
+        self._stats = Counter()
+
+    def get(self, token_id: str):
+        with self._lock:
+            entry = self._entries.get(token_id)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[token_id]
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(token_id)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def put(self, token_id: str, principal: Principal, token_expires_at: float):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[token_id] = (min(time.time() + self.ttl_seconds, token_expires_at), principal)
+            self._entries.move_to_end(token_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached principal of a user, e.g. after the user row changed."""
+        with self._lock:
+            for token_id in [key for key, (_, principal) in self._entries.items() if principal.id == user_id]:
+                del self._entries[token_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
+
+principal_cache = PrincipalCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+
+def invalidate_user(user_id: int):
+    """Forget cached principals of a user so the next request reads the user row again."""
+    principal_cache.invalidate_user(user_id)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    invalidate_user(target.id)
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    """
+    Dependency that extracts the user from the JWT token.
+    Raises an HTTPException if token is invalid or user not found.
+    The user is read from the database only when the token's principal isn't cached.
+    """
+    credentials_exception = HTTPException(
+        status_code=401,
+        detail="Could not validate credentials",
+    )
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        user_id: str = payload.get("sub")
+        if user_id is None:
+            raise credentials_exception
+    except Exception as e:
+        raise credentials_exception from e
+
+    token_id = payload.get("jti") or token  # Tokens issued before jti was added are keyed by themselves
+    principal = principal_cache.get(token_id)
+    if principal is not None:
+        return principal
+
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, int(user_id))
+        if user is None:
+            raise credentials_exception
+        principal = Principal(id=user.id, username=user.username, role=user.role)
+    principal_cache.put(token_id, principal, float(payload["exp"]))
+    return principal
@@ -0,0 +1,80 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from passlib.context import CryptContext
+from app.core.config import settings
+
+# Password hashing. bcrypt is CPU-bound and deliberately slow, so on the request path it runs
+# in a small dedicated process pool instead of the shared threadpool, where a burst of logins
+# would hold the GIL and starve every other endpoint. At most PASSWORD_HASH_MAX_PENDING hashes
+# may be running or queued; further requests are turned away (503) instead of queueing without
+# bound. Hashes made with a different cost factor are replaced on the next successful login.
+
+# min_rounds/max_rounds make needs_update() flag hashes whose cost differs from BCRYPT_ROUNDS
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+class PasswordHashingBusy(RuntimeError):
+    """Raised when too many password hashes are already running or queued."""
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+
+def _get_pool():
+    """Process pool used for password hashing, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked, like the PDF extraction pool: a forked child could inherit a
+            # lock held by one of the server's threads
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_PROCESSES or None, mp_context=multiprocessing.get_context("spawn")
+            )
+    return _pool
+
+def shutdown_password_pool():
+    """Terminate the hashing worker processes, if any were started."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def _hash(password: str) -> str:
+    """Hash of a password; runs in a worker process."""
+    return pwd_context.hash(password)
+
+def _verify_and_update(password: str, password_hash: str):
+    """(matches, new hash or None); runs in a worker process."""
+    return pwd_context.verify_and_update(password, password_hash)
+
+async def _run(func, *args):
+    """Run func in the hashing pool, unless PASSWORD_HASH_MAX_PENDING calls are already waiting."""
+    global _pending
+    with _pending_lock:
+        if _pending >= settings.PASSWORD_HASH_MAX_PENDING:
+            raise PasswordHashingBusy("Too many sign-in requests at the moment. Please retry shortly.")
+        _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_pool(), func, *args)
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+async def hash_password(password: str) -> str:
+    """Hash a password with the configured bcrypt cost."""
+    return await _run(_hash, password)
+
+async def verify_password(password: str, password_hash: str):
+    """Check a password, returning (matches, new hash); the new hash is set when the stored one
+       should be replaced because it was made with other hashing parameters.
+    """
+    return await _run(_verify_and_update, password, password_hash)
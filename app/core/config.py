@@ -1,45 +1,141 @@
-from pydantic_settings import BaseSettings
-from functools import lru_cache
-from dotenv import load_dotenv
-
-class Settings(BaseSettings):
-    """
-    Configuration settings for the Personalized Learning System.
-    Reads values from the environment using Pydantic.
-    """
-
-    # Project Settings
-    PROJECT_NAME: str = "Personalized Learning System"
-
-    # API Keys
-    OPENAI_API_KEY: str
-    GOOGLE_API_KEY: str
-    GOOGLE_CSE_ID: str
-    GOOGLE_CUSTOM_API_KEY: str
-    SERPER_API_KEY: str
-    FIRECRAWL_API_KEY: str
-
-    # LangSmith Settings
-    LANGSMITH_TRACING: bool
-    LANGSMITH_ENDPOINT: str
-    LANGSMITH_API_KEY: str
-    LANGSMITH_PROJECT: str
-
-    # Security
-    JWT_SECRET_KEY: str
-
-    # Database (Optional)
-    DATABASE_URL: str = "sqlite:///./database.db"
-
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        extra = "allow"
-
-@lru_cache
-def get_settings():
-    """Load environment variables dynamically without restarting the system."""
-    load_dotenv(override=True)
-    return Settings()
-
-settings = get_settings()
+from pydantic_settings import BaseSettings
+from functools import lru_cache
+from typing import Optional
+from dotenv import load_dotenv
+
+class Settings(BaseSettings):
+    """
+    Configuration settings for the Personalized Learning System.
+    Reads values from the environment using Pydantic.
+    """
+
+    # Project Settings
+    PROJECT_NAME: str = "Personalized Learning System"
+
+    # API Keys
+    OPENAI_API_KEY: str
+    GOOGLE_API_KEY: str
+    GOOGLE_CSE_ID: str
+    GOOGLE_CUSTOM_API_KEY: str
+    SERPER_API_KEY: str
+    FIRECRAWL_API_KEY: str
+
+    # LangSmith Settings
+    LANGSMITH_TRACING: bool
+    LANGSMITH_ENDPOINT: str
+    LANGSMITH_API_KEY: str
+    LANGSMITH_PROJECT: str
+
+    # Security
+    JWT_SECRET_KEY: str
+
+    # Users resolved from access tokens are cached in memory for this long (entries bounded)
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+
+    # Password hashing: bcrypt cost factor (existing hashes are upgraded on login), worker
+    # processes, and hashes allowed to run or wait before sign-ins get a 503
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_PROCESSES: int = 2  # 0 = one process per CPU core
+    PASSWORD_HASH_MAX_PENDING: int = 64
+
+    # Database (Optional)
+    DATABASE_URL: str = "sqlite:///./database.db"
+
+    # Database engine: pragmas for SQLite, connection pool for other databases (e.g. PostgreSQL)
+    SQLITE_BUSY_TIMEOUT_MS: int = 30000
+    SQLITE_MMAP_SIZE: int = 268435456  # 256 MB
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+
+    # Shared OpenAI client: endpoint (point at a mock server for load tests), model, timeouts,
+    # retries, connection pool size and the account's rate limits
+    OPENAI_BASE_URL: Optional[str] = None
+    LLM_MODEL: str = "gpt-4o"
+    LLM_TIMEOUT_SECONDS: float = 120.0
+    LLM_MAX_RETRIES: int = 4
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_REQUESTS_PER_MINUTE: int = 500
+    LLM_TOKENS_PER_MINUTE: int = 300000
+    EMBEDDING_REQUESTS_PER_MINUTE: int = 3000
+    EMBEDDING_TOKENS_PER_MINUTE: int = 1000000
+
+    # Response cache for chat completions (data/cache/llm_responses.sqlite3). The similarity
+    # lookup for near-identical questions is opt-in, as it costs one embedding per miss.
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL_SECONDS: int = 604800
+    LLM_CACHE_MAX_ENTRIES: int = 20000
+    LLM_CACHE_SEMANTIC: bool = False
+    LLM_CACHE_SEMANTIC_THRESHOLD: float = 0.95
+
+    # Serper/Crossref search clients: timeout, connection pool size and result cache
+    SEARCH_TIMEOUT_SECONDS: float = 15.0
+    SEARCH_MAX_CONNECTIONS: int = 20
+    SEARCH_CACHE_TTL_SECONDS: int = 3600
+    SEARCH_CACHE_MAX_ENTRIES: int = 2048
+
+    # Prompt context: tokens of book passages per request, cap on the whole prompt, passages
+    # retrieved per question, and passage token counts kept in memory
+    CONTEXT_MAX_TOKENS: int = 3000
+    PROMPT_MAX_TOKENS: int = 8000
+    CONTEXT_RETRIEVAL_TOP_K: int = 12
+    CONTEXT_TOKEN_CACHE_SIZE: int = 8192
+
+    # Book chunking: tokens per chunk, and tokens of the previous chunk repeated at the start of the next
+    CHUNK_MAX_TOKENS: int = 512
+    CHUNK_OVERLAP_TOKENS: int = 64
+
+    # Embedding pipeline: per-request budgets, parallel requests and retries
+    EMBEDDING_BATCH_MAX_TOKENS: int = 100000
+    EMBEDDING_BATCH_MAX_ITEMS: int = 256
+    EMBEDDING_MAX_CONCURRENCY: int = 4
+    EMBEDDING_MAX_RETRIES: int = 5
+
+    # Answer key generation: concurrent GPT-4o calls and the timeout for each
+    ANSWER_KEY_CONCURRENCY: int = 8
+    ANSWER_KEY_TIMEOUT_SECONDS: float = 60.0
+
+    # Syllabus summaries: concurrent requests, per-request timeout and topics per batched request
+    SYLLABUS_SUMMARY_CONCURRENCY: int = 8
+    SYLLABUS_SUMMARY_TIMEOUT_SECONDS: float = 90.0
+    SYLLABUS_SUMMARY_BATCH_SIZE: int = 5
+
+    # Query history write-behind: rows per batched insert, longest wait before a flush, and
+    # rows allowed to wait (more are dropped, e.g. while the database is unavailable)
+    HISTORY_FLUSH_BATCH_SIZE: int = 100
+    HISTORY_FLUSH_INTERVAL_SECONDS: float = 1.0
+    HISTORY_QUEUE_MAX_SIZE: int = 10000
+
+    # Background PDF ingestion workers. A queued or running job that its server process has not
+    # refreshed for INGESTION_JOB_LEASE_SECONDS (the process stopped or crashed) is taken over
+    INGESTION_WORKERS: int = 2
+    INGESTION_JOB_LEASE_SECONDS: int = 60
+    PDF_EXTRACTION_PROCESSES: int = 0  # 0 = one process per CPU core
+    OCR_WORKERS: int = 2  # Threads rendering pages for OCR; recognition itself runs one page at a time
+
+    # Shared EasyOCR/KeyBERT models: load at startup, and drop after this many idle seconds (0 = never)
+    MODEL_WARMUP: bool = False
+    MODEL_IDLE_TTL_SECONDS: int = 1800
+
+    # Book vector indexes kept loaded (embeddings are memory-mapped, chunk texts held in memory).
+    # Library search reads every book of a user per query, so keep this above the largest library.
+    VECTOR_INDEX_CACHE_SIZE: int = 256
+
+    # Content-addressed embedding cache (data/embeddings/embedding_cache.sqlite3)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 50000
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+        extra = "allow"
+
+@lru_cache
+def get_settings():
+    """Load environment variables dynamically without restarting the system."""
+    load_dotenv(override=True)
+    return Settings()
+
+settings = get_settings()
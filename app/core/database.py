@@ -1,29 +1,125 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-import os
-
-# Load the database URL from environment variables
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./database.db")
-
-# Create the database engine
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-
-# Create a session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# Define the base model
-Base = declarative_base()
-
-# Initialize the database
-def init_db():
-    from app.models import book, history, user  # Ensure all models are imported
-    Base.metadata.create_all(bind=engine)
-
-# Function to get a new session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
+
+# Load the database URL from the settings (environment or .env)
+DATABASE_URL = settings.DATABASE_URL
+
+def _engine_options(url: str) -> dict:
+    """create_engine arguments for the database's backend.
+       SQLite connections are tuned with pragmas on connect instead (see _set_sqlite_pragmas);
+       other databases get a sized connection pool that checks connections before use.
+    """
+    if make_url(url).get_backend_name() == "sqlite":
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": True,
+    }
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers run alongside a writer, and a busy timeout makes concurrent writers
+       wait for the lock instead of failing with "database is locked". synchronous=NORMAL is
+       durable in WAL mode except for the last transactions on power loss.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.close()
+
+def create_db_engine(url: str = DATABASE_URL):
+    """Create the sync engine for a database URL, tuned for its backend."""
+    db_engine = create_engine(url, **_engine_options(url))
+    if db_engine.dialect.name == "sqlite":
+        event.listen(db_engine, "connect", _set_sqlite_pragmas)
+    return db_engine
+
+# Create the database engine
+engine = create_db_engine(DATABASE_URL)
+
+# Create a session factory
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async drivers for the same database, used by the API request path. Background workers
+# (ingestion, detached logging) keep using the sync engine above.
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def async_database_url(url: str) -> str:
+    """Return the async-driver form of a sync database URL."""
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)).render_as_string(hide_password=False)
+
+def create_async_db_engine(url: str = DATABASE_URL):
+    """Create the async engine for a (sync) database URL, with the same tuning as create_db_engine."""
+    db_engine = create_async_engine(async_database_url(url), **_engine_options(url))
+    if db_engine.dialect.name == "sqlite":
+        event.listen(db_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return db_engine
+
+async_engine = create_async_db_engine(DATABASE_URL)
+
+# expire_on_commit=False: attributes of committed objects stay readable without another (awaited) load
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Define the base model
+Base = declarative_base()
+
+# Initialize the database
+def init_db():
+    from app.models import book, history, user, job, artifact  # Ensure all models are imported
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    add_missing_indexes()
+    backfill_history_user_ids()
+
+def add_missing_columns():
+    """Add nullable columns introduced after a table was first created.
+       `create_all` never alters existing tables, so older databases would otherwise miss them.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+def add_missing_indexes():
+    """Create indexes added to existing tables; like columns, `create_all` skips them."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def backfill_history_user_ids():
+    """Fill query_history.user_id, added after the table, from the owner of each row's book."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "UPDATE query_history SET user_id = "
+            "(SELECT books.user_id FROM books WHERE books.id = query_history.book_id) "
+            "WHERE user_id IS NULL AND book_id IS NOT NULL"
+        ))
+
+# Function to get a new session
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Async session for `async def` endpoints
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
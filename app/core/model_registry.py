@@ -0,0 +1,158 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from app.core.config import settings
+
+# Heavy neural models (EasyOCR, KeyBERT) are loaded once per process on first use and
+# shared by all requests. Models idle for longer than MODEL_IDLE_TTL_SECONDS are dropped
+# by a background reaper and reloaded on the next use.
+
+def _current_rss():
+    """Resident set size of this process in bytes, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+class _Entry:
+    def __init__(self, loader):
+        self.loader = loader
+        self.model = None
+        self.lock = threading.Lock()  # Serialises loading so concurrent first uses load once
+        self.in_use = 0
+        self.uses = 0
+        self.last_used = None
+        self.load_seconds = None
+        self.memory_bytes = None
+
+class ModelRegistry:
+    """Lazily initialised, thread-safe registry of process-wide models."""
+
+    def __init__(self, idle_ttl_seconds: int = 0):
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+        self._stop_reaper = threading.Event()
+
+    def register(self, name: str, loader):
+        """Register a zero-argument loader for a model; nothing is loaded yet."""
+        with self._lock:
+            self._entries[name] = _Entry(loader)
+
+    def _entry(self, name: str) -> _Entry:
+        try:
+            return self._entries[name]
+        except KeyError:
+            raise RuntimeError(f"Unknown model '{name}'.")
+
+    def _load(self, entry: _Entry):
+        with entry.lock:
+            if entry.model is None:
+                rss_before = _current_rss()
+                started = time.perf_counter()
+                model = entry.loader()
+                entry.load_seconds = round(time.perf_counter() - started, 3)
+                rss_after = _current_rss()
+                entry.memory_bytes = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+                entry.model = model
+                # Counts as a use for idle eviction, so models loaded by warm_up expire too
+                entry.last_used = time.monotonic()
+            return entry.model
+
+    def get(self, name: str):
+        """Return a loaded model, loading it on first use."""
+        entry = self._entry(name)
+        model = entry.model or self._load(entry)
+        with self._lock:
+            entry.uses += 1
+            entry.last_used = time.monotonic()
+        return model
+
+    @contextmanager
+    def use(self, name: str):
+        """Borrow a model; it will not be evicted while borrowed."""
+        entry = self._entry(name)
+        with self._lock:
+            entry.in_use += 1
+        try:
+            yield self.get(name)
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+
+    def warm_up(self, names=None):
+        """Load the given (or all registered) models now instead of on first request."""
+        for name in names or list(self._entries):
+            self._load(self._entry(name))
+
+    def evict(self, name: str) -> bool:
+        """Drop a loaded model unless it is currently borrowed."""
+        entry = self._entry(name)
+        with self._lock:
+            if entry.model is None or entry.in_use:
+                return False
+            entry.model = None
+            entry.memory_bytes = None
+            return True
+
+    def evict_idle(self):
+        """Evict models that have not been used for idle_ttl_seconds; returns their names."""
+        if self.idle_ttl_seconds <= 0:
+            return []
+        now = time.monotonic()
+        idle = [
+            name for name, entry in self._entries.items()
+            if entry.model is not None and entry.last_used is not None
+            and now - entry.last_used > self.idle_ttl_seconds
+        ]
+        return [name for name in idle if self.evict(name)]
+
+    def stats(self) -> dict:
+        """Load state, load time, approximate memory (RSS delta at load) and usage per model."""
+        now = time.monotonic()
+        return {
+            name: {
+                "loaded": entry.model is not None,
+                "in_use": entry.in_use,
+                "uses": entry.uses,
+                "load_seconds": entry.load_seconds,
+                "memory_bytes": entry.memory_bytes if entry.model is not None else None,
+                "idle_seconds": round(now - entry.last_used, 1) if entry.last_used is not None else None,
+            }
+            for name, entry in self._entries.items()
+        }
+
+    def start_idle_reaper(self, interval_seconds: float = 60.0):
+        """Start a daemon thread that periodically evicts idle models."""
+        if self.idle_ttl_seconds <= 0 or self._reaper is not None:
+            return
+        self._stop_reaper.clear()
+
+        def reap():
+            while not self._stop_reaper.wait(interval_seconds):
+                self.evict_idle()
+
+        self._reaper = threading.Thread(target=reap, name="model-reaper", daemon=True)
+        self._reaper.start()
+
+    def stop_idle_reaper(self):
+        if self._reaper is not None:
+            self._stop_reaper.set()
+            self._reaper.join(timeout=5)
+            self._reaper = None
+
+def _load_easyocr():
+    import easyocr
+    return easyocr.Reader(['en'], gpu=False)
+
+def _load_keybert():
+    from keybert import KeyBERT
+    return KeyBERT()
+
+model_registry = ModelRegistry(idle_ttl_seconds=settings.MODEL_IDLE_TTL_SECONDS)
+model_registry.register("easyocr", _load_easyocr)
+model_registry.register("keybert", _load_keybert)
@@ -0,0 +1,30 @@
+import json
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+# Server-Sent Events helpers for endpoints that forward model tokens as they arrive.
+# Each token is sent as a default "message" event with a {"delta": ...} payload, then a
+# final "done" event carries the complete result (or an "error" event the failure).
+# Listings are streamed as JSON lines (one JSON object per line) instead.
+
+def sse_event(data, event: str = None) -> str:
+    """Format one Server-Sent Event with a JSON payload."""
+    payload = json.dumps(jsonable_encoder(data), ensure_ascii=False)
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {payload}\n\n"
+
+def sse_response(events) -> StreamingResponse:
+    """Wrap an iterator of formatted events in a streaming response."""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # Stop proxies buffering the stream
+    )
+
+def ndjson_response(items, headers: dict = None) -> StreamingResponse:
+    """Stream an iterable of JSON-serialisable items as newline-delimited JSON."""
+    def lines():
+        for item in items:
+            yield json.dumps(jsonable_encoder(item), ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers=headers)
@@ -0,0 +1,75 @@
+import json
+import hashlib
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.database import AsyncSessionLocal
+from app.models.artifact import BookArtifact
+
+# Results derived from a book (keywords, study plans, ...) never change once the book is
+# uploaded, so they are computed on first request and then read back from book_artifacts.
+# Bump an artifact's version when the way it is built changes to ignore older rows.
+ARTIFACT_VERSIONS = {
+    "llm_keywords": 2,  # 2: built from central passages instead of the first 4000 characters
+    "keybert_keywords": 1,
+    "study_plan": 2,  # 2: built from central passages instead of the first 3000 characters
+}
+
+def params_hash(params: dict = None) -> str:
+    """Stable hash of the parameters an artifact was built with."""
+    return hashlib.sha256(json.dumps(params or {}, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _artifact_filter(book_id: int, artifact_type: str, params: dict = None):
+    return (
+        BookArtifact.book_id == book_id,
+        BookArtifact.artifact_type == artifact_type,
+        BookArtifact.params_hash == params_hash(params),
+        BookArtifact.version == ARTIFACT_VERSIONS[artifact_type],
+    )
+
+def _new_artifact(book_id: int, artifact_type: str, payload, params: dict = None) -> BookArtifact:
+    return BookArtifact(
+        book_id=book_id,
+        artifact_type=artifact_type,
+        params_hash=params_hash(params),
+        version=ARTIFACT_VERSIONS[artifact_type],
+        payload=json.dumps(payload),
+    )
+
+def delete_book_artifacts(db: Session, book_id: int):
+    """Remove every artifact of a book (e.g. when its ID is reused by a new upload)."""
+    db.query(BookArtifact).filter(BookArtifact.book_id == book_id).delete(synchronize_session=False)
+    db.commit()
+
+async def aget_artifact(db: AsyncSession, book_id: int, artifact_type: str, params: dict = None):
+    """Return the stored payload of an artifact, or None if it has not been built yet."""
+    payload = await db.scalar(select(BookArtifact.payload).where(*_artifact_filter(book_id, artifact_type, params)))
+    return json.loads(payload) if payload is not None else None
+
+async def asave_artifact(db: AsyncSession, book_id: int, artifact_type: str, payload, params: dict = None):
+    """Store an artifact. If another request stored it first, that one is kept."""
+    db.add(_new_artifact(book_id, artifact_type, payload, params))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+    return payload
+
+async def asave_artifact_detached(book_id: int, artifact_type: str, payload, params: dict = None):
+    """Store an artifact using its own session, for streamed responses that finish after the
+       request's session has been closed.
+    """
+    async with AsyncSessionLocal() as db:
+        return await asave_artifact(db, book_id, artifact_type, payload, params)
+
+async def aget_or_create_artifact(db: AsyncSession, book_id: int, artifact_type: str, build, params: dict = None):
+    """Return a stored artifact, building it with the coroutine function build() and storing it
+       on first use. Empty results are returned but not stored, so they are retried next time.
+    """
+    payload = await aget_artifact(db, book_id, artifact_type, params)
+    if payload is None:
+        payload = await build()
+        if payload:
+            await asave_artifact(db, book_id, artifact_type, payload, params)
+    return payload
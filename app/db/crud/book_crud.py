@@ -0,0 +1,49 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+from app.models.book import Book
+
+# Book lookups for the API request path. `Book.text_content` and `Book.embedding` are
+# deferred columns, and deferred columns cannot be lazy-loaded through an AsyncSession, so
+# handlers build prompts from retrieved passages and fetch the text with aget_book_text only
+# when there are none to use.
+
+def _book_select(user_id: int = None):
+    stmt = select(Book)
+    if user_id is not None:
+        stmt = stmt.where(Book.user_id == user_id)
+    return stmt
+
+async def aget_book_by_id(db: AsyncSession, book_id: int, user_id: int = None):
+    """Retrieve a book by ID, optionally filtering by user_id."""
+    result = await db.execute(_book_select(user_id).where(Book.id == book_id))
+    return result.scalars().first()
+
+async def aget_latest_book(db: AsyncSession, user_id: int = None):
+    """Retrieve the most recently uploaded book, optionally filtering by user_id."""
+    result = await db.execute(_book_select(user_id).order_by(Book.uploaded_at.desc()).limit(1))
+    return result.scalars().first()
+
+async def aget_book_text(db: AsyncSession, book_id: int):
+    """Retrieve only the text of a book."""
+    return await db.scalar(select(Book.text_content).where(Book.id == book_id))
+
+async def afind_book_id_by_filename(db: AsyncSession, filename: str, user_id: int):
+    """Return the ID of a user's book with the given filename, or None."""
+    return await db.scalar(select(Book.id).where(Book.filename == filename, Book.user_id == user_id))
+
+async def alist_books(db: AsyncSession, user_id: int):
+    """List id, filename and upload time of a user's books, newest first."""
+    result = await db.execute(
+        select(Book.id, Book.filename, Book.uploaded_at)
+        .where(Book.user_id == user_id)
+        .order_by(Book.uploaded_at.desc())
+    )
+    return [{"id": row.id, "filename": row.filename, "uploaded_at": row.uploaded_at} for row in result]
+
+async def alist_books_for_search(db: AsyncSession, user_id: int, book_ids: list = None):
+    """A user's books with their page offsets loaded, optionally limited to book_ids."""
+    stmt = select(Book).options(undefer(Book.page_offsets)).where(Book.user_id == user_id)
+    if book_ids:
+        stmt = stmt.where(Book.id.in_(book_ids))
+    return (await db.execute(stmt)).scalars().all()
@@ -0,0 +1,141 @@
+import json
+import uuid
+from datetime import datetime
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.models.job import IngestionJob
+
+ACTIVE_STATUSES = ("queued", "running")
+
+def get_job(db: Session, job_id: str, user_id: int = None):
+    """Retrieve a job by ID, optionally filtering by user_id."""
+    query = db.query(IngestionJob).filter(IngestionJob.id == job_id)
+    if user_id is not None:
+        query = query.filter(IngestionJob.user_id == user_id)
+    return query.first()
+
+def update_job(db: Session, job: IngestionJob, **fields) -> IngestionJob:
+    """Update job fields and commit."""
+    for name, value in fields.items():
+        setattr(job, name, value)
+    db.commit()
+    return job
+
+def record_stage_timing(db: Session, job: IngestionJob, stage: str, seconds: float) -> IngestionJob:
+    """Add the duration of a finished stage to the job's timings."""
+    timings = json.loads(job.stage_timings) if job.stage_timings else {}
+    timings[stage] = round(seconds, 3)
+    return update_job(db, job, stage_timings=json.dumps(timings))
+
+# A server process refreshes updated_at of the jobs it has queued or running (see
+# app/services/ingestion.py), so a queued or running job that has not been updated since a
+# cutoff was abandoned by a process that stopped or crashed.
+RELEASED_AT = datetime(1970, 1, 1)  # updated_at of a job given up on shutdown, so it is resumed at once
+
+def get_interrupted_jobs(db: Session, cutoff: datetime):
+    """Queued or running jobs not updated since cutoff."""
+    return db.query(IngestionJob).filter(
+        IngestionJob.status.in_(ACTIVE_STATUSES),
+        IngestionJob.updated_at < cutoff,
+    ).all()
+
+def claim_interrupted_job(db: Session, job_id: str, cutoff: datetime) -> bool:
+    """Take over an abandoned job, resetting it to queued. The update only applies while the job
+       is still abandoned, so when several server processes find the same job one of them gets it.
+    """
+    result = db.execute(
+        update(IngestionJob)
+        .where(
+            IngestionJob.id == job_id,
+            IngestionJob.status.in_(ACTIVE_STATUSES),
+            IngestionJob.updated_at < cutoff,
+        )
+        .values(status="queued", stage=None, progress=0.0, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+def refresh_jobs(db: Session, job_ids: list):
+    """Mark jobs as still held by this process."""
+    db.execute(
+        update(IngestionJob)
+        .where(IngestionJob.id.in_(job_ids), IngestionJob.status.in_(ACTIVE_STATUSES))
+        .values(updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+def release_jobs(db: Session, job_ids: list):
+    """Give up queued or running jobs on shutdown, so the next process to start resumes them."""
+    db.execute(
+        update(IngestionJob)
+        .where(IngestionJob.id.in_(job_ids), IngestionJob.status.in_(ACTIVE_STATUSES))
+        .values(status="queued", stage=None, progress=0.0, updated_at=RELEASED_AT)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+# Async functions for the API request path; the ingestion worker uses the sync ones above
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+async def acreate_job(db: AsyncSession, user_id: int, filename: str, file_path: str, job_id: str = None) -> IngestionJob:
+    """Create a queued ingestion job for an uploaded PDF; job_id is generated if not given."""
+    job = IngestionJob(id=job_id or new_job_id(), user_id=user_id, filename=filename, file_path=file_path)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+async def aget_job(db: AsyncSession, job_id: str, user_id: int = None):
+    """Retrieve a job by ID, optionally filtering by user_id."""
+    stmt = select(IngestionJob).where(IngestionJob.id == job_id)
+    if user_id is not None:
+        stmt = stmt.where(IngestionJob.user_id == user_id)
+    return (await db.execute(stmt)).scalars().first()
+
+async def alist_jobs(db: AsyncSession, user_id: int, limit: int = 50):
+    """List a user's most recent ingestion jobs."""
+    result = await db.execute(
+        select(IngestionJob)
+        .where(IngestionJob.user_id == user_id)
+        .order_by(IngestionJob.created_at.desc())
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+async def ahas_active_job(db: AsyncSession, user_id: int, filename: str) -> bool:
+    """Check whether the user already has this file queued or being processed."""
+    job_id = await db.scalar(select(IngestionJob.id).where(
+        IngestionJob.user_id == user_id,
+        IngestionJob.filename == filename,
+        IngestionJob.status.in_(ACTIVE_STATUSES),
+    ).limit(1))
+    return job_id is not None
+
+async def arequest_cancel(db: AsyncSession, job: IngestionJob) -> IngestionJob:
+    """Ask the worker to stop; queued jobs are cancelled straight away."""
+    if job.status == "queued":
+        job.status = "cancelled"
+    job.cancel_requested = True
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+def job_to_dict(job: IngestionJob) -> dict:
+    """Serialise a job for API responses."""
+    return {
+        "id": job.id,
+        "filename": job.filename,
+        "status": job.status,
+        "stage": job.stage,
+        "progress": job.progress,
+        "stage_timings": json.loads(job.stage_timings) if job.stage_timings else {},
+        "error": job.error,
+        "book_id": job.book_id,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
@@ -1,116 +1,266 @@
-import os
-import pickle
-from sqlalchemy.orm import Session
-from fastapi import HTTPException
-from PyPDF2 import PdfReader
-from keybert import KeyBERT
-from app.models.book import Book
-
-# Additional imports for OCR fallback using PyMuPDF and EasyOCR
-import fitz  # PyMuPDF
-import numpy as np
-import easyocr
-
-# Define central data storage paths
-DATA_FOLDER = "data"
-BOOKS_FOLDER = os.path.join(DATA_FOLDER, "books")
-EMBEDDINGS_FOLDER = os.path.join(DATA_FOLDER, "embeddings")
-MAX_FILE_SIZE = 200 * 1024 * 1024  # 200MB
-
-# Ensure directories exist
-os.makedirs(BOOKS_FOLDER, exist_ok=True)
-os.makedirs(EMBEDDINGS_FOLDER, exist_ok=True)
-
-def save_pdf_file(file, file_path):
-    """Saves the uploaded PDF file in chunks to avoid memory overload."""
-    try:
-        with open(file_path, "wb") as f:
-            for chunk in file.file:
-                f.write(chunk)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
-
-def extract_text_from_pdf(pdf_path, ocr_threshold=100):
-    """
-    Extracts text from a PDF file.
-    1. Tries to extract text using PyPDF2.
-    2. If the extracted text is shorter than ocr_threshold, falls back to OCR:
-       - Uses PyMuPDF (fitz) to render PDF pages to images.
-       - Uses EasyOCR to extract text from those images.
-    """
-    text = ""
-    try:
-        pdf_reader = PdfReader(pdf_path)
-        max_pages = min(len(pdf_reader.pages), 500)
-        for i in range(max_pages):
-            page_text = pdf_reader.pages[i].extract_text()
-            if page_text:
-                text += page_text + "\n"
-    except Exception as e:
-        # If PyPDF2 extraction fails, set text to empty to force OCR fallback
-        text = ""
-    
-    if len(text.strip()) < ocr_threshold:
-        try:
-            # Open the PDF using PyMuPDF
-            doc = fitz.open(pdf_path)
-            reader = easyocr.Reader(['en'], gpu=False)
-            ocr_text = ""
-            for page in doc:
-                # Render page to a pixmap (image)
-                pix = page.get_pixmap()
-                # Create a numpy array from pixmap samples
-                img_array = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
-                # If the image has an alpha channel, remove it
-                if pix.n >= 4:
-                    img_array = img_array[:, :, :3]
-                # Use EasyOCR to extract text
-                result = reader.readtext(img_array, detail=0, paragraph=True)
-                ocr_text += " ".join(result) + "\n"
-            return ocr_text.strip()
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"OCR extraction failed: {str(e)}")
-    
-    if not text.strip():
-        raise HTTPException(status_code=400, detail="Failed to extract text from PDF. The file may be empty or not text-based.")
-
-    return text.strip()
-
-def extract_keywords(text, num_keywords=10):
-    """Extracts key topics from the text using KeyBERT."""
-    kw_model = KeyBERT()
-    keywords = kw_model.extract_keywords(text, keyphrase_ngram_range=(1,2), stop_words='english', top_n=num_keywords)
-    return [kw[0] for kw in keywords if kw]
-
-def save_embeddings_to_file(embedding_path, embeddings):
-    """Save embeddings as a file in `data/embeddings/`."""
-    try:
-        with open(embedding_path, "wb") as f:
-            pickle.dump(embeddings, f)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error saving embeddings file: {str(e)}")
-
-def store_pdf_in_db(db: Session, filename: str, text_content: str, embeddings: list, user_id: int):
-    """Stores the book, its embeddings, and the user ID in the database."""
-    new_book = Book(
-        filename=filename,
-        text_content=text_content,
-        embedding=pickle.dumps(embeddings),
-        user_id=user_id
-    )
-    db.add(new_book)
-    db.commit()
-    db.refresh(new_book)
-    return new_book
-
-def get_first_book_text(db: Session):
-    """Retrieve text from the first uploaded book PDF in the database."""
-    book = db.query(Book).order_by(Book.uploaded_at.asc()).first()
-    if not book:
-        return None
-    return book.text_content
-
-def list_uploaded_books(db: Session, user_id: int):
-    """List all books uploaded by a specific user."""
-    books = db.query(Book).filter(Book.user_id == user_id).order_by(Book.uploaded_at.desc()).all()
-    return [{"id": book.id, "filename": book.filename, "uploaded_at": book.uploaded_at} for book in books]
+import os
+import json
+import bisect
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from sqlalchemy.orm import Session
+from fastapi import HTTPException
+from PyPDF2 import PdfReader
+from app.core.config import settings
+from app.core.model_registry import model_registry
+from app.models.book import Book
+from app.db.embedding_store import write_book_embeddings, delete_book_embeddings
+
+# Additional imports for OCR fallback using PyMuPDF; the EasyOCR reader comes from the model registry
+import fitz  # PyMuPDF
+import numpy as np
+
+# Define central data storage paths
+DATA_FOLDER = "data"
+BOOKS_FOLDER = os.path.join(DATA_FOLDER, "books")
+EMBEDDINGS_FOLDER = os.path.join(DATA_FOLDER, "embeddings")
+MAX_FILE_SIZE = 200 * 1024 * 1024  # 200MB
+MAX_PAGES = 500
+
+# Page-parallel extraction: documents with at least PARALLEL_MIN_PAGES pages are split
+# into PAGE_SHARD_SIZE-page ranges that are extracted in separate processes
+PAGE_SHARD_SIZE = 25
+PARALLEL_MIN_PAGES = 40
+_extraction_pool = None
+_extraction_pool_lock = threading.Lock()
+
+# Per-page OCR fallback: a page is OCR'd when its text layer has fewer than MIN_PAGE_CHARS
+# characters or less than MIN_READABLE_RATIO of them are letters, digits, spaces or punctuation
+MIN_PAGE_CHARS = 20
+MIN_READABLE_RATIO = 0.6
+READABLE_PUNCTUATION = set(".,;:!?'\"()[]-–—/%&")
+OCR_TARGET_PIXELS = 2000  # Target rendered size of a page's long side
+OCR_MIN_DPI = 150
+OCR_MAX_DPI = 300
+# EasyOCR readers are not documented as thread-safe, and every OCR in the process shares the
+# registry's reader, so recognition runs one page at a time; rendering pages runs in parallel
+_ocr_lock = threading.Lock()
+
+# Ensure directories exist
+os.makedirs(BOOKS_FOLDER, exist_ok=True)
+os.makedirs(EMBEDDINGS_FOLDER, exist_ok=True)
+
+def save_pdf_file(file, file_path):
+    """Saves the uploaded PDF file in chunks to avoid memory overload."""
+    try:
+        with open(file_path, "wb") as f:
+            for chunk in file.file:
+                f.write(chunk)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
+
+def _get_extraction_pool():
+    """Process pool shared by all PDF extractions, created on first use."""
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is None:
+            # Spawned, not forked: the server already runs threads (event loop, ingestion and OCR
+            # workers) and a forked child could inherit one of their locks held
+            _extraction_pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_EXTRACTION_PROCESSES or None,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+    return _extraction_pool
+
+def shutdown_extraction_pool():
+    """Terminate the extraction worker processes, if any were started."""
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is not None:
+            _extraction_pool.shutdown(wait=False, cancel_futures=True)
+            _extraction_pool = None
+
+def _extract_page_range(pdf_path, start, end):
+    """Extract the text of pages [start, end) with PyPDF2. Runs inside a worker process."""
+    pdf_reader = PdfReader(pdf_path)
+    pages = []
+    for i in range(start, end):
+        try:
+            pages.append(pdf_reader.pages[i].extract_text() or "")
+        except Exception:
+            pages.append("")  # An unreadable page should not lose the rest of the shard
+    return pages
+
+def extract_pages_with_pypdf(pdf_path, max_pages=MAX_PAGES):
+    """Extract text per page with PyPDF2, sharding page ranges across the process pool.
+       Small documents are read in-process, where pool overhead would dominate.
+    """
+    num_pages = min(len(PdfReader(pdf_path).pages), max_pages)
+    if num_pages < PARALLEL_MIN_PAGES:
+        return _extract_page_range(pdf_path, 0, num_pages)
+
+    shards = [(start, min(start + PAGE_SHARD_SIZE, num_pages)) for start in range(0, num_pages, PAGE_SHARD_SIZE)]
+    pool = _get_extraction_pool()
+    futures = [pool.submit(_extract_page_range, pdf_path, start, end) for start, end in shards]
+    pages = []
+    for future in futures:
+        pages.extend(future.result())
+    return pages
+
+def needs_ocr(page_text, min_page_chars=MIN_PAGE_CHARS):
+    """A page needs OCR when its text layer is (nearly) empty or mostly unreadable symbols."""
+    stripped = page_text.strip()
+    if len(stripped) < min_page_chars:
+        return True
+    readable = sum(ch.isalnum() or ch.isspace() or ch in READABLE_PUNCTUATION for ch in stripped)
+    return readable / len(stripped) < MIN_READABLE_RATIO
+
+def _ocr_dpi(page):
+    """Pick a render DPI so the page's long side is about OCR_TARGET_PIXELS, within sane bounds."""
+    long_side_inches = max(page.rect.width, page.rect.height) / 72  # PDF points are 1/72 inch
+    if long_side_inches <= 0:
+        return OCR_MIN_DPI
+    return int(min(OCR_MAX_DPI, max(OCR_MIN_DPI, OCR_TARGET_PIXELS / long_side_inches)))
+
+def _render_page(page):
+    """Render a PyMuPDF page to an RGB numpy array at its chosen DPI."""
+    # Render page to a pixmap (image)
+    pix = page.get_pixmap(dpi=_ocr_dpi(page))
+    # Create a numpy array from pixmap samples
+    img_array = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    # If the image has an alpha channel, remove it
+    if pix.n >= 4:
+        img_array = img_array[:, :, :3]
+    return img_array
+
+def _read_image(reader, img_array):
+    """Use EasyOCR to extract text from a rendered page."""
+    with _ocr_lock:
+        return " ".join(reader.readtext(img_array, detail=0, paragraph=True))
+
+def _ocr_page(reader, pdf_path, index):
+    """Render and read one page. Each call opens its own document: PyMuPDF documents must not
+       be shared between threads.
+    """
+    with fitz.open(pdf_path) as doc:
+        img_array = _render_page(doc[index])
+    return _read_image(reader, img_array)
+
+def ocr_missing_pages(pdf_path, pages=None, min_page_chars=MIN_PAGE_CHARS):
+    """OCR only the pages whose text layer is empty or garbage; other pages keep their text.
+       Pages are rendered with PyMuPDF (fitz) in a thread pool and read by EasyOCR one at a
+       time, with at most two pages per worker in flight to bound memory.
+    """
+    with fitz.open(pdf_path) as doc:
+        num_pages = min(doc.page_count, MAX_PAGES)
+    pages = list(pages) if pages is not None else []
+    pages += [""] * (num_pages - len(pages))
+
+    targets = [i for i in range(num_pages) if needs_ocr(pages[i], min_page_chars)]
+    if not targets:
+        return pages
+
+    workers = max(1, settings.OCR_WORKERS)
+    with model_registry.use("easyocr") as reader, ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for i in targets:
+            if len(pending) >= 2 * workers:
+                done_index, future = pending.popleft()
+                pages[done_index] = future.result() or pages[done_index]
+            pending.append((i, pool.submit(_ocr_page, reader, pdf_path, i)))
+        for done_index, future in pending:
+            pages[done_index] = future.result() or pages[done_index]
+    return pages
+
+def extract_pages_from_pdf(pdf_path, min_page_chars=MIN_PAGE_CHARS):
+    """
+    Extracts the text of each page of a PDF file (up to 500 pages).
+    1. Tries to extract text using PyPDF2, in parallel for large documents.
+    2. Pages whose text is shorter than min_page_chars or mostly garbage fall back to OCR:
+       - Uses PyMuPDF (fitz) to render those pages to images, at a DPI chosen per page.
+       - Uses EasyOCR to extract text from those images.
+    """
+    try:
+        pages = extract_pages_with_pypdf(pdf_path)
+    except Exception as e:
+        # If PyPDF2 extraction fails, OCR every page
+        pages = None
+
+    try:
+        pages = ocr_missing_pages(pdf_path, pages, min_page_chars)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"OCR extraction failed: {str(e)}")
+
+    if not any(page.strip() for page in pages):
+        raise HTTPException(status_code=400, detail="Failed to extract text from PDF. The file may be empty or not text-based.")
+
+    return pages
+
+def join_pages(pages):
+    """Join page texts once, returning the text and the character offset where each page starts."""
+    offsets, position = [], 0
+    for page in pages:
+        offsets.append(position)
+        position += len(page) + 1  # +1 for the newline separator
+    return "\n".join(pages), offsets
+
+def page_number_for_offset(page_offsets, offset):
+    """Return the 1-based page number containing a character offset of the joined text."""
+    return bisect.bisect_right(page_offsets, offset) if page_offsets else None
+
+def extract_text_from_pdf(pdf_path, min_page_chars=MIN_PAGE_CHARS):
+    """Extracts text from a PDF file as a single string (see extract_pages_from_pdf)."""
+    pages = extract_pages_from_pdf(pdf_path, min_page_chars)
+    return "\n".join(page for page in pages if page).strip()
+
+def extract_keywords(text, num_keywords=10):
+    """Extracts key topics from the text using KeyBERT."""
+    with model_registry.use("keybert") as kw_model:
+        keywords = kw_model.extract_keywords(text, keyphrase_ngram_range=(1,2), stop_words='english', top_n=num_keywords)
+    return [kw[0] for kw in keywords if kw]
+
+def chunk_page_ranges(page_offsets, spans):
+    """First and last page of each chunk, from the chunks' (start, end) offsets."""
+    return [
+        (page_number_for_offset(page_offsets, start), page_number_for_offset(page_offsets, max(start, end - 1)))
+        for start, end in spans
+    ]
+
+def store_pdf_in_db(db: Session, filename: str, text_content: str, chunks: list, embeddings: list, user_id: int,
+                    page_offsets: list = None, chunk_spans: list = None):
+    """Stores the book and the user ID in the database, and its embeddings in `data/embeddings/`.
+       The row only keeps a pointer to the memory-mappable embedding file and its shape.
+       page_offsets (from join_pages) lets later stages map text positions to page numbers;
+       chunk_spans, the chunks' offsets in text_content, are kept in the chunk table with their pages.
+    """
+    new_book = Book(
+        filename=filename,
+        text_content=text_content,
+        page_offsets=json.dumps(page_offsets) if page_offsets is not None else None,
+        user_id=user_id
+    )
+    db.add(new_book)
+    db.flush()  # Assigns the book ID used to name the embedding file
+    try:
+        pages = chunk_page_ranges(page_offsets, chunk_spans) if page_offsets and chunk_spans is not None else None
+        embedding_path, (rows, dim) = write_book_embeddings(
+            new_book.id, chunks, embeddings, spans=chunk_spans, pages=pages
+        )
+        new_book.embedding_path = embedding_path
+        new_book.embedding_rows = rows
+        new_book.embedding_dim = dim
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        delete_book_embeddings(new_book.id)
+        raise HTTPException(status_code=500, detail=f"Error storing book: {str(e)}")
+    db.refresh(new_book)
+    return new_book
+
+def find_stored_book(db: Session, filename: str, user_id: int):
+    """The user's stored book with the given filename, or None."""
+    return db.query(Book).filter(Book.filename == filename, Book.user_id == user_id).first()
+
+def get_first_book_text(db: Session):
+    """Retrieve text from the first uploaded book PDF in the database."""
+    row = db.query(Book.text_content).order_by(Book.uploaded_at.asc()).first()
+    if not row:
+        return None
+    return row.text_content
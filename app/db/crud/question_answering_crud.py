@@ -1,37 +1,54 @@
-# app/db/crud/question_answering_crud.py
-
-from sqlalchemy.orm import Session
-from app.models.book import Book
-from app.models.history import QueryHistory
-
-def get_book_by_id(db: Session, book_id: int, user_id: int = None):
-    """Retrieve a book by ID, optionally filtering by user_id."""
-    query = db.query(Book).filter(Book.id == book_id)
-    if user_id is not None:
-        query = query.filter(Book.user_id == user_id)
-    return query.first()
-
-def get_latest_book(db: Session, user_id: int = None):
-    """Retrieve the most recently uploaded book, optionally for a specific user."""
-    query = db.query(Book)
-    if user_id is not None:
-        query = query.filter(Book.user_id == user_id)
-    return query.order_by(Book.uploaded_at.desc()).first()
-
-def log_query(db: Session, book_id: int, query_text: str, response: str):
-    """Log a user query and response in the database."""
-    new_query = QueryHistory(book_id=book_id, query=query_text, response=response)
-    db.add(new_query)
-    db.commit()
-    db.refresh(new_query)
-    return new_query
-
-def get_query_history(db: Session, book_id: int = None, user_id: int = None):
-    """Retrieve past queries and responses from history, optionally filtering by user."""
-    q = db.query(QueryHistory)
-    if book_id:
-        q = q.filter(QueryHistory.book_id == book_id)
-    if user_id:
-        # Join with Book table to filter by Book.user_id
-        q = q.join(Book).filter(Book.user_id == user_id)
-    return q.order_by(QueryHistory.created_at.desc()).all()
+# app/db/crud/question_answering_crud.py
+
+import base64
+from datetime import datetime
+from sqlalchemy import select, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.history import QueryHistory
+from app.services.history_writer import queue_history
+
+# History is read newest first in pages. A page's cursor encodes the (created_at, id) of its
+# last row, and the next page starts strictly after it, so fetching any page reads only that
+# page's rows from the (user_id | book_id, created_at, id) indexes however long the history is.
+
+def encode_history_cursor(row: QueryHistory) -> str:
+    """Opaque cursor pointing just past a history row."""
+    return base64.urlsafe_b64encode(f"{row.created_at.isoformat()}|{row.id}".encode("utf-8")).decode("ascii")
+
+def decode_history_cursor(cursor: str):
+    """Return the (created_at, id) a cursor points past; raises ValueError if it is malformed."""
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception as e:
+        raise ValueError("Invalid history cursor.") from e
+
+def _history_page_filter(stmt, book_id: int = None, user_id: int = None, cursor: str = None):
+    if book_id:
+        stmt = stmt.where(QueryHistory.book_id == book_id)
+    if user_id:
+        stmt = stmt.where(QueryHistory.user_id == user_id)
+    if cursor:
+        created_at, row_id = decode_history_cursor(cursor)
+        stmt = stmt.where(or_(
+            QueryHistory.created_at < created_at,
+            and_(QueryHistory.created_at == created_at, QueryHistory.id < row_id),
+        ))
+    return stmt.order_by(QueryHistory.created_at.desc(), QueryHistory.id.desc())
+
+def log_query(book_id: int, query_text: str, response: str, user_id: int = None):
+    """Log a user query and response in history. The row is queued and written shortly after
+       by the history writer, so the caller never waits for a database commit. Without a
+       user_id, the book owner's is stored.
+    """
+    return queue_history(book_id, query_text, response, user_id)
+
+async def aget_query_history(db: AsyncSession, book_id: int = None, user_id: int = None, limit: int = 50,
+                             cursor: str = None):
+    """Retrieve one page of past queries and responses, newest first, optionally filtering by
+       book and user. Returns (rows, cursor of the next page or None).
+    """
+    result = await db.execute(_history_page_filter(select(QueryHistory), book_id, user_id, cursor).limit(limit + 1))
+    rows = result.scalars().all()
+    next_cursor = encode_history_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
@@ -1,29 +1,27 @@
-from sqlalchemy.orm import Session
-from app.models.book import Book
-from app.db.crud.pdf_crud import extract_keywords
-
-def get_book_by_id(db: Session, book_id: int, user_id: int = None):
-    """Retrieve a book by its ID, optionally filtering by user_id."""
-    query = db.query(Book).filter(Book.id == book_id)
-    if user_id is not None:
-        query = query.filter(Book.user_id == user_id)
-    return query.first()
-
-def get_latest_book(db: Session, user_id: int = None):
-    """Retrieve the most recently uploaded book, optionally filtering by user_id."""
-    query = db.query(Book)
-    if user_id is not None:
-        query = query.filter(Book.user_id == user_id)
-    return query.order_by(Book.uploaded_at.desc()).first()
-
-def extract_book_keywords(db: Session, book_id: int = None, user_id: int = None):
-    """Extract keywords from a book for a specific user."""
-    book = get_book_by_id(db, book_id, user_id=user_id) if book_id else get_latest_book(db, user_id=user_id)
-    if not book:
-        return None, "Book not found."
-
-    keywords = extract_keywords(book.text_content)
-    if not keywords:
-        return None, "No keywords found in the book."
-
-    return keywords, None
\ No newline at end of file
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.crud.artifact_crud import aget_or_create_artifact
+from app.db.crud.book_crud import aget_book_by_id, aget_latest_book, aget_book_text
+from app.db.crud.pdf_crud import extract_keywords
+
+KEYBERT_NUM_KEYWORDS = 10
+
+async def aextract_book_keywords(db: AsyncSession, book_id: int = None, user_id: int = None):
+    """Extract keywords from a book for a specific user.
+       KeyBERT runs once per book, in a worker thread; later calls read the stored keywords.
+    """
+    book = await aget_book_by_id(db, book_id, user_id=user_id) if book_id else await aget_latest_book(db, user_id=user_id)
+    if not book:
+        return None, "Book not found."
+
+    async def build():
+        text = await aget_book_text(db, book.id)
+        return await run_in_threadpool(extract_keywords, text, num_keywords=KEYBERT_NUM_KEYWORDS)
+
+    keywords = await aget_or_create_artifact(
+        db, book.id, "keybert_keywords", build, params={"num_keywords": KEYBERT_NUM_KEYWORDS}
+    )
+    if not keywords:
+        return None, "No keywords found in the book."
+
+    return keywords, None
@@ -1,23 +1,36 @@
-from sqlalchemy.orm import Session
-from app.models.user import User
-from passlib.context import CryptContext
-
-# Setup password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def get_user_by_username(db: Session, username: str) -> User:
-    """Retrieve a user by username."""
-    return db.query(User).filter(User.username == username).first()
-
-def create_user(db: Session, username: str, password: str) -> User:
-    """Create a new user with a hashed password."""
-    hashed_password = pwd_context.hash(password)
-    new_user = User(username=username, password_hash=hashed_password)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
-
-def verify_user_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a plain password against its hashed version."""
-    return pwd_context.verify(plain_password, hashed_password)
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.auth.passwords import hash_password, verify_password
+from app.models.user import User
+
+# Password hashing runs in the password hashing process pool and raises PasswordHashingBusy
+# when that pool is saturated
+
+async def aget_user_by_username(db: AsyncSession, username: str) -> User:
+    """Retrieve a user by username."""
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
+
+async def acreate_user(db: AsyncSession, username: str, password: str) -> User:
+    """Create a new user with a hashed password."""
+    hashed_password = await hash_password(password)
+    new_user = User(username=username, password_hash=hashed_password)
+    db.add(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    return new_user
+
+async def aauthenticate_user(db: AsyncSession, username: str, password: str):
+    """Return the user if the password matches, else None.
+       A stored hash made with other hashing parameters (e.g. an old BCRYPT_ROUNDS) is replaced.
+    """
+    user = await aget_user_by_username(db, username)
+    if user is None:
+        return None
+    matches, new_hash = await verify_password(password, user.password_hash)
+    if not matches:
+        return None
+    if new_hash:
+        user.password_hash = new_hash
+        await db.commit()
+    return user
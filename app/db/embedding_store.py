@@ -0,0 +1,69 @@
+import os
+import json
+import numpy as np
+
+# Book embeddings are stored as .npy files (a small header followed by a raw float32
+# matrix) so they can be opened with np.memmap instead of unpickled from the database.
+# Next to each one, a JSON chunk table holds the chunk texts and, for books chunked since
+# chunk offsets were recorded, each chunk's (start, end) offsets in the book text and its
+# first and last page. Older tables are a plain list of chunk texts.
+DATA_FOLDER = "data"
+EMBEDDINGS_FOLDER = os.path.join(DATA_FOLDER, "embeddings")
+EMBEDDING_DTYPE = np.float32
+
+os.makedirs(EMBEDDINGS_FOLDER, exist_ok=True)
+
+def embedding_paths(book_id: int):
+    """Return the (vectors, chunk table) file paths for a book."""
+    base = os.path.join(EMBEDDINGS_FOLDER, f"book_{book_id}")
+    return f"{base}.npy", f"{base}.chunks.json"
+
+def write_book_embeddings(book_id: int, chunks: list, embeddings, spans: list = None, pages: list = None):
+    """Write a book's embeddings and chunk table to disk.
+
+    Rows are L2-normalised before writing so cosine similarity is a plain dot product
+    at query time. Returns the vectors path and the (rows, dim) shape.
+    """
+    matrix = np.asarray(embeddings, dtype=EMBEDDING_DTYPE)
+    if matrix.ndim != 2 or matrix.shape[0] != len(chunks):
+        raise ValueError("Embedding matrix and chunk table must have the same number of rows.")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+
+    vectors_path, chunks_path = embedding_paths(book_id)
+    out = np.lib.format.open_memmap(vectors_path, mode="w+", dtype=EMBEDDING_DTYPE, shape=matrix.shape)
+    out[:] = matrix / norms
+    out.flush()
+    del out
+
+    table = {
+        "chunks": list(chunks),
+        "spans": [list(span) for span in spans] if spans is not None else None,
+        "pages": [list(page_range) for page_range in pages] if pages is not None else None,
+    }
+    with open(chunks_path, "w", encoding="utf-8") as f:
+        json.dump(table, f, ensure_ascii=False)
+
+    return vectors_path, matrix.shape
+
+def open_book_embeddings(vectors_path: str):
+    """Open a stored embedding matrix read-only and memory-mapped (no copy into RAM)."""
+    return np.load(vectors_path, mmap_mode="r")
+
+def read_chunk_table(vectors_path: str):
+    """Read the chunk table stored alongside an embedding matrix, as a dict with the chunk
+       texts ("chunks") and their offsets ("spans") and page ranges ("pages"), which are
+       None if they were not recorded.
+    """
+    chunks_path = vectors_path[: -len(".npy")] + ".chunks.json"
+    with open(chunks_path, "r", encoding="utf-8") as f:
+        table = json.load(f)
+    if isinstance(table, list):
+        return {"chunks": table, "spans": None, "pages": None}
+    return table
+
+def delete_book_embeddings(book_id: int):
+    """Remove a book's embedding files, ignoring ones that do not exist."""
+    for path in embedding_paths(book_id):
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,93 @@
+import os
+import re
+import sqlite3
+import threading
+
+# Full-text (BM25) index over the chunks of every book, kept in its own SQLite file so
+# it can be rebuilt or deleted without touching the main database. Rows line up with the
+# chunk table in data/embeddings/, so a hit's (book_id, chunk_index) also addresses its
+# embedding.
+DATA_FOLDER = "data"
+INDEX_PATH = os.path.join(DATA_FOLDER, "index", "library_fts.db")
+
+def match_expression(query: str):
+    """Turn free text into an FTS5 query matching any of its words, or None if it has none.
+       Each word is quoted so user input can't use FTS5 syntax.
+    """
+    words = re.findall(r"\w+", query.lower())
+    return " OR ".join(f'"{word}"' for word in words) or None
+
+class LibraryIndex:
+    """SQLite FTS5 index of book chunks, searched with BM25."""
+
+    def __init__(self, path: str = INDEX_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS library_chunks USING fts5("
+            "text, book_id UNINDEXED, chunk_index UNINDEXED, tokenize='porter unicode61')"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS indexed_books (book_id INTEGER PRIMARY KEY, chunk_count INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    def indexed_book_ids(self, book_ids) -> set:
+        """Which of the given books are already in the index."""
+        book_ids = list(book_ids)
+        if not book_ids:
+            return set()
+        placeholders = ",".join("?" * len(book_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT book_id FROM indexed_books WHERE book_id IN ({placeholders})", book_ids
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def index_book(self, book_id: int, chunks: list):
+        """(Re)index all chunks of a book, replacing anything stored under its ID."""
+        with self._lock:
+            self._conn.execute("DELETE FROM library_chunks WHERE book_id = ?", (book_id,))
+            self._conn.executemany(
+                "INSERT INTO library_chunks (text, book_id, chunk_index) VALUES (?, ?, ?)",
+                [(chunk, book_id, index) for index, chunk in enumerate(chunks)],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO indexed_books (book_id, chunk_count) VALUES (?, ?)", (book_id, len(chunks))
+            )
+            self._conn.commit()
+
+    def delete_book(self, book_id: int):
+        with self._lock:
+            self._conn.execute("DELETE FROM library_chunks WHERE book_id = ?", (book_id,))
+            self._conn.execute("DELETE FROM indexed_books WHERE book_id = ?", (book_id,))
+            self._conn.commit()
+
+    def search(self, book_ids, query: str, limit: int = 50):
+        """Return (book_id, chunk_index) of the best BM25 matches among the given books, best first."""
+        book_ids = list(book_ids)
+        expression = match_expression(query)
+        if not book_ids or expression is None:
+            return []
+        placeholders = ",".join("?" * len(book_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT book_id, chunk_index FROM library_chunks "
+                f"WHERE library_chunks MATCH ? AND book_id IN ({placeholders}) "
+                "ORDER BY bm25(library_chunks) LIMIT ?",  # bm25() is lower for better matches
+                [expression, *book_ids, limit],
+            ).fetchall()
+        return [(int(book_id), int(chunk_index)) for book_id, chunk_index in rows]
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_library_index() -> LibraryIndex:
+    """Return the process-wide library index."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = LibraryIndex()
+    return _index
@@ -1,45 +1,71 @@
-import openai
-from app.core.config import settings
-from app.prompts.prompts import (
-    EXTRACT_QUESTIONS_SYSTEM_PROMPT,
-    EXTRACT_QUESTIONS_USER_PROMPT,
-    GENERATE_ANSWERS_SYSTEM_PROMPT,
-    GENERATE_ANSWERS_USER_PROMPT,
-)
-
-def extract_questions_from_book(book_text: str):
-    """Extract questions from a book using GPT-4o."""
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": EXTRACT_QUESTIONS_SYSTEM_PROMPT},
-                {"role": "user", "content": EXTRACT_QUESTIONS_USER_PROMPT.format(book_text=book_text[:4000])},
-            ]
-        )
-        questions = response.choices[0].message.content.split("\n")
-        extracted_questions = [q.strip() for q in questions if len(q.strip()) > 5]
-        return extracted_questions
-    except Exception as e:
-        raise RuntimeError(f"Error extracting questions: {str(e)}")
-
-def generate_answers_from_book(book_text: str, questions: list):
-    """Generate answers for extracted questions using GPT-4o."""
-    answers = []
-    for question in questions:
-        try:
-            response = openai.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": GENERATE_ANSWERS_SYSTEM_PROMPT},
-                    {"role": "user", "content": GENERATE_ANSWERS_USER_PROMPT.format(
-                        book_text=book_text[:4000],
-                        question=question
-                    )},
-                ]
-            )
-            answers.append({"question": question, "answer": response.choices[0].message.content.strip()})
-        except Exception as e:
-            raise RuntimeError(f"Error generating answer: {str(e)}")
-    
-    return answers
+from app.core.config import settings
+from app.llm.client import achat_completion, PRIORITY_BULK
+from app.llm.context import build_context, prompt_budget
+from app.llm.fanout import fan_out
+from app.prompts.prompts import (
+    EXTRACT_QUESTIONS_SYSTEM_PROMPT,
+    EXTRACT_QUESTIONS_USER_PROMPT,
+    GENERATE_ANSWERS_SYSTEM_PROMPT,
+    GENERATE_ANSWERS_USER_PROMPT,
+)
+
+async def extract_questions_from_book(book_text: str):
+    """Extract questions from a book using GPT-4o."""
+    try:
+        budget = prompt_budget(EXTRACT_QUESTIONS_SYSTEM_PROMPT, EXTRACT_QUESTIONS_USER_PROMPT)
+        content = await achat_completion(
+            [
+                {"role": "system", "content": EXTRACT_QUESTIONS_SYSTEM_PROMPT},
+                {"role": "user", "content": EXTRACT_QUESTIONS_USER_PROMPT.format(
+                    book_text=build_context(None, book_text, budget)
+                )},
+            ],
+            endpoint="answer_key_questions"
+        )
+        questions = content.split("\n")
+        extracted_questions = [q.strip() for q in questions if len(q.strip()) > 5]
+        return extracted_questions
+    except Exception as e:
+        raise RuntimeError(f"Error extracting questions: {str(e)}")
+
+async def generate_answers_from_book(book_text: str, questions: list, book_id: int = None,
+                                     question_passages: list = None):
+    """Generate answers for extracted questions using GPT-4o.
+       Each question is answered from its own retrieved passages (question_passages) when given.
+       Questions are answered concurrently (ANSWER_KEY_CONCURRENCY at a time, each limited
+       to ANSWER_KEY_TIMEOUT_SECONDS). Answers keep the question order; a question that
+       failed has answer None and an "error" message. Raises only if every question failed.
+    """
+    if question_passages is None:
+        question_passages = [None] * len(questions)
+
+    async def answer(item):
+        question, passages = item
+        budget = prompt_budget(GENERATE_ANSWERS_SYSTEM_PROMPT, GENERATE_ANSWERS_USER_PROMPT, question)
+        content = await achat_completion(
+            [
+                {"role": "system", "content": GENERATE_ANSWERS_SYSTEM_PROMPT},
+                {"role": "user", "content": GENERATE_ANSWERS_USER_PROMPT.format(
+                    book_text=build_context(passages, book_text, budget),
+                    question=question
+                )},
+            ],
+            endpoint="answer_key",
+            priority=PRIORITY_BULK,
+            book_id=book_id
+        )
+        return content.strip()
+
+    results = await fan_out(list(zip(questions, question_passages)), answer, settings.ANSWER_KEY_CONCURRENCY, settings.ANSWER_KEY_TIMEOUT_SECONDS)
+
+    answers = []
+    for question, result in zip(questions, results):
+        if result.ok:
+            answers.append({"question": question, "answer": result.value})
+        else:
+            answers.append({"question": question, "answer": None, "error": result.error})
+
+    if questions and not any(result.ok for result in results):
+        raise RuntimeError(f"Error generating answer: {results[0].error}")
+
+    return answers
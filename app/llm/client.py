@@ -0,0 +1,385 @@
+import time
+import random
+import asyncio
+import threading
+import weakref
+from collections import Counter, defaultdict
+import httpx
+import openai
+from app.core.config import settings
+from app.llm.response_cache import CachedCall
+
+# Shared OpenAI client layer used by every module in app/llm/:
+# - one pooled HTTP client (and one async client per event loop) with explicit timeouts
+# - token-bucket scheduling against requests/min and tokens/min, per model family
+# - request priorities: a waiting higher-priority call is served before lower ones
+# - jittered exponential retries on 429s, timeouts, connection errors and 5xx responses
+# - a response cache (app/llm/response_cache.py) consulted before any request is sent
+# - per-endpoint metrics, exposed through /api/metrics
+# Point OPENAI_BASE_URL at a local mock server to exercise it without the real API.
+
+PRIORITY_INTERACTIVE = 0  # A user is waiting on the response (QA, query embeddings)
+PRIORITY_DEFAULT = 1
+PRIORITY_BULK = 2  # Large fan-outs and ingestion (answer keys, book embeddings)
+
+# Completion tokens reserved up front when a call does not set max_tokens; the
+# difference is returned to the bucket once the real usage is known
+DEFAULT_COMPLETION_TOKENS = 1000
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+class RateLimiter:
+    """Two token buckets (requests/min and tokens/min) with priority-ordered admission."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.request_capacity = float(requests_per_minute)
+        self.token_capacity = float(tokens_per_minute)
+        self._requests = self.request_capacity
+        self._tokens = self.token_capacity
+        self._updated = time.monotonic()
+        self._waiting = Counter()  # priority -> number of callers waiting
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.request_capacity, self._requests + elapsed * self.request_capacity / 60)
+        self._tokens = min(self.token_capacity, self._tokens + elapsed * self.token_capacity / 60)
+
+    def _try_acquire(self, tokens: float, priority: int, waiting: bool) -> float:
+        """Take capacity if available and no higher-priority caller is waiting.
+           Returns 0 on success, otherwise how long to wait before trying again.
+        """
+        tokens = min(tokens, self.token_capacity)  # A single oversized call must still be admissible
+        with self._lock:
+            self._refill()
+            if any(count for p, count in self._waiting.items() if p < priority):
+                wait = 0.05
+            elif self._requests >= 1 and self._tokens >= tokens:
+                self._requests -= 1
+                self._tokens -= tokens
+                if waiting:
+                    self._waiting[priority] -= 1
+                return 0.0
+            else:
+                missing_requests = max(0.0, 1 - self._requests) * 60 / self.request_capacity
+                missing_tokens = max(0.0, tokens - self._tokens) * 60 / self.token_capacity
+                wait = max(missing_requests, missing_tokens, 0.01)
+            if not waiting:
+                self._waiting[priority] += 1
+            return min(wait, 1.0)
+
+    def acquire(self, tokens: float, priority: int = PRIORITY_DEFAULT) -> float:
+        """Block until the call may be sent; returns the seconds spent waiting."""
+        started = time.monotonic()
+        waiting = False
+        while True:
+            wait = self._try_acquire(tokens, priority, waiting)
+            if wait == 0:
+                return time.monotonic() - started
+            waiting = True
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float, priority: int = PRIORITY_DEFAULT) -> float:
+        """Async version of acquire that yields to the event loop while waiting."""
+        started = time.monotonic()
+        waiting = False
+        try:
+            while True:
+                wait = self._try_acquire(tokens, priority, waiting)
+                if wait == 0:
+                    waiting = False
+                    return time.monotonic() - started
+                waiting = True
+                await asyncio.sleep(wait)
+        finally:
+            if waiting:  # Cancelled while queued
+                with self._lock:
+                    self._waiting[priority] -= 1
+
+    def settle(self, reserved: float, used: float):
+        """Return unused reserved tokens (or charge the overrun) once real usage is known."""
+        with self._lock:
+            self._tokens = min(self.token_capacity, self._tokens + reserved - used)
+
+class LLMMetrics:
+    """Per-endpoint counters for calls made through this module."""
+
+    FIELDS = ("requests", "cache_hits", "errors", "retries", "rate_limited", "prompt_tokens", "completion_tokens")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = defaultdict(lambda: {
+            **{field: 0 for field in self.FIELDS},
+            "latency_seconds_total": 0.0,
+            "latency_seconds_max": 0.0,
+            "queue_seconds_total": 0.0,
+        })
+
+    def record(self, endpoint: str, **values):
+        with self._lock:
+            entry = self._data[endpoint]
+            for name, value in values.items():
+                if name == "latency_seconds":
+                    entry["latency_seconds_total"] += value
+                    entry["latency_seconds_max"] = max(entry["latency_seconds_max"], value)
+                elif name == "queue_seconds":
+                    entry["queue_seconds_total"] += value
+                else:
+                    entry[name] += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {}
+            for endpoint, entry in self._data.items():
+                entry = dict(entry)
+                completed = entry["requests"] - entry["errors"]
+                entry["latency_seconds_avg"] = round(entry["latency_seconds_total"] / completed, 3) if completed else None
+                result[endpoint] = entry
+            return result
+
+metrics = LLMMetrics()
+
+_limiters = {
+    "chat": RateLimiter(settings.LLM_REQUESTS_PER_MINUTE, settings.LLM_TOKENS_PER_MINUTE),
+    "embeddings": RateLimiter(settings.EMBEDDING_REQUESTS_PER_MINUTE, settings.EMBEDDING_TOKENS_PER_MINUTE),
+}
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncOpenAI
+
+def _limits():
+    return httpx.Limits(
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+    )
+
+def get_client() -> openai.OpenAI:
+    """Process-wide OpenAI client backed by one pooled HTTP client."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = openai.OpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL,
+                timeout=settings.LLM_TIMEOUT_SECONDS,
+                max_retries=0,  # Retries are handled here so they respect the rate limiter
+                http_client=httpx.Client(limits=_limits(), timeout=settings.LLM_TIMEOUT_SECONDS),
+            )
+    return _client
+
+def get_async_client() -> openai.AsyncOpenAI:
+    """AsyncOpenAI client for the running event loop (async HTTP pools are loop-bound)."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = openai.AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            timeout=settings.LLM_TIMEOUT_SECONDS,
+            max_retries=0,
+            http_client=httpx.AsyncClient(limits=_limits(), timeout=settings.LLM_TIMEOUT_SECONDS),
+        )
+        _async_clients[loop] = client
+    return client
+
+async def close_async_client():
+    """Close the running loop's async client, e.g. when the server shuts down."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+def close_clients():
+    """Close the pooled sync client."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+def _estimate_text_tokens(*texts) -> int:
+    """~4 characters per token."""
+    return sum(len(text or "") for text in texts) // 4
+
+def estimate_tokens(messages, max_tokens: int = None) -> int:
+    """Rough token estimate for rate limiting: the prompt plus the completion budget."""
+    return _estimate_text_tokens(*(message.get("content") for message in messages)) + (
+        max_tokens or DEFAULT_COMPLETION_TOKENS
+    )
+
+def _retry_delay(error, attempt: int) -> float:
+    """Use the server's Retry-After if given, else full-jitter exponential backoff."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after) + random.uniform(0, 0.5)
+        except ValueError:
+            pass
+    return random.uniform(0, min(30.0, 0.5 * 2 ** attempt))
+
+def _record_usage(endpoint: str, limiter: RateLimiter, reserved: int, usage):
+    if usage is None:
+        return
+    limiter.settle(reserved, usage.total_tokens)
+    metrics.record(endpoint, prompt_tokens=usage.prompt_tokens or 0,
+                   completion_tokens=getattr(usage, "completion_tokens", 0) or 0)
+
+def _record_failure(endpoint: str, error):
+    metrics.record(endpoint, errors=1, rate_limited=int(isinstance(error, openai.RateLimitError)))
+
+def _should_retry(error, attempt: int, max_retries: int) -> bool:
+    return isinstance(error, RETRYABLE_ERRORS) and attempt < max_retries
+
+def chat_completion(messages, endpoint: str, priority: int = PRIORITY_DEFAULT, model: str = None,
+                    max_retries: int = None, book_id: int = None, semantic_text: str = None, **kwargs) -> str:
+    """Send a chat completion through the shared client and return the message content.
+       book_id tags the cached response so it is dropped when the book changes; semantic_text
+       (e.g. the user's question) enables the similarity lookup in the response cache.
+    """
+    model = model or settings.LLM_MODEL
+    cached = CachedCall(endpoint, model, messages, kwargs, book_id, semantic_text)
+    if cached.hit:
+        metrics.record(endpoint, cache_hits=1)
+        return cached.response
+    max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
+    limiter = _limiters["chat"]
+    reserved = estimate_tokens(messages, kwargs.get("max_tokens"))
+    metrics.record(endpoint, requests=1)
+    for attempt in range(max_retries + 1):
+        metrics.record(endpoint, queue_seconds=limiter.acquire(reserved, priority))
+        started = time.monotonic()
+        try:
+            response = get_client().chat.completions.create(model=model, messages=messages, **kwargs)
+        except Exception as e:
+            limiter.settle(reserved, 0)
+            if _should_retry(e, attempt, max_retries):
+                metrics.record(endpoint, retries=1, rate_limited=int(isinstance(e, openai.RateLimitError)))
+                time.sleep(_retry_delay(e, attempt))
+                continue
+            _record_failure(endpoint, e)
+            raise
+        metrics.record(endpoint, latency_seconds=time.monotonic() - started)
+        _record_usage(endpoint, limiter, reserved, response.usage)
+        content = response.choices[0].message.content
+        cached.store(content)
+        return content
+
+async def achat_completion(messages, endpoint: str, priority: int = PRIORITY_DEFAULT, model: str = None,
+                           max_retries: int = None, book_id: int = None, semantic_text: str = None, **kwargs) -> str:
+    """Async version of chat_completion. The response cache (SQLite, and an embedding call
+       for similarity lookups) is consulted in a worker thread so the event loop never blocks.
+    """
+    model = model or settings.LLM_MODEL
+    cached = await asyncio.to_thread(CachedCall, endpoint, model, messages, kwargs, book_id, semantic_text)
+    if cached.hit:
+        metrics.record(endpoint, cache_hits=1)
+        return cached.response
+    max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
+    limiter = _limiters["chat"]
+    reserved = estimate_tokens(messages, kwargs.get("max_tokens"))
+    metrics.record(endpoint, requests=1)
+    for attempt in range(max_retries + 1):
+        metrics.record(endpoint, queue_seconds=await limiter.acquire_async(reserved, priority))
+        started = time.monotonic()
+        try:
+            response = await get_async_client().chat.completions.create(model=model, messages=messages, **kwargs)
+        except Exception as e:
+            limiter.settle(reserved, 0)
+            if _should_retry(e, attempt, max_retries):
+                metrics.record(endpoint, retries=1, rate_limited=int(isinstance(e, openai.RateLimitError)))
+                await asyncio.sleep(_retry_delay(e, attempt))
+                continue
+            _record_failure(endpoint, e)
+            raise
+        metrics.record(endpoint, latency_seconds=time.monotonic() - started)
+        _record_usage(endpoint, limiter, reserved, response.usage)
+        content = response.choices[0].message.content
+        await asyncio.to_thread(cached.store, content)
+        return content
+
+async def astream_chat_completion(messages, endpoint: str, priority: int = PRIORITY_DEFAULT, model: str = None,
+                                  max_retries: int = None, book_id: int = None, semantic_text: str = None, **kwargs):
+    """Stream a chat completion, yielding text pieces. Only opening the stream is retried;
+       once tokens have been forwarded a failure is raised to the caller.
+       A cached response is yielded as a single piece.
+    """
+    model = model or settings.LLM_MODEL
+    cached = await asyncio.to_thread(CachedCall, endpoint, model, messages, kwargs, book_id, semantic_text)
+    if cached.hit:
+        metrics.record(endpoint, cache_hits=1)
+        yield cached.response
+        return
+    max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
+    limiter = _limiters["chat"]
+    reserved = estimate_tokens(messages, kwargs.get("max_tokens"))
+    metrics.record(endpoint, requests=1)
+    for attempt in range(max_retries + 1):
+        metrics.record(endpoint, queue_seconds=await limiter.acquire_async(reserved, priority))
+        started = time.monotonic()
+        try:
+            stream = await get_async_client().chat.completions.create(
+                model=model, messages=messages, stream=True, stream_options={"include_usage": True}, **kwargs
+            )
+            break
+        except Exception as e:
+            limiter.settle(reserved, 0)
+            if _should_retry(e, attempt, max_retries):
+                metrics.record(endpoint, retries=1, rate_limited=int(isinstance(e, openai.RateLimitError)))
+                await asyncio.sleep(_retry_delay(e, attempt))
+                continue
+            _record_failure(endpoint, e)
+            raise
+    parts, settled = [], False
+    try:
+        async for chunk in stream:
+            if chunk.usage is not None:
+                _record_usage(endpoint, limiter, reserved, chunk.usage)
+                settled = True
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+    except Exception as e:
+        _record_failure(endpoint, e)
+        raise
+    finally:
+        # Also runs when the consumer stops early (e.g. the client disconnected): close the
+        # upstream connection now rather than at garbage collection, and settle the reserved
+        # tokens against an estimate of what was used if the usage chunk never arrived
+        await stream.close()
+        if not settled:
+            limiter.settle(reserved, _estimate_text_tokens(*(message.get("content") for message in messages), *parts))
+    metrics.record(endpoint, latency_seconds=time.monotonic() - started)
+    await asyncio.to_thread(cached.store, "".join(parts))
+
+def create_embeddings(inputs: list, model: str, endpoint: str = "embeddings", priority: int = PRIORITY_BULK,
+                      token_estimate: int = None) -> list:
+    """Embed a list of inputs through the shared client; returns vectors in input order."""
+    limiter = _limiters["embeddings"]
+    reserved = token_estimate if token_estimate is not None else sum(len(text) for text in inputs) // 4 + 1
+    max_retries = settings.EMBEDDING_MAX_RETRIES
+    metrics.record(endpoint, requests=1)
+    for attempt in range(max_retries + 1):
+        metrics.record(endpoint, queue_seconds=limiter.acquire(reserved, priority))
+        started = time.monotonic()
+        try:
+            response = get_client().embeddings.create(input=inputs, model=model)
+        except Exception as e:
+            limiter.settle(reserved, 0)
+            if _should_retry(e, attempt, max_retries):
+                metrics.record(endpoint, retries=1, rate_limited=int(isinstance(e, openai.RateLimitError)))
+                time.sleep(_retry_delay(e, attempt))
+                continue
+            _record_failure(endpoint, e)
+            raise
+        metrics.record(endpoint, latency_seconds=time.monotonic() - started)
+        _record_usage(endpoint, limiter, reserved, response.usage)
+        # The API returns one item per input; sort by index rather than trusting order
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
@@ -0,0 +1,90 @@
+from functools import lru_cache
+import tiktoken
+from app.core.config import settings
+
+# Assembles the book context sent with a prompt. Instead of a fixed character slice, passages
+# (retrieved for a question, or the book's most central chunks) are packed into a token budget:
+# - at most CONTEXT_MAX_TOKENS of book text, and never more than PROMPT_MAX_TOKENS for the
+#   whole prompt once its fixed parts are counted
+# - duplicate passages, and passages contained in one already chosen, are dropped; a passage
+#   containing chosen ones replaces them
+# - token counts are cached per passage, so chunks shared between requests are encoded once
+PASSAGE_SEPARATOR = "\n\n---\n\n"
+
+@lru_cache(maxsize=None)
+def get_encoding():
+    """Tokenizer of the chat model; models unknown to tiktoken fall back to the GPT-4o encoding."""
+    try:
+        return tiktoken.encoding_for_model(settings.LLM_MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+@lru_cache(maxsize=settings.CONTEXT_TOKEN_CACHE_SIZE)
+def count_tokens(text: str) -> int:
+    """Number of tokens in text for the chat model."""
+    return len(get_encoding().encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """The longest prefix of text that is at most max_tokens tokens."""
+    if max_tokens <= 0 or not text:
+        return ""
+    # Tokens are rarely longer than 8 characters, so a prefix of that size has enough of them
+    # without encoding a whole book
+    tokens = get_encoding().encode(text[:max_tokens * 8], disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text[:max_tokens * 8]
+    return get_encoding().decode(tokens[:max_tokens])
+
+def prompt_budget(*fixed_parts: str) -> int:
+    """Tokens left for book context in a prompt whose other parts are fixed_parts."""
+    fixed = sum(count_tokens(part) for part in fixed_parts if part)
+    return max(0, min(settings.CONTEXT_MAX_TOKENS, settings.PROMPT_MAX_TOKENS - fixed))
+
+def _normalize(passage: str) -> str:
+    return " ".join(passage.lower().split())
+
+def pack_passages(passages: list, max_tokens: int, order: list = None) -> list:
+    """Choose passages, most valuable first, until max_tokens is reached.
+       Passages that don't fit are skipped so a shorter later one can still be used; if not
+       even the first fits it is truncated. A passage that contains chosen ones replaces them
+       if it fits in their place. The chosen passages keep their input order, or are sorted
+       by order (e.g. chunk positions, to read them in book order) if given.
+    """
+    separator_tokens = count_tokens(PASSAGE_SEPARATOR)
+    chosen = []  # (sort key, passage, normalized passage)
+
+    def cost(items):
+        return sum(count_tokens(passage) for _, passage, _ in items) + separator_tokens * max(0, len(items) - 1)
+
+    for position, passage in enumerate(passages):
+        if max_tokens - cost(chosen) <= separator_tokens:
+            break
+        normalized = _normalize(passage)
+        if not normalized or any(normalized in earlier for _, _, earlier in chosen):
+            continue
+        key = order[position] if order is not None else position
+        contained = [item for item in chosen if item[2] in normalized]
+        if contained:
+            # Keep the place of the best passage it replaces
+            replaced = [item for item in chosen if item not in contained]
+            replaced.append((min(key, *(item[0] for item in contained)), passage, normalized))
+            if cost(replaced) <= max_tokens:
+                chosen = replaced
+            continue
+        if cost(chosen + [(key, passage, normalized)]) > max_tokens:
+            if chosen:
+                continue
+            passage = truncate_to_tokens(passage, max_tokens)
+            if not passage:
+                break
+            normalized = _normalize(passage)
+        chosen.append((key, passage, normalized))
+    return [passage for _, passage, _ in sorted(chosen, key=lambda item: item[0])]
+
+def build_context(passages: list, book_text: str, max_tokens: int) -> str:
+    """Book context for a prompt: the packed passages if there are any, else the start of the book."""
+    if passages:
+        packed = pack_passages(passages, max_tokens)
+        if packed:
+            return PASSAGE_SEPARATOR.join(packed)
+    return truncate_to_tokens(book_text or "", max_tokens)
@@ -0,0 +1,102 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from app.core.config import settings
+
+# Content-addressed cache: a chunk's vector is stored under sha256(model, chunk text), so
+# the same passage is embedded once no matter which book, edition or user it comes from.
+# Only book chunks are cached; query embeddings bypass it (see embeddings.embed_queries).
+DATA_FOLDER = "data"
+CACHE_PATH = os.path.join(DATA_FOLDER, "embeddings", "embedding_cache.sqlite3")
+
+def cache_key(model: str, text: str) -> str:
+    """Return the cache key for a chunk embedded with the given model."""
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """Size-bounded, least-recently-used vector cache backed by a single SQLite file.
+
+    Vectors are stored as raw float32 bytes; when the entry limit is exceeded the least
+    recently used entries are evicted. The file is shared by every server process, so entries
+    are counted in the database, inside the transaction that adds them, not per process.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = 50000):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_cache ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embedding_cache_last_used ON embedding_cache (last_used)")
+        self._conn.commit()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._count()
+
+    def get_many(self, model: str, texts: list):
+        """Return a vector (np.float32 array) or None for every text, in order."""
+        keys = [cache_key(model, text) for text in texts]
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embedding_cache SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return [np.frombuffer(found[key], dtype=np.float32) if key in found else None for key in keys]
+
+    def put_many(self, model: str, texts: list, vectors: list):
+        """Store vectors for the given texts and evict old entries if over the limit."""
+        now = time.time()
+        rows = [
+            (cache_key(model, text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embedding_cache (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            # Counted after the insert, while this connection holds the write lock
+            overflow = self._count() - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embedding_cache WHERE key IN "
+                    "(SELECT key FROM embedding_cache ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,),
+                )
+            self._conn.commit()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_embedding_cache():
+    """Return the process-wide embedding cache, or None when it is disabled."""
+    global _cache
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache(max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES)
+    return _cache
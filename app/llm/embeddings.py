@@ -1,27 +1,222 @@
-import openai
-from app.core.config import settings
-import tiktoken
-
-def chunk_text(text, max_tokens=512):
-    """Splits text into smaller chunks while counting actual tokens."""
-    if isinstance(text, list):  
-        text = " ".join(text)  # Convert list to string
-
-    encoding = tiktoken.encoding_for_model("text-embedding-3-large")
-    tokens = encoding.encode(text)
-    
-    chunks = [tokens[i:i + max_tokens] for i in range(0, len(tokens), max_tokens)]
-    return [encoding.decode(chunk) for chunk in chunks]  # Convert tokens back to text
-
-def create_embeddings(text):
-    """Generates OpenAI embeddings for given text chunks."""
-    
-    text_chunks = chunk_text(text, max_tokens=512)  # Ensure text is split properly
-    
-    response = openai.embeddings.create(
-        input=text_chunks,
-        model="text-embedding-3-large"
-    )
-    
-    embeddings = [data.embedding for data in response.data]
-    return embeddings
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from app.core.config import settings
+from app.llm.client import create_embeddings as request_embeddings, PRIORITY_BULK, PRIORITY_INTERACTIVE
+from app.llm.embedding_cache import get_embedding_cache
+import tiktoken
+
+EMBEDDING_MODEL = "text-embedding-3-large"
+
+# Chunks are built from whole sentences, scanning the text once without tokenising it as a
+# whole. A chunk ends before the sentence that would take it past CHUNK_MAX_TOKENS, or at a
+# paragraph break once it is PARAGRAPH_FILL full, and the next chunk repeats the last
+# sentences (up to CHUNK_OVERLAP_TOKENS) of the previous one. Every chunk is an exact slice
+# text[start:end] of the book, so its span can be stored and quoted.
+SENTENCE_END = re.compile(r"\n[ \t]*\n\s*|(?<=[.!?\u3002\uff01\uff1f])[\"'\u201d\u2019)\]]*\s+")
+WORD = re.compile(r"\S+\s*")
+PARAGRAPH_FILL = 0.75
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = EMBEDDING_MODEL):
+    """Tokenizer of an embedding model, loaded once per process."""
+    return tiktoken.encoding_for_model(model)
+
+def count_tokens(text: str) -> int:
+    return len(get_encoding().encode(text, disallowed_special=()))
+
+def _sentences(text):
+    """Yield (start, end, ends_paragraph) for each sentence, including its trailing whitespace."""
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        yield start, match.end(), match.group().count("\n") >= 2
+        start = match.end()
+    if start < len(text):
+        yield start, len(text), True
+
+def _split_by_tokens(text, start, end, max_tokens):
+    """Split text[start:end] after every max_tokens tokens, at character boundaries."""
+    tokens = get_encoding().encode(text[start:end], disallowed_special=())
+    _, offsets = get_encoding().decode_with_offsets(tokens)
+    for i in range(0, len(tokens), max_tokens):
+        piece_end = start + offsets[i + max_tokens] if i + max_tokens < len(tokens) else end
+        yield start + offsets[i], piece_end, min(max_tokens, len(tokens) - i)
+
+def _pieces(text, start, end, max_tokens):
+    """Yield (start, end, token_count) pieces of a sentence, splitting one longer than
+       max_tokens between words (or, for a single overlong word, between tokens).
+    """
+    tokens = count_tokens(text[start:end])
+    if tokens <= max_tokens:
+        yield start, end, tokens
+        return
+    piece_start, piece_tokens = start, 0
+    for word in WORD.finditer(text, start, end):
+        word_tokens = count_tokens(word.group())
+        if word_tokens > max_tokens:
+            if piece_tokens:
+                yield piece_start, word.start(), piece_tokens
+            yield from _split_by_tokens(text, word.start(), word.end(), max_tokens)
+            piece_start, piece_tokens = word.end(), 0
+            continue
+        if piece_tokens and piece_tokens + word_tokens > max_tokens:
+            yield piece_start, word.start(), piece_tokens
+            piece_start, piece_tokens = word.start(), 0
+        piece_tokens += word_tokens
+    if piece_tokens:
+        yield piece_start, end, piece_tokens
+
+def _span(text, pieces):
+    """(start, end, token_count) of the chunk made of pieces, without surrounding whitespace."""
+    start, end = pieces[0][0], pieces[-1][1]
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end, sum(piece[2] for piece in pieces)
+
+def _overlap(pieces, overlap_tokens):
+    """The trailing pieces of a chunk that fit in overlap_tokens, to start the next chunk with."""
+    kept, tokens = deque(), 0
+    for piece in reversed(pieces):
+        if tokens + piece[2] > overlap_tokens:
+            break
+        kept.appendleft(piece)
+        tokens += piece[2]
+    return kept, tokens
+
+def chunk_spans(text, max_tokens=None, overlap_tokens=None):
+    """Yield (start, end, token_count) for each chunk of text, in order.
+       Token counts add up the counts of the chunk's sentences, so they may slightly overcount.
+    """
+    max_tokens = max_tokens or settings.CHUNK_MAX_TOKENS
+    overlap_tokens = settings.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    current, current_tokens, has_new = deque(), 0, False
+    for sentence_start, sentence_end, ends_paragraph in _sentences(text):
+        for piece in _pieces(text, sentence_start, sentence_end, max_tokens):
+            if has_new and current_tokens + piece[2] > max_tokens:
+                span = _span(text, current)
+                if span[0] < span[1]:
+                    yield span
+                current, current_tokens = _overlap(current, overlap_tokens)
+                has_new = False
+            current.append(piece)
+            current_tokens += piece[2]
+            has_new = True
+            while current_tokens > max_tokens and len(current) > 1:  # Overlap gives way to new text
+                current_tokens -= current.popleft()[2]
+        if ends_paragraph and has_new and current_tokens >= max_tokens * PARAGRAPH_FILL:
+            span = _span(text, current)
+            if span[0] < span[1]:
+                yield span
+            current, current_tokens = _overlap(current, overlap_tokens)
+            has_new = False
+    if has_new:
+        span = _span(text, current)
+        if span[0] < span[1]:
+            yield span
+
+def chunk_text(text, max_tokens=None, overlap_tokens=None):
+    """Splits text into sentence-aligned, overlapping chunks of at most max_tokens tokens."""
+    if isinstance(text, list):
+        text = " ".join(text)  # Convert list to string
+    return [text[start:end] for start, end, _ in chunk_spans(text, max_tokens, overlap_tokens)]
+
+def legacy_chunk_text(text, max_tokens=512):
+    """The fixed 512-token windows books were chunked into before chunk_spans, kept so their
+       pickled embeddings can be matched back to their chunks.
+    """
+    if isinstance(text, list):
+        text = " ".join(text)
+    tokens = get_encoding().encode(text)
+    return [get_encoding().decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+def pack_batches(token_counts, max_tokens, max_items):
+    """Group consecutive chunk indices into batches under a token and item budget.
+       A single chunk larger than max_tokens still gets a batch of its own.
+    """
+    batches, current, current_tokens = [], [], 0
+    for i, count in enumerate(token_counts):
+        if current and (current_tokens + count > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += count
+    if current:
+        batches.append(current)
+    return batches
+
+def embed_chunks(chunks, token_counts=None, priority=PRIORITY_BULK, use_cache=True):
+    """Embed chunks in token-budgeted batches sent concurrently; results keep the input order.
+       Repeated texts are embedded once, and with use_cache, chunks already in the embedding
+       cache are not sent to the API.
+    """
+    if not chunks:
+        return []
+    positions = {}  # text -> index of its first occurrence among the unique texts
+    unique, unique_counts = [], []
+    for i, chunk in enumerate(chunks):
+        if chunk not in positions:
+            positions[chunk] = len(unique)
+            unique.append(chunk)
+            unique_counts.append(token_counts[i] if token_counts is not None else None)
+
+    cache = get_embedding_cache() if use_cache else None
+    embeddings = cache.get_many(EMBEDDING_MODEL, unique) if cache is not None else [None] * len(unique)
+    missing = [i for i, vector in enumerate(embeddings) if vector is None]
+    if missing:
+        missing_counts = [
+            count_tokens(unique[i]) if unique_counts[i] is None else unique_counts[i] for i in missing
+        ]
+        token_counts_by_index = dict(zip(missing, missing_counts))
+        batches = pack_batches(missing_counts, settings.EMBEDDING_BATCH_MAX_TOKENS, settings.EMBEDDING_BATCH_MAX_ITEMS)
+        batches = [[missing[j] for j in batch] for batch in batches]
+        workers = max(1, min(settings.EMBEDDING_MAX_CONCURRENCY, len(batches)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                lambda batch: request_embeddings(
+                    [unique[i] for i in batch], EMBEDDING_MODEL, priority=priority,
+                    token_estimate=sum(token_counts_by_index[i] for i in batch),
+                ),
+                batches,
+            )
+
+        for batch, vectors in zip(batches, results):
+            for i, vector in zip(batch, vectors):
+                embeddings[i] = vector
+
+        if cache is not None:
+            cache.put_many(EMBEDDING_MODEL, [unique[i] for i in missing], [embeddings[i] for i in missing])
+    return [embeddings[positions[chunk]] for chunk in chunks]
+
+def create_chunk_embeddings(text):
+    """Splits text into chunks and embeds them, returning (chunks, embeddings, spans) in the same
+       order, where spans are the (start, end) offsets of each chunk in text.
+    """
+    if isinstance(text, list):
+        text = " ".join(text)
+    text_chunks, spans, token_counts = [], [], []
+    for start, end, tokens in chunk_spans(text):
+        text_chunks.append(text[start:end])
+        spans.append((start, end))
+        token_counts.append(tokens)
+    embeddings = embed_chunks(text_chunks, token_counts)
+    return text_chunks, embeddings, spans
+
+def create_embeddings(text):
+    """Generates OpenAI embeddings for given text chunks."""
+    _, embeddings, _ = create_chunk_embeddings(text)
+    return embeddings
+
+def embed_queries(queries: list, priority=PRIORITY_INTERACTIVE):
+    """Embed query strings with the same model used for book chunks. Queries are mostly
+       one-off, so they bypass the embedding cache instead of evicting chunk vectors from it.
+    """
+    return embed_chunks(queries, priority=priority, use_cache=False)
+
+def embed_query(query: str):
+    """Embed a single query string with the same model used for book chunks."""
+    return embed_queries([query])[0]
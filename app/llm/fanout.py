@@ -0,0 +1,29 @@
+import asyncio
+from typing import Any, NamedTuple, Optional
+
+# Runs one async LLM call per item with bounded concurrency and a per-call timeout.
+# A failing item is reported in its own result instead of aborting the whole batch.
+
+class FanOutResult(NamedTuple):
+    index: int
+    value: Any = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+async def fan_out(items, worker, limit: int, timeout: float):
+    """Await worker(item) for every item, at most `limit` at a time; results keep input order."""
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(index, item):
+        async with semaphore:
+            try:
+                return FanOutResult(index, value=await asyncio.wait_for(worker(item), timeout))
+            except asyncio.TimeoutError:
+                return FanOutResult(index, error=f"Timed out after {timeout:g} seconds.")
+            except Exception as e:
+                return FanOutResult(index, error=str(e))
+
+    return await asyncio.gather(*(run(index, item) for index, item in enumerate(items)))
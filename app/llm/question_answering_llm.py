@@ -1,17 +1,49 @@
-import openai
-from app.core.config import settings
-from app.prompts.prompts import QUESTION_ANSWERING_SYSTEM_PROMPT, QUESTION_ANSWERING_USER_PROMPT
-
-def generate_answer(book_text: str, question: str) -> str:
-    """Generate an answer using GPT-4o based on the book text."""
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": QUESTION_ANSWERING_SYSTEM_PROMPT},
-                {"role": "user", "content": QUESTION_ANSWERING_USER_PROMPT.format(book_text=book_text[:4000], question=question)}
-            ]
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        raise RuntimeError(f"Error generating answer: {str(e)}")
+from app.core.config import settings
+from app.llm.client import achat_completion, astream_chat_completion, PRIORITY_INTERACTIVE
+from app.llm.context import PASSAGE_SEPARATOR, build_context, pack_passages, prompt_budget
+from app.prompts.prompts import (
+    QUESTION_ANSWERING_SYSTEM_PROMPT,
+    QUESTION_ANSWERING_USER_PROMPT,
+    QUESTION_ANSWERING_PASSAGES_USER_PROMPT,
+)
+
+def _answer_messages(book_text: str, question: str, passages: list = None):
+    """Build the chat messages; if retrieved passages are given, only those are sent as context,
+       most relevant first and as many as fit the token budget.
+    """
+    if passages:
+        budget = prompt_budget(QUESTION_ANSWERING_SYSTEM_PROMPT, QUESTION_ANSWERING_PASSAGES_USER_PROMPT, question)
+        user_prompt = QUESTION_ANSWERING_PASSAGES_USER_PROMPT.format(
+            passages=PASSAGE_SEPARATOR.join(pack_passages(passages, budget)), question=question
+        )
+    else:
+        budget = prompt_budget(QUESTION_ANSWERING_SYSTEM_PROMPT, QUESTION_ANSWERING_USER_PROMPT, question)
+        user_prompt = QUESTION_ANSWERING_USER_PROMPT.format(
+            book_text=build_context(None, book_text, budget), question=question
+        )
+    return [
+        {"role": "system", "content": QUESTION_ANSWERING_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+async def generate_answer(book_text: str, question: str, passages: list = None, book_id: int = None) -> str:
+    """Generate an answer using GPT-4o based on the book text or retrieved passages."""
+    try:
+        content = await achat_completion(
+            _answer_messages(book_text, question, passages), endpoint="qa", priority=PRIORITY_INTERACTIVE,
+            book_id=book_id, semantic_text=question
+        )
+        return content.strip()
+    except Exception as e:
+        raise RuntimeError(f"Error generating answer: {str(e)}")
+
+async def stream_answer(book_text: str, question: str, passages: list = None, book_id: int = None):
+    """Stream an answer from GPT-4o, yielding text pieces as they are generated."""
+    try:
+        async for delta in astream_chat_completion(
+            _answer_messages(book_text, question, passages), endpoint="qa_stream", priority=PRIORITY_INTERACTIVE,
+            book_id=book_id, semantic_text=question
+        ):
+            yield delta
+    except Exception as e:
+        raise RuntimeError(f"Error generating answer: {str(e)}")
@@ -1,20 +1,25 @@
-import openai
-from app.core.config import settings
-from app.prompts.prompts import QUIZ_GENERATION_SYSTEM_PROMPT, QUIZ_GENERATION_USER_PROMPT
-
-def generate_quiz_questions(book_text: str, num_questions: int):
-    """Generate quiz questions and multiple-choice answers using GPT-4o."""
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": QUIZ_GENERATION_SYSTEM_PROMPT},
-                {"role": "user", "content": QUIZ_GENERATION_USER_PROMPT.format(
-                    book_text=book_text[:3000],
-                    num_questions=num_questions
-                )}
-            ]
-        )
-        return response.choices[0].message.content.split("\n")
-    except Exception as e:
-        raise RuntimeError(f"Error generating quiz questions: {str(e)}")
+from app.core.config import settings
+from app.llm.client import achat_completion
+from app.llm.context import build_context, prompt_budget
+from app.prompts.prompts import QUIZ_GENERATION_SYSTEM_PROMPT, QUIZ_GENERATION_USER_PROMPT
+
+async def generate_quiz_questions(book_text: str, num_questions: int, book_id: int = None, passages: list = None):
+    """Generate quiz questions and multiple-choice answers using GPT-4o.
+       The book's most central passages are used as context when given.
+    """
+    try:
+        budget = prompt_budget(QUIZ_GENERATION_SYSTEM_PROMPT, QUIZ_GENERATION_USER_PROMPT)
+        content = await achat_completion(
+            [
+                {"role": "system", "content": QUIZ_GENERATION_SYSTEM_PROMPT},
+                {"role": "user", "content": QUIZ_GENERATION_USER_PROMPT.format(
+                    book_text=build_context(passages, book_text, budget),
+                    num_questions=num_questions
+                )}
+            ],
+            endpoint="quiz",
+            book_id=book_id
+        )
+        return content.split("\n")
+    except Exception as e:
+        raise RuntimeError(f"Error generating quiz questions: {str(e)}")
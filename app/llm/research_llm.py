@@ -1,18 +1,23 @@
-import openai
-from app.core.config import settings
-from app.prompts.prompts import RESEARCH_KEYWORDS_SYSTEM_PROMPT, RESEARCH_KEYWORDS_USER_PROMPT
-
-def extract_keywords_from_text(book_text: str):
-    """Extract keywords from a book using GPT-4o."""
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": RESEARCH_KEYWORDS_SYSTEM_PROMPT},
-                {"role": "user", "content": RESEARCH_KEYWORDS_USER_PROMPT.format(book_text=book_text[:4000])}
-            ]
-        )
-        keywords = response.choices[0].message.content.split(", ")
-        return [keyword.strip() for keyword in keywords if keyword.strip()]
-    except Exception as e:
-        raise RuntimeError(f"Error extracting keywords: {str(e)}")
+from app.core.config import settings
+from app.llm.client import achat_completion
+from app.llm.context import build_context, prompt_budget
+from app.prompts.prompts import RESEARCH_KEYWORDS_SYSTEM_PROMPT, RESEARCH_KEYWORDS_USER_PROMPT
+
+async def extract_keywords_from_text(book_text: str, book_id: int = None, passages: list = None):
+    """Extract keywords from a book using GPT-4o, from its most central passages when given."""
+    try:
+        budget = prompt_budget(RESEARCH_KEYWORDS_SYSTEM_PROMPT, RESEARCH_KEYWORDS_USER_PROMPT)
+        content = await achat_completion(
+            [
+                {"role": "system", "content": RESEARCH_KEYWORDS_SYSTEM_PROMPT},
+                {"role": "user", "content": RESEARCH_KEYWORDS_USER_PROMPT.format(
+                    book_text=build_context(passages, book_text, budget)
+                )}
+            ],
+            endpoint="research_keywords",
+            book_id=book_id
+        )
+        keywords = content.split(", ")
+        return [keyword.strip() for keyword in keywords if keyword.strip()]
+    except Exception as e:
+        raise RuntimeError(f"Error extracting keywords: {str(e)}")
@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from app.core.config import settings
+
+# Cache of chat completion responses, backed by one SQLite file:
+# - exact match on (model, messages, request parameters)
+# - optionally, for calls that pass a semantic_text (e.g. a student's question), a reply
+#   to an earlier call with a near-identical text is reused when the cosine similarity of
+#   their embeddings reaches LLM_CACHE_SEMANTIC_THRESHOLD. Matches are only looked for
+#   among calls from the same endpoint, model and book.
+# Entries expire after LLM_CACHE_TTL_SECONDS, the least recently used ones are evicted past
+# LLM_CACHE_MAX_ENTRIES, and all entries for a book are dropped when the book is (re)ingested.
+# The file is shared by every server process, so the entry limit is checked against a count
+# taken in the database inside the inserting transaction.
+DATA_FOLDER = "data"
+CACHE_PATH = os.path.join(DATA_FOLDER, "cache", "llm_responses.sqlite3")
+
+# Most recent candidates compared in one semantic lookup
+SEMANTIC_SCAN_LIMIT = 2000
+
+def response_key(model: str, messages: list, params: dict) -> str:
+    """Return the exact-match key for a chat completion request."""
+    payload = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def semantic_scope(endpoint: str, model: str, book_id) -> str:
+    """Calls whose semantic texts may be compared with each other."""
+    return f"{endpoint}\x00{model}\x00{book_id}"
+
+class ResponseCache:
+    """Size-bounded, TTL-limited response cache with optional embedding-similarity lookup."""
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = 20000, ttl_seconds: int = 604800):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            "key TEXT PRIMARY KEY, scope TEXT NOT NULL, book_id INTEGER, response TEXT NOT NULL, "
+            "embedding BLOB, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_responses_scope ON llm_responses (scope, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_responses_book_id ON llm_responses (book_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_responses_last_used ON llm_responses (last_used)")
+        self._conn.commit()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._count()
+
+    def _oldest_valid(self) -> float:
+        return time.time() - self.ttl_seconds
+
+    def _touch(self, key: str):
+        self._conn.execute("UPDATE llm_responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+
+    def get(self, key: str):
+        """Return the cached response for an exact key, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM llm_responses WHERE key = ? AND created_at >= ?", (key, self._oldest_valid())
+            ).fetchone()
+            if row is None:
+                return None
+            self._touch(key)
+            return row[0]
+
+    def find_similar(self, scope: str, vector, threshold: float):
+        """Return the cached response in scope whose embedding is most similar to vector,
+           if that similarity is at least threshold; otherwise None.
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, response, embedding FROM llm_responses "
+                "WHERE scope = ? AND embedding IS NOT NULL AND created_at >= ? "
+                "ORDER BY created_at DESC LIMIT ?",
+                (scope, self._oldest_valid(), SEMANTIC_SCAN_LIMIT),
+            ).fetchall()
+            if not rows:
+                return None
+            # Stored embeddings are normalised, so the dot product is the cosine similarity
+            matrix = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] < threshold:
+                return None
+            self._touch(rows[best][0])
+            return rows[best][1]
+
+    def put(self, key: str, scope: str, response: str, book_id=None, vector=None):
+        """Store a response and evict expired or least recently used entries if over the limit."""
+        embedding = None
+        if vector is not None:
+            vector = np.asarray(vector, dtype=np.float32)
+            embedding = (vector / (np.linalg.norm(vector) or 1.0)).tobytes()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, scope, book_id, response, embedding, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, scope, book_id, response, embedding, now, now),
+            )
+            # Counted after the insert, while this connection holds the write lock
+            if self._count() > self.max_entries:
+                self._conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (self._oldest_valid(),))
+                overflow = self._count() - self.max_entries
+                if overflow > 0:
+                    self._conn.execute(
+                        "DELETE FROM llm_responses WHERE key IN "
+                        "(SELECT key FROM llm_responses ORDER BY last_used ASC LIMIT ?)",
+                        (overflow,),
+                    )
+            self._conn.commit()
+
+    def invalidate_book(self, book_id: int) -> int:
+        """Drop every cached response generated from a book; returns how many were removed."""
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM llm_responses WHERE book_id = ?", (book_id,)).rowcount
+            self._conn.commit()
+            return removed
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Return the process-wide response cache, or None when it is disabled."""
+    global _cache
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(
+                max_entries=settings.LLM_CACHE_MAX_ENTRIES, ttl_seconds=settings.LLM_CACHE_TTL_SECONDS
+            )
+    return _cache
+
+def invalidate_book(book_id: int):
+    """Forget cached responses for a book, e.g. after it has been (re)ingested."""
+    cache = get_response_cache()
+    if cache is not None:
+        cache.invalidate_book(book_id)
+
+class CachedCall:
+    """Cache state for one chat completion call: the cached response if there was a hit,
+       otherwise what is needed to store the fresh response.
+    """
+
+    def __init__(self, endpoint: str, model: str, messages: list, params: dict,
+                 book_id=None, semantic_text: str = None, semantic: bool = True):
+        self.cache = get_response_cache()
+        self.key = response_key(model, messages, params)
+        self.scope = semantic_scope(endpoint, model, book_id)
+        self.book_id = book_id
+        self.vector = None
+        self.response = None
+        if self.cache is None:
+            return
+        self.response = self.cache.get(self.key)
+        if self.response is None and semantic_text and semantic and settings.LLM_CACHE_SEMANTIC:
+            from app.llm.embeddings import embed_query  # Imported here: embeddings uses the client
+            self.vector = embed_query(semantic_text)
+            self.response = self.cache.find_similar(self.scope, self.vector, settings.LLM_CACHE_SEMANTIC_THRESHOLD)
+
+    @property
+    def hit(self) -> bool:
+        return self.response is not None
+
+    def store(self, response: str):
+        if self.cache is not None and response:
+            self.cache.put(self.key, self.scope, response, book_id=self.book_id, vector=self.vector)
@@ -1,17 +1,32 @@
-import openai
-from app.core.config import settings
-from app.prompts.prompts import STUDY_PLAN_SYSTEM_PROMPT, STUDY_PLAN_USER_PROMPT
-
-def generate_study_plan_from_text(book_text: str, duration: int):
-    """Generate a study plan using GPT-4o."""
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": STUDY_PLAN_SYSTEM_PROMPT},
-                {"role": "user", "content": STUDY_PLAN_USER_PROMPT.format(book_text=book_text[:3000], duration=duration)}
-            ]
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        raise RuntimeError(f"Error generating study plan: {str(e)}")
+from app.core.config import settings
+from app.llm.client import achat_completion, astream_chat_completion, PRIORITY_INTERACTIVE
+from app.llm.context import build_context, prompt_budget
+from app.prompts.prompts import STUDY_PLAN_SYSTEM_PROMPT, STUDY_PLAN_USER_PROMPT
+
+def _study_plan_messages(book_text: str, duration: int, passages: list = None):
+    budget = prompt_budget(STUDY_PLAN_SYSTEM_PROMPT, STUDY_PLAN_USER_PROMPT)
+    return [
+        {"role": "system", "content": STUDY_PLAN_SYSTEM_PROMPT},
+        {"role": "user", "content": STUDY_PLAN_USER_PROMPT.format(
+            book_text=build_context(passages, book_text, budget), duration=duration
+        )}
+    ]
+
+async def generate_study_plan_from_text(book_text: str, duration: int, book_id: int = None, passages: list = None):
+    """Generate a study plan using GPT-4o, from the book's most central passages when given."""
+    try:
+        content = await achat_completion(_study_plan_messages(book_text, duration, passages), endpoint="study_plan", book_id=book_id)
+        return content.strip()
+    except Exception as e:
+        raise RuntimeError(f"Error generating study plan: {str(e)}")
+
+async def stream_study_plan_from_text(book_text: str, duration: int, book_id: int = None, passages: list = None):
+    """Stream a study plan from GPT-4o, yielding text pieces as they are generated."""
+    try:
+        async for delta in astream_chat_completion(
+            _study_plan_messages(book_text, duration, passages), endpoint="study_plan_stream", priority=PRIORITY_INTERACTIVE,
+            book_id=book_id
+        ):
+            yield delta
+    except Exception as e:
+        raise RuntimeError(f"Error generating study plan: {str(e)}")
@@ -1,45 +1,179 @@
-import openai
-from app.core.config import settings
-from app.prompts.prompts import (
-    SYLLABUS_TOPICS_SYSTEM_PROMPT,
-    SYLLABUS_TOPICS_USER_PROMPT,
-    SYLLABUS_SUMMARY_SYSTEM_PROMPT,
-    SYLLABUS_SUMMARY_USER_PROMPT,
-)
-
-def extract_syllabus_topics(syllabus_text: str):
-    """Extract main topics from a syllabus using GPT-4o."""
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": SYLLABUS_TOPICS_SYSTEM_PROMPT},
-                {"role": "user", "content": SYLLABUS_TOPICS_USER_PROMPT.format(syllabus_text=syllabus_text[:4000])},
-            ]
-        )
-        topics = response.choices[0].message.content.split("\n")
-        return [topic.strip() for topic in topics if topic.strip()]
-    except Exception as e:
-        raise RuntimeError(f"Error extracting syllabus topics: {str(e)}")
-
-def generate_syllabus_summary(book_text: str, topics: list, summary_type: str):
-    """Generate a structured summary for syllabus topics using GPT-4o."""
-    summaries = []
-    lines = "5 lines" if summary_type == "short" else "detailed explanation"
-    for topic in topics:
-        try:
-            response = openai.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": SYLLABUS_SUMMARY_SYSTEM_PROMPT},
-                    {"role": "user", "content": SYLLABUS_SUMMARY_USER_PROMPT.format(
-                        topic=topic,
-                        lines=lines,
-                        book_text=book_text[:4000]
-                    )}
-                ]
-            )
-            summaries.append({"topic": topic, "summary": response.choices[0].message.content.strip()})
-        except Exception as e:
-            raise RuntimeError(f"Error generating summary for '{topic}': {str(e)}")
-    return summaries
+import json
+from app.core.config import settings
+from app.llm.client import achat_completion, astream_chat_completion, PRIORITY_INTERACTIVE
+from app.llm.context import build_context, prompt_budget, truncate_to_tokens
+from app.llm.fanout import fan_out
+from app.prompts.prompts import (
+    SYLLABUS_TOPICS_SYSTEM_PROMPT,
+    SYLLABUS_TOPICS_USER_PROMPT,
+    SYLLABUS_SUMMARY_SYSTEM_PROMPT,
+    SYLLABUS_SUMMARY_USER_PROMPT,
+    SYLLABUS_BATCH_SUMMARY_SYSTEM_PROMPT,
+    SYLLABUS_BATCH_SUMMARY_USER_PROMPT,
+)
+
+async def extract_syllabus_topics(syllabus_text: str):
+    """Extract main topics from a syllabus using GPT-4o."""
+    try:
+        budget = prompt_budget(SYLLABUS_TOPICS_SYSTEM_PROMPT, SYLLABUS_TOPICS_USER_PROMPT)
+        content = await achat_completion(
+            [
+                {"role": "system", "content": SYLLABUS_TOPICS_SYSTEM_PROMPT},
+                {"role": "user", "content": SYLLABUS_TOPICS_USER_PROMPT.format(
+                    syllabus_text=truncate_to_tokens(syllabus_text, budget)
+                )},
+            ],
+            endpoint="syllabus_topics"
+        )
+        topics = content.split("\n")
+        return [topic.strip() for topic in topics if topic.strip()]
+    except Exception as e:
+        raise RuntimeError(f"Error extracting syllabus topics: {str(e)}")
+
+def _summary_lines(summary_type: str):
+    return "5 lines" if summary_type == "short" else "detailed explanation"
+
+def _topic_contexts(book_text: str, topics: list, topic_passages: list = None, topics_per_request: int = 1):
+    """Context for each topic: its retrieved passages if available, else the start of the book.
+       Topics sharing a request share its token budget.
+    """
+    if topic_passages is None:
+        topic_passages = [None] * len(topics)
+    if topics_per_request > 1:
+        system_prompt, user_prompt = SYLLABUS_BATCH_SUMMARY_SYSTEM_PROMPT, SYLLABUS_BATCH_SUMMARY_USER_PROMPT
+    else:
+        system_prompt, user_prompt = SYLLABUS_SUMMARY_SYSTEM_PROMPT, SYLLABUS_SUMMARY_USER_PROMPT
+    contexts = []
+    for topic, passages in zip(topics, topic_passages):
+        budget = prompt_budget(system_prompt, user_prompt, topic) // topics_per_request
+        contexts.append(build_context(passages, book_text, budget))
+    return contexts
+
+def _summary_messages(context: str, topic: str, summary_type: str):
+    return [
+        {"role": "system", "content": SYLLABUS_SUMMARY_SYSTEM_PROMPT},
+        {"role": "user", "content": SYLLABUS_SUMMARY_USER_PROMPT.format(
+            topic=topic,
+            lines=_summary_lines(summary_type),
+            book_text=context
+        )}
+    ]
+
+def _batch_messages(topics: list, contexts: list, summary_type: str):
+    sections = "\n\n".join(
+        f"### Topic {number}: {topic}\n{context}"
+        for number, (topic, context) in enumerate(zip(topics, contexts), start=1)
+    )
+    return [
+        {"role": "system", "content": SYLLABUS_BATCH_SUMMARY_SYSTEM_PROMPT},
+        {"role": "user", "content": SYLLABUS_BATCH_SUMMARY_USER_PROMPT.format(
+            lines=_summary_lines(summary_type),
+            topic_sections=sections
+        )}
+    ]
+
+def parse_batch_summaries(content: str, topics: list):
+    """Map a batched JSON response back to its topics.
+       Entries are matched by topic name, falling back to position; unmatched topics get None.
+    """
+    try:
+        entries = json.loads(content).get("summaries", [])
+    except (ValueError, AttributeError):
+        return [None] * len(topics)
+    entries = [entry for entry in entries if isinstance(entry, dict) and entry.get("summary")]
+    by_topic = {str(entry.get("topic", "")).strip().lower(): entry["summary"].strip() for entry in entries}
+    summaries = []
+    for position, topic in enumerate(topics):
+        summary = by_topic.get(topic.strip().lower())
+        if summary is None and len(entries) == len(topics):
+            summary = entries[position]["summary"].strip()
+        summaries.append(summary)
+    return summaries
+
+async def _summarize_concurrently(topics: list, contexts: list, summary_type: str, book_id: int = None):
+    """One request per topic, run concurrently; returns a fan-out result per topic."""
+    async def summarize(item):
+        topic, context = item
+        content = await achat_completion(
+            _summary_messages(context, topic, summary_type), endpoint="syllabus_summary", book_id=book_id
+        )
+        return content.strip()
+
+    return await fan_out(
+        list(zip(topics, contexts)), summarize,
+        settings.SYLLABUS_SUMMARY_CONCURRENCY, settings.SYLLABUS_SUMMARY_TIMEOUT_SECONDS
+    )
+
+async def _summarize_batched(topics: list, contexts: list, summary_type: str, book_id: int = None):
+    """Several topics per structured-output request; topics missing from a reply are retried singly."""
+    size = max(1, settings.SYLLABUS_SUMMARY_BATCH_SIZE)
+    batches = [list(range(start, min(start + size, len(topics)))) for start in range(0, len(topics), size)]
+
+    async def summarize_batch(batch):
+        content = await achat_completion(
+            _batch_messages([topics[i] for i in batch], [contexts[i] for i in batch], summary_type),
+            endpoint="syllabus_summary_batch",
+            book_id=book_id,
+            response_format={"type": "json_object"}
+        )
+        return parse_batch_summaries(content, [topics[i] for i in batch])
+
+    batch_results = await fan_out(
+        batches, summarize_batch,
+        settings.SYLLABUS_SUMMARY_CONCURRENCY, settings.SYLLABUS_SUMMARY_TIMEOUT_SECONDS
+    )
+    summaries = [None] * len(topics)
+    for batch, result in zip(batches, batch_results):
+        if result.ok:
+            for i, summary in zip(batch, result.value):
+                summaries[i] = summary
+
+    missing = [i for i, summary in enumerate(summaries) if summary is None]
+    retried = await _summarize_concurrently(
+        [topics[i] for i in missing], [contexts[i] for i in missing], summary_type, book_id
+    )
+    results = [None] * len(topics)
+    for i, summary in enumerate(summaries):
+        if summary is not None:
+            results[i] = summary
+    for i, result in zip(missing, retried):
+        if not result.ok:
+            raise RuntimeError(f"Error generating summary for '{topics[i]}': {result.error}")
+        results[i] = result.value
+    return results
+
+async def generate_syllabus_summary(book_text: str, topics: list, summary_type: str,
+                                    topic_passages: list = None, mode: str = "concurrent", book_id: int = None):
+    """Generate a structured summary for syllabus topics using GPT-4o.
+       Each topic is summarised from its own retrieved passages (topic_passages) when given.
+       mode "concurrent" sends one request per topic in parallel; "batched" packs
+       SYLLABUS_SUMMARY_BATCH_SIZE topics into each request.
+    """
+    topics_per_request = max(1, settings.SYLLABUS_SUMMARY_BATCH_SIZE) if mode == "batched" else 1
+    contexts = _topic_contexts(book_text, topics, topic_passages, topics_per_request)
+
+    if mode == "batched":
+        summaries = await _summarize_batched(topics, contexts, summary_type, book_id)
+    else:
+        results = await _summarize_concurrently(topics, contexts, summary_type, book_id)
+        for topic, result in zip(topics, results):
+            if not result.ok:
+                raise RuntimeError(f"Error generating summary for '{topic}': {result.error}")
+        summaries = [result.value for result in results]
+    return [{"topic": topic, "summary": summary} for topic, summary in zip(topics, summaries)]
+
+async def stream_syllabus_summary(book_text: str, topics: list, summary_type: str, topic_passages: list = None,
+                                  book_id: int = None):
+    """Stream summaries topic by topic, yielding (topic index, text piece) pairs as they are generated."""
+    contexts = _topic_contexts(book_text, topics, topic_passages)
+    for index, (topic, context) in enumerate(zip(topics, contexts)):
+        try:
+            async for delta in astream_chat_completion(
+                _summary_messages(context, topic, summary_type),
+                endpoint="syllabus_summary_stream",
+                priority=PRIORITY_INTERACTIVE,
+                book_id=book_id
+            ):
+                yield index, delta
+        except Exception as e:
+            raise RuntimeError(f"Error generating summary for '{topic}': {str(e)}")
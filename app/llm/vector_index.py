@@ -0,0 +1,161 @@
+import os
+import pickle
+import threading
+from collections import OrderedDict
+import numpy as np
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.book import Book
+from app.llm.client import PRIORITY_BULK
+from app.llm.embeddings import legacy_chunk_text, embed_query, embed_queries
+from app.llm.context import pack_passages
+from app.db.embedding_store import (
+    embedding_paths,
+    write_book_embeddings,
+    open_book_embeddings,
+    read_chunk_table,
+)
+
+DEFAULT_TOP_K = 5
+CENTRAL_CANDIDATES = 64  # Most central chunks considered when packing a whole-book context
+
+class VectorIndex:
+    """Cosine-similarity index over the chunk embeddings of a single book.
+
+    Vectors are kept as one contiguous, L2-normalised float32 matrix whose rows line up
+    with ``chunks``, so a search is a single matrix-vector product. Matrices opened from
+    the embedding store are memory-mapped and used without copying. ``spans`` and ``pages``
+    hold each chunk's offsets in the book text and its page range, when they were recorded.
+    """
+
+    def __init__(self, vectors, chunks, normalized: bool = False, spans=None, pages=None):
+        matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] != len(chunks):
+            raise ValueError("Embedding matrix and chunk table must have the same number of rows.")
+        if not normalized:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix = matrix / norms
+        self.matrix = matrix
+        self.chunks = list(chunks)
+        self.spans = spans
+        self.pages = pages
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def search(self, query_vector, top_k: int = DEFAULT_TOP_K):
+        """Return (chunk_index, score) pairs for the top_k most similar chunks, best first."""
+        if len(self) == 0 or top_k <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = self.matrix @ query
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def central(self):
+        """Chunk indices ordered by similarity to the mean of all chunks, most central first."""
+        if len(self) == 0:
+            return []
+        centroid = self.matrix.mean(axis=0)
+        return [int(i) for i in np.argsort(-(self.matrix @ centroid))]
+
+_index_cache = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+def _vectors_path(book):
+    """Stored embedding path for a book, falling back to the default location."""
+    return book.embedding_path or embedding_paths(book.id)[0]
+
+def _index_from_legacy_blob(book) -> VectorIndex:
+    """Migrate books uploaded while embeddings were pickled into the books table.
+
+    The stored embeddings were produced from `legacy_chunk_text(text_content)`, which is
+    deterministic, so re-chunking recovers the parallel chunk table. The deferred columns
+    are read with a session of its own, as the caller's book may come from an async session.
+    """
+    db = SessionLocal()
+    try:
+        row = db.query(Book.embedding, Book.text_content).filter(Book.id == book.id).first()
+    finally:
+        db.close()
+    if row is None or not row.embedding:
+        return None
+    embeddings = pickle.loads(row.embedding)
+    chunks = legacy_chunk_text(row.text_content, max_tokens=512)
+    rows = min(len(chunks), len(embeddings))
+    if rows == 0:
+        return None
+    vectors_path, _ = write_book_embeddings(book.id, chunks[:rows], embeddings[:rows])
+    return VectorIndex(open_book_embeddings(vectors_path), chunks[:rows], normalized=True)
+
+def load_book_index(book) -> VectorIndex:
+    """Return the index for a book, memory-mapping it from the embedding store on first use."""
+    vectors_path = _vectors_path(book)
+    mtime = os.path.getmtime(vectors_path) if os.path.exists(vectors_path) else None
+    with _index_cache_lock:
+        cached = _index_cache.get(book.id)
+        if cached and mtime is not None and cached[0] == mtime:
+            _index_cache.move_to_end(book.id)
+            return cached[1]
+
+    if mtime is not None:
+        table = read_chunk_table(vectors_path)
+        index = VectorIndex(
+            open_book_embeddings(vectors_path), table["chunks"], normalized=True,
+            spans=table["spans"], pages=table["pages"],
+        )
+    else:
+        index = _index_from_legacy_blob(book)
+    if index is None:
+        return None
+
+    mtime = os.path.getmtime(vectors_path)
+    with _index_cache_lock:
+        _index_cache[book.id] = (mtime, index)
+        _index_cache.move_to_end(book.id)
+        while len(_index_cache) > max(1, settings.VECTOR_INDEX_CACHE_SIZE):
+            _index_cache.popitem(last=False)
+    return index
+
+def search_book(book, query: str, top_k: int = DEFAULT_TOP_K):
+    """Return the text of the top_k chunks of a book most relevant to the query."""
+    try:
+        index = load_book_index(book)
+        if index is None or len(index) == 0:
+            return []
+        hits = index.search(embed_query(query), top_k=top_k)
+    except Exception as e:
+        raise RuntimeError(f"Error searching book index: {str(e)}")
+    return [index.chunks[i] for i, _ in hits]
+
+def search_book_many(book, queries: list, top_k: int = DEFAULT_TOP_K):
+    """Like search_book for several queries at once; the queries are embedded in one batch."""
+    try:
+        index = load_book_index(book)
+        if index is None or len(index) == 0:
+            return [[] for _ in queries]
+        query_vectors = embed_queries(list(queries), priority=PRIORITY_BULK)
+        hits = [index.search(vector, top_k=top_k) for vector in query_vectors]
+    except Exception as e:
+        raise RuntimeError(f"Error searching book index: {str(e)}")
+    return [[index.chunks[i] for i, _ in query_hits] for query_hits in hits]
+
+def central_chunks(book, max_tokens: int = None):
+    """The chunks most representative of a whole book, up to max_tokens, in book order.
+       Used as context for requests that have no question to retrieve for (quizzes, study plans, ...).
+    """
+    try:
+        index = load_book_index(book)
+        if index is None or len(index) == 0:
+            return []
+        ranked = index.central()[:CENTRAL_CANDIDATES]
+    except Exception as e:
+        raise RuntimeError(f"Error searching book index: {str(e)}")
+    budget = settings.CONTEXT_MAX_TOKENS if max_tokens is None else max_tokens
+    return pack_passages([index.chunks[i] for i in ranked], budget, order=ranked)
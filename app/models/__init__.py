@@ -1,3 +1,5 @@
-from app.models.book import Book
-from app.models.history import QueryHistory
-from app.models.user import User
+from app.models.book import Book
+from app.models.history import QueryHistory
+from app.models.user import User
+from app.models.job import IngestionJob
+from app.models.artifact import BookArtifact
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from app.core.database import Base
+from datetime import datetime
+
+class BookArtifact(Base):
+    __tablename__ = "book_artifacts"
+    __table_args__ = (
+        UniqueConstraint("book_id", "artifact_type", "params_hash", "version", name="uq_book_artifact"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
+    artifact_type = Column(String, nullable=False)  # e.g. "llm_keywords", "keybert_keywords", "study_plan"
+    params_hash = Column(String, nullable=False)  # sha256 of the JSON parameters the artifact was built with
+    version = Column(Integer, nullable=False, default=1)  # Bumped when the way an artifact is built changes
+    payload = Column(String, nullable=False)  # JSON
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,13 +1,19 @@
-from sqlalchemy import Column, Integer, String, LargeBinary, DateTime, ForeignKey
-from app.core.database import Base
-from datetime import datetime
-
-class Book(Base):
-    __tablename__ = "books"
-
-    id = Column(Integer, primary_key=True, index=True)
-    filename = Column(String, unique=True, nullable=False)
-    text_content = Column(String, nullable=False)
-    embedding = Column(LargeBinary, nullable=False)
-    uploaded_at = Column(DateTime, default=datetime.utcnow)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # NEW: Associates book with a user
+from sqlalchemy import Column, Integer, String, LargeBinary, DateTime, ForeignKey
+from sqlalchemy.orm import deferred
+from app.core.database import Base
+from datetime import datetime
+
+class Book(Base):
+    __tablename__ = "books"
+
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String, unique=True, nullable=False)
+    # Large columns are deferred so listing books or checking ownership does not load them
+    text_content = deferred(Column(String, nullable=False))
+    page_offsets = deferred(Column(String, nullable=True))  # JSON list: character offset where each page starts
+    embedding = deferred(Column(LargeBinary, nullable=True))  # Legacy pickled embeddings; new books use embedding_path
+    embedding_path = Column(String, nullable=True)  # .npy matrix in data/embeddings/, opened with np.memmap
+    embedding_rows = Column(Integer, nullable=True)
+    embedding_dim = Column(Integer, nullable=True)
+    uploaded_at = Column(DateTime, default=datetime.utcnow)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # NEW: Associates book with a user
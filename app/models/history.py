@@ -1,12 +1,18 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
-from app.core.database import Base
-from datetime import datetime
-
-class QueryHistory(Base):
-    __tablename__ = "query_history"
-
-    id = Column(Integer, primary_key=True, index=True)
-    book_id = Column(Integer, ForeignKey("books.id"))
-    query = Column(String, nullable=False)
-    response = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
+from app.core.database import Base
+from datetime import datetime
+
+class QueryHistory(Base):
+    __tablename__ = "query_history"
+    # History is listed newest first per user or per book, and paged by (created_at, id)
+    __table_args__ = (
+        Index("ix_query_history_user_created", "user_id", "created_at", "id"),
+        Index("ix_query_history_book_created", "book_id", "created_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    book_id = Column(Integer, ForeignKey("books.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Copied from the book, so listing needs no join
+    query = Column(String, nullable=False)
+    response = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
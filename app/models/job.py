@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey
+from app.core.database import Base
+from datetime import datetime
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(String, primary_key=True, index=True)  # UUID hex, returned to the client on upload
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    filename = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued/running/succeeded/failed/cancelled
+    stage = Column(String, nullable=True)  # Current pipeline stage while running
+    progress = Column(Float, nullable=False, default=0.0)  # 0.0 - 1.0
+    stage_timings = Column(String, nullable=True)  # JSON object: stage -> seconds
+    error = Column(String, nullable=True)
+    book_id = Column(Integer, ForeignKey("books.id"), nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
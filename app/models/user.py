@@ -1,10 +1,10 @@
-from sqlalchemy import Column, Integer, String
-from app.core.database import Base
-
-class User(Base):
-    __tablename__ = "users"
-
-    id = Column(Integer, primary_key=True, index=True)
-    username = Column(String, unique=True, nullable=False)
-    password_hash = Column(String, nullable=False)  # Store hashed password
-    role = Column(String, default="user")  # Role (user/admin)
+from sqlalchemy import Column, Integer, String
+from app.core.database import Base
+
+class User(Base):
+    __tablename__ = "users"
+
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String, unique=True, nullable=False)
+    password_hash = Column(String, nullable=False)  # Store hashed password
+    role = Column(String, default="user")  # Role (user/admin)
@@ -1,9 +1,11 @@
-
-from app.schemas.user import UserCreate, UserResponse
-from app.schemas.answer_key import AnswerKeyResponse
-from app.schemas.quiz import QuizRequest, QuizResponse
-from app.schemas.syllabus import SyllabusTopicsResponse, SyllabusSummaryRequest, SyllabusSummaryResponse
-from app.schemas.google_search import SearchRequest, SearchResponse
-from app.schemas.question_answering import QuestionRequest, AnswerResponse
-from app.schemas.research import KeywordResponse, ResearchRequest, ResearchResponse, ResearchPaper 
-from app.schemas.study_plan import StudyPlanRequest, StudyPlanResponse
\ No newline at end of file
+
+from app.schemas.user import UserCreate, UserResponse
+from app.schemas.answer_key import AnswerKeyResponse
+from app.schemas.quiz import QuizRequest, QuizResponse
+from app.schemas.syllabus import SyllabusTopicsResponse, SyllabusSummaryRequest, SyllabusSummaryResponse
+from app.schemas.google_search import SearchRequest, SearchResponse
+from app.schemas.question_answering import QuestionRequest, AnswerResponse
+from app.schemas.research import KeywordResponse, ResearchRequest, ResearchResponse, ResearchPaper 
+from app.schemas.study_plan import StudyPlanRequest, StudyPlanResponse
+from app.schemas.job import IngestionJobResponse
+from app.schemas.library_search import LibrarySearchRequest, LibrarySearchResponse, LibraryPassage
\ No newline at end of file
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import List
-
-class AnswerKeyResponse(BaseModel):
-    answers: List[dict]  # Each item contains {'question': ..., 'answer': ...}
+from pydantic import BaseModel
+from typing import List
+
+class AnswerKeyResponse(BaseModel):
+    answers: List[dict]  # Each item contains {'question': ..., 'answer': ...}, plus 'error' if it failed
+    failed: int = 0  # Number of questions that could not be answered
@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import Dict, Optional
+from datetime import datetime
+
+class IngestionJobResponse(BaseModel):
+    id: str
+    filename: str
+    status: str  # 'queued', 'running', 'succeeded', 'failed' or 'cancelled'
+    stage: Optional[str] = None
+    progress: float
+    stage_timings: Dict[str, float] = {}  # Seconds spent in each completed stage
+    error: Optional[str] = None
+    book_id: Optional[int] = None
+    created_at: datetime
+    updated_at: datetime
@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class LibrarySearchRequest(BaseModel):
+    query: str
+    top_k: int = 10
+    book_ids: Optional[List[int]] = None  # Restrict the search to these books; default is all of the user's books
+
+class LibraryPassage(BaseModel):
+    book_id: int
+    filename: str
+    chunk_index: int
+    page: Optional[int] = None
+    start: Optional[int] = None  # Offsets of text in the book's text, for books chunked with recorded offsets
+    end: Optional[int] = None
+    text: str
+    score: float
+    lexical_rank: Optional[int] = None
+    vector_rank: Optional[int] = None
+
+class LibrarySearchResponse(BaseModel):
+    query: str
+    results: List[LibraryPassage]
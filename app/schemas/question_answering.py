@@ -1,8 +1,8 @@
-from pydantic import BaseModel
-
-class QuestionRequest(BaseModel):
-    question: str
-
-class AnswerResponse(BaseModel):
-    question: str
-    answer: str
+from pydantic import BaseModel
+
+class QuestionRequest(BaseModel):
+    question: str
+
+class AnswerResponse(BaseModel):
+    question: str
+    answer: str
@@ -1,8 +1,8 @@
-from pydantic import BaseModel
-
-
-class StudyPlanRequest(BaseModel):
-    duration: int
-
-class StudyPlanResponse(BaseModel):
+from pydantic import BaseModel
+
+
+class StudyPlanRequest(BaseModel):
+    duration: int
+
+class StudyPlanResponse(BaseModel):
     study_plan: str
\ No newline at end of file
@@ -1,12 +1,13 @@
-from pydantic import BaseModel
-from typing import List
-
-class SyllabusTopicsResponse(BaseModel):
-    topics: List[str]
-
-class SyllabusSummaryRequest(BaseModel):
-    topics: List[str]
-    summary_type: str  # 'short' or 'detailed'
-
-class SyllabusSummaryResponse(BaseModel):
-    summaries: List[dict]  # {'topic': ..., 'summary': ...}
+from pydantic import BaseModel
+from typing import List
+
+class SyllabusTopicsResponse(BaseModel):
+    topics: List[str]
+
+class SyllabusSummaryRequest(BaseModel):
+    topics: List[str]
+    summary_type: str  # 'short' or 'detailed'
+    mode: str = "concurrent"  # 'concurrent' (one request per topic) or 'batched' (several topics per request)
+
+class SyllabusSummaryResponse(BaseModel):
+    summaries: List[dict]  # {'topic': ..., 'summary': ...}
@@ -0,0 +1,153 @@
+import time
+import queue
+import threading
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import insert, select
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.book import Book
+from app.models.history import QueryHistory
+
+# Write-behind logging of query history. Requests only put a row on a queue; a background
+# thread writes queued rows in multi-row inserts, one transaction per batch, as soon as
+# HISTORY_FLUSH_BATCH_SIZE rows are waiting or HISTORY_FLUSH_INTERVAL_SECONDS after the first
+# of them arrived. On shutdown the queue is drained before the thread exits. Rows appear in
+# /api/qa/history once their batch is written, i.e. up to the flush interval later.
+
+WRITE_ATTEMPTS = 3
+_STOP = object()
+
+class HistoryWriter:
+    """Queue of pending history rows and the thread that writes them."""
+
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def start(self):
+        """Start the writer thread, if it isn't running."""
+        with self._lock:
+            if self._thread is None:
+                self._closed = False
+                self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Write everything still queued, then stop the thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._closed = True
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _count(self, key: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def submit(self, row: dict) -> bool:
+        """Queue a row for writing. Returns False, dropping the row, if the writer is stopped or
+           HISTORY_QUEUE_MAX_SIZE rows are already waiting (e.g. while the database is unavailable).
+        """
+        if self._thread is None and not self._closed:
+            self.start()
+        if self._closed:
+            self._count("dropped")
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("queued")
+        return True
+
+    def stats(self) -> dict:
+        """Rows queued, written, dropped and failed, batches written and rows still waiting."""
+        with self._stats_lock:
+            return {**self._stats, "pending": self._queue.qsize()}
+
+    def _collect(self):
+        """Wait for the next batch; returns (rows, stop requested)."""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        rows = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(rows) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                row = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if row is _STOP:
+                return rows, True
+            rows.append(row)
+        return rows, False
+
+    def _run(self):
+        while True:
+            rows, stop = self._collect()
+            if rows:
+                self._write(rows)
+            if stop:
+                return
+
+    def _write(self, rows: list):
+        """Insert a batch in one transaction, retrying a failed batch a few times before dropping it."""
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            db = SessionLocal()
+            try:
+                _fill_user_ids(db, rows)
+                db.execute(insert(QueryHistory), rows)
+                db.commit()
+                self._count("written", len(rows))
+                self._count("batches")
+                return
+            except Exception:
+                db.rollback()
+                if attempt < WRITE_ATTEMPTS:
+                    time.sleep(attempt)
+            finally:
+                db.close()
+        self._count("failed", len(rows))
+
+def _fill_user_ids(db, rows: list):
+    """Set user_id from the book's owner on rows logged without one."""
+    book_ids = {row["book_id"] for row in rows if row.get("user_id") is None and row.get("book_id") is not None}
+    if not book_ids:
+        return
+    owners = dict(db.execute(select(Book.id, Book.user_id).where(Book.id.in_(book_ids))).all())
+    for row in rows:
+        if row.get("user_id") is None:
+            row["user_id"] = owners.get(row.get("book_id"))
+
+history_writer = HistoryWriter(
+    settings.HISTORY_FLUSH_BATCH_SIZE, settings.HISTORY_FLUSH_INTERVAL_SECONDS, settings.HISTORY_QUEUE_MAX_SIZE
+)
+
+def start_history_writer():
+    history_writer.start()
+
+def stop_history_writer():
+    """Flush queued history rows; called when the server shuts down."""
+    history_writer.stop()
+
+def queue_history(book_id: int, query_text: str, response: str, user_id: int = None) -> bool:
+    """Queue a history row, timestamped now, for the background writer."""
+    return history_writer.submit({
+        "book_id": book_id,
+        "user_id": user_id,
+        "query": query_text,
+        "response": response,
+        "created_at": datetime.utcnow(),
+    })
@@ -0,0 +1,186 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.db.crud.job_crud import (
+    get_job,
+    get_interrupted_jobs,
+    claim_interrupted_job,
+    refresh_jobs,
+    release_jobs,
+    update_job,
+    record_stage_timing,
+)
+from app.db.crud.artifact_crud import delete_book_artifacts
+from app.db.library_index import get_library_index
+from app.db.crud.pdf_crud import (
+    extract_pages_from_pdf,
+    find_stored_book,
+    join_pages,
+    store_pdf_in_db,
+    shutdown_extraction_pool,
+)
+from app.llm.embeddings import create_chunk_embeddings
+from app.llm.response_cache import invalidate_book
+
+# Uploaded PDFs are processed here, off the request path. Each stage records its
+# duration on the job, and cancellation is checked between stages.
+#
+# Several server processes (uvicorn --workers N) can share the jobs table. Every process
+# refreshes the jobs it has queued or running a few times per INGESTION_JOB_LEASE_SECONDS;
+# a job left unrefreshed for longer was abandoned by a process that stopped or crashed,
+# and exactly one process takes it over through a conditional update. On shutdown, jobs
+# that haven't started or were cut short are released, so the next start resumes them at once.
+# A resumed job whose book was already stored (the process stopped between storing the book
+# and marking the job done) only finishes up instead of storing the book a second time.
+_executor = ThreadPoolExecutor(max_workers=settings.INGESTION_WORKERS, thread_name_prefix="ingestion")
+_held = {}  # job id -> future, for jobs queued or running in this process
+_held_lock = threading.Lock()
+_stopping = threading.Event()
+_monitor = None
+
+class JobCancelled(Exception):
+    """Raised inside the pipeline when the user cancelled the job."""
+
+class JobInterrupted(Exception):
+    """Raised inside the pipeline when the server is shutting down."""
+
+def submit_ingestion(job_id: str):
+    """Queue a job for processing by the worker pool."""
+    with _held_lock:
+        _held[job_id] = _executor.submit(run_ingestion, job_id)
+
+def _lease_cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=settings.INGESTION_JOB_LEASE_SECONDS)
+
+def resume_interrupted_jobs():
+    """Re-queue jobs abandoned by a server process that stopped or crashed."""
+    cutoff = _lease_cutoff()
+    db = SessionLocal()
+    try:
+        for job in get_interrupted_jobs(db, cutoff):
+            if claim_interrupted_job(db, job.id, cutoff):
+                submit_ingestion(job.id)
+    finally:
+        db.close()
+
+def _monitor_jobs():
+    """Keep this process's jobs claimed, and take over abandoned ones, until shutdown."""
+    while not _stopping.wait(settings.INGESTION_JOB_LEASE_SECONDS / 4):
+        try:
+            with _held_lock:
+                job_ids = list(_held)
+            if job_ids:
+                db = SessionLocal()
+                try:
+                    refresh_jobs(db, job_ids)
+                finally:
+                    db.close()
+            resume_interrupted_jobs()
+        except Exception:
+            continue  # e.g. the database is briefly unavailable; retried on the next round
+
+def start_job_monitor():
+    """Start the thread that refreshes this process's jobs and resumes abandoned ones."""
+    global _monitor
+    if _monitor is None:
+        _monitor = threading.Thread(target=_monitor_jobs, name="ingestion-monitor", daemon=True)
+        _monitor.start()
+
+def shutdown_ingestion_workers():
+    """Stop accepting jobs. Jobs that haven't started are released to be resumed on the next
+       start, as are running ones the shutdown interrupts (see _fail).
+    """
+    _stopping.set()
+    _executor.shutdown(wait=False, cancel_futures=True)
+    with _held_lock:
+        not_started = [job_id for job_id, future in _held.items() if future.cancelled()]
+    if not_started:
+        db = SessionLocal()
+        try:
+            release_jobs(db, not_started)
+        finally:
+            db.close()
+    shutdown_extraction_pool()
+
+def _check_cancelled(db, job):
+    if _stopping.is_set():
+        raise JobInterrupted()
+    db.refresh(job)
+    if job.cancel_requested:
+        raise JobCancelled()
+
+def _fail(db, job, error: str):
+    """Mark a job failed, unless it failed because the server is shutting down (e.g. its
+       extraction processes were stopped): then it is released to be resumed on the next start.
+    """
+    db.rollback()
+    if _stopping.is_set():
+        release_jobs(db, [job.id])
+    else:
+        update_job(db, job, status="failed", error=error)
+
+def _run_stage(db, job, stage: str, progress: float, func, *args):
+    """Run one pipeline stage, recording its start progress and duration."""
+    _check_cancelled(db, job)
+    update_job(db, job, stage=stage, progress=progress)
+    started = time.perf_counter()
+    result = func(*args)
+    record_stage_timing(db, job, stage, time.perf_counter() - started)
+    return result
+
+def _index_for_search(db, job, book_id: int, chunks: list):
+    """Add the book's chunks to the library full-text index. The book is already stored, so
+       this is not cancellable, and a failure is not fatal: search indexes missing books itself.
+    """
+    started = time.perf_counter()
+    try:
+        get_library_index().index_book(book_id, chunks)
+    except Exception:
+        return
+    record_stage_timing(db, job, "index", time.perf_counter() - started)
+
+def run_ingestion(job_id: str):
+    """Extract, embed and store one uploaded PDF, keeping the job row up to date."""
+    db = SessionLocal()
+    try:
+        job = get_job(db, job_id)
+        if job is None:
+            return
+        if job.status == "cancelled":
+            if os.path.exists(job.file_path):
+                os.remove(job.file_path)
+            return
+        update_job(db, job, status="running")
+        try:
+            book = find_stored_book(db, job.filename, job.user_id)
+            if book is None:
+                pages = _run_stage(db, job, "extract", 0.1, extract_pages_from_pdf, job.file_path)
+                text, page_offsets = join_pages(pages)
+                chunks, embeddings, spans = _run_stage(db, job, "embed", 0.5, create_chunk_embeddings, text)
+                book = _run_stage(
+                    db, job, "store", 0.9, store_pdf_in_db,
+                    db, job.filename, text, chunks, embeddings, job.user_id, page_offsets, spans,
+                )
+                _index_for_search(db, job, book.id, chunks)
+            # Otherwise the book was stored before this job was interrupted; search indexes it on first use
+            # Book IDs can be reused after a delete, so drop anything derived from an earlier book
+            invalidate_book(book.id)
+            delete_book_artifacts(db, book.id)
+            update_job(db, job, status="succeeded", stage=None, progress=1.0, book_id=book.id)
+        except JobCancelled:
+            update_job(db, job, status="cancelled", stage=None)
+            if os.path.exists(job.file_path):
+                os.remove(job.file_path)
+        except HTTPException as e:
+            _fail(db, job, str(e.detail))
+        except Exception as e:
+            _fail(db, job, str(e))
+    finally:
+        db.close()
+        with _held_lock:
+            _held.pop(job_id, None)
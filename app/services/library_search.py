@@ -0,0 +1,95 @@
+import json
+from itertools import accumulate
+from app.db.crud.pdf_crud import page_number_for_offset
+from app.db.library_index import get_library_index
+from app.llm.embeddings import embed_query
+from app.llm.vector_index import load_book_index
+
+# Hybrid search over all of a user's books: BM25 matches from the full-text index and
+# nearest chunks from the stored embeddings are merged with reciprocal rank fusion,
+# which needs no score normalisation between the two rankings.
+CANDIDATES_PER_RANKING = 50
+RRF_K = 60  # Dampens the weight of top ranks; 60 is the value from the original RRF paper
+
+def reciprocal_rank_fusion(rankings, k: int = RRF_K):
+    """Fuse ranked lists of keys into one list of (key, score), best first."""
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+def chunk_start_offsets(chunks):
+    """Character offset of each chunk in the book text, assuming the chunks tile the text.
+       Only used for books chunked before chunk offsets were recorded.
+    """
+    return [0, *accumulate(len(chunk) for chunk in chunks)][:len(chunks)]
+
+def _chunk_location(book, index, chunk_index: int, estimated: dict):
+    """(page, start, end) of a chunk; start and end are None if its offsets weren't recorded."""
+    if index.spans is not None:
+        start, end = index.spans[chunk_index]
+        page = index.pages[chunk_index][0] if index.pages is not None else None
+        return page, start, end
+    # Older chunk tables: estimate where the chunk starts from the lengths of those before it
+    if book.id not in estimated:
+        page_offsets = json.loads(book.page_offsets) if book.page_offsets else None
+        estimated[book.id] = (page_offsets, chunk_start_offsets(index.chunks))
+    page_offsets, start_offsets = estimated[book.id]
+    return page_number_for_offset(page_offsets, start_offsets[chunk_index]), None, None
+
+def search_library(books, query: str, top_k: int = 10):
+    """Rank passages of the given books (Book rows with page_offsets loaded) for a query.
+       Books missing from the full-text index are indexed from their chunk table first.
+    """
+    try:
+        return _search_library(books, query, top_k)
+    except Exception as e:
+        raise RuntimeError(f"Error searching library: {str(e)}")
+
+def _search_library(books, query: str, top_k: int):
+    indexes = {}
+    for book in books:
+        index = load_book_index(book)
+        if index is not None and len(index):
+            indexes[book.id] = index
+    if not indexes:
+        return []
+
+    library_index = get_library_index()
+    indexed = library_index.indexed_book_ids(indexes)
+    for book_id, index in indexes.items():
+        if book_id not in indexed:
+            library_index.index_book(book_id, index.chunks)
+
+    lexical = library_index.search(indexes, query, limit=CANDIDATES_PER_RANKING)
+
+    query_vector = embed_query(query)
+    vector_hits = []
+    for book_id, index in indexes.items():
+        vector_hits.extend((score, book_id, i) for i, score in index.search(query_vector, CANDIDATES_PER_RANKING))
+    vector_hits.sort(reverse=True)
+    semantic = [(book_id, i) for _, book_id, i in vector_hits[:CANDIDATES_PER_RANKING]]
+
+    lexical_ranks = {key: rank for rank, key in enumerate(lexical, start=1)}
+    semantic_ranks = {key: rank for rank, key in enumerate(semantic, start=1)}
+    books_by_id = {book.id: book for book in books}
+    estimated = {}
+    results = []
+    for (book_id, chunk_index), score in reciprocal_rank_fusion([lexical, semantic])[:top_k]:
+        book = books_by_id[book_id]
+        index = indexes[book_id]
+        page, start, end = _chunk_location(book, index, chunk_index, estimated)
+        results.append({
+            "book_id": book_id,
+            "filename": book.filename,
+            "chunk_index": chunk_index,
+            "page": page,
+            "start": start,
+            "end": end,
+            "text": index.chunks[chunk_index],
+            "score": round(score, 6),
+            "lexical_rank": lexical_ranks.get((book_id, chunk_index)),
+            "vector_rank": semantic_ranks.get((book_id, chunk_index)),
+        })
+    return results
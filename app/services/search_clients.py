@@ -0,0 +1,132 @@
+import time
+import asyncio
+import weakref
+from collections import OrderedDict, Counter
+import httpx
+from app.core.config import settings
+
+# Shared clients for the external search APIs (Serper for Google results, Crossref for papers).
+# - one pooled httpx.AsyncClient per event loop, with keep-alive and explicit timeouts
+# - results are cached per normalised query for SEARCH_CACHE_TTL_SECONDS (LRU-bounded)
+# - concurrent identical queries share a single upstream request
+
+SERPER_API_URL = "https://google.serper.dev/search"
+CROSSREF_API_URL = "https://api.crossref.org/works"
+
+class TTLCache:
+    """Least-recently-used cache whose entries also expire after ttl_seconds.
+       Only used from the event loop, so it needs no lock.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+_cache = TTLCache(settings.SEARCH_CACHE_MAX_ENTRIES, settings.SEARCH_CACHE_TTL_SECONDS)
+_in_flight = {}  # key -> task fetching it
+_stats = Counter()
+_clients = weakref.WeakKeyDictionary()  # event loop -> httpx.AsyncClient
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used as the cache key."""
+    return " ".join(query.lower().split())
+
+def get_search_client() -> httpx.AsyncClient:
+    """Pooled HTTP client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=settings.SEARCH_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=settings.SEARCH_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SEARCH_MAX_CONNECTIONS,
+            ),
+        )
+        _clients[loop] = client
+    return client
+
+async def close_search_client():
+    """Close the running loop's client, e.g. when the server shuts down."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+def search_stats() -> dict:
+    """Cache hits, coalesced requests and upstream calls since start-up."""
+    return {**_stats, "cached_queries": len(_cache)}
+
+async def _cached(key, fetch):
+    """Return a cached result, join an identical in-flight request, or start a new one."""
+    result = _cache.get(key)
+    if result is not None:
+        _stats["cache_hits"] += 1
+        return result
+
+    task = _in_flight.get(key)
+    if task is not None:
+        _stats["coalesced"] += 1
+    else:
+        _stats["upstream_calls"] += 1
+
+        async def run():
+            try:
+                value = await fetch()
+                _cache.put(key, value)  # Errors are raised to every waiter and not cached
+                return value
+            finally:
+                _in_flight.pop(key, None)
+
+        task = asyncio.ensure_future(run())
+        _in_flight[key] = task
+    # Shield so one caller disconnecting doesn't cancel the request the others are waiting on
+    return await asyncio.shield(task)
+
+async def serper_search(query: str, num_results: int = 10) -> dict:
+    """Google results for a query from the Serper API."""
+    async def fetch():
+        headers = {"X-API-KEY": settings.SERPER_API_KEY, "Content-Type": "application/json"}
+        try:
+            response = await get_search_client().post(
+                SERPER_API_URL, json={"q": query, "num": num_results}, headers=headers
+            )
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"Error fetching search results: {str(e)}")
+        if response.status_code != 200:
+            raise RuntimeError(f"Error fetching search results: {response.text}")
+        return response.json()
+
+    return await _cached(("serper", normalize_query(query), num_results), fetch)
+
+async def crossref_works(query: str, rows: int = 5) -> dict:
+    """Works matching a query from the Crossref API."""
+    async def fetch():
+        try:
+            response = await get_search_client().get(CROSSREF_API_URL, params={"query": query, "rows": rows})
+        except httpx.HTTPError:
+            raise RuntimeError("Error fetching research papers.")
+        if response.status_code != 200:
+            raise RuntimeError("Error fetching research papers.")
+        return response.json()
+
+    return await _cached(("crossref", normalize_query(query), rows), fetch)
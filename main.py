@@ -1,33 +1,88 @@
-from fastapi import FastAPI
-from app.api.auth_endpoints import router as auth_router
-from app.api.answer_key_generation import answer_key_router
-from app.api.google_search import google_search_router
-from app.api.pdf_processing import pdf_router
-from app.api.question_answering import qa_router
-from app.api.quiz_generation import quiz_router
-from app.api.research_papers import research_router
-from app.api.study_plan import study_router
-from app.api.syllabus_summary import syllabus_router
-from app.core.database import init_db
-
-app = FastAPI(title="Personalized Learning System")
-init_db()
-
-# Include authentication endpoints (register & login)
-app.include_router(auth_router, prefix="/api/auth", tags=["Authentication"])
-
-# Include other endpoints (protected endpoints require authentication)
-app.include_router(pdf_router, prefix="/api/pdf", tags=["PDF Upload"])
-app.include_router(qa_router, prefix="/api/qa", tags=["Question Answering"])
-app.include_router(quiz_router, prefix="/api/quiz", tags=["Quiz Generation"])
-app.include_router(answer_key_router, prefix="/api/answer_key", tags=["Answer Key"])
-app.include_router(syllabus_router, prefix="/api/syllabus", tags=["Syllabus Summary"])
-app.include_router(research_router, prefix="/api/research", tags=["Research Papers"])
-app.include_router(study_router, prefix="/api/study_plan", tags=["Study Plan"])
-
-# Google search remains public
-app.include_router(google_search_router, prefix="/api/search", tags=["Google Search"])
-
-@app.get("/")
-def home():
+from fastapi import FastAPI
+from app.api.auth_endpoints import router as auth_router
+from app.api.answer_key_generation import answer_key_router
+from app.api.google_search import google_search_router
+from app.api.library_search import library_search_router
+from app.api.metrics import metrics_router
+from app.api.pdf_processing import pdf_router
+from app.api.question_answering import qa_router
+from app.api.quiz_generation import quiz_router
+from app.api.research_papers import research_router
+from app.api.study_plan import study_router
+from app.api.syllabus_summary import syllabus_router
+from app.auth.passwords import shutdown_password_pool
+from app.core.config import settings
+from app.core.database import init_db
+from app.core.model_registry import model_registry
+from app.llm.client import close_clients, close_async_client
+from app.services.history_writer import start_history_writer, stop_history_writer
+from app.services.ingestion import resume_interrupted_jobs, start_job_monitor, shutdown_ingestion_workers
+from app.services.search_clients import close_search_client
+
+app = FastAPI(title="Personalized Learning System")
+init_db()
+
+# Include authentication endpoints (register & login)
+app.include_router(auth_router, prefix="/api/auth", tags=["Authentication"])
+
+# Include other endpoints (protected endpoints require authentication)
+app.include_router(pdf_router, prefix="/api/pdf", tags=["PDF Upload"])
+app.include_router(qa_router, prefix="/api/qa", tags=["Question Answering"])
+app.include_router(quiz_router, prefix="/api/quiz", tags=["Quiz Generation"])
+app.include_router(answer_key_router, prefix="/api/answer_key", tags=["Answer Key"])
+app.include_router(syllabus_router, prefix="/api/syllabus", tags=["Syllabus Summary"])
+app.include_router(research_router, prefix="/api/research", tags=["Research Papers"])
+app.include_router(study_router, prefix="/api/study_plan", tags=["Study Plan"])
+app.include_router(metrics_router, prefix="/api/metrics", tags=["Metrics"])
+
+@app.on_event("startup")
+def start_ingestion_workers():
+    # Pick up uploads that were still being processed when the server stopped, and keep this
+    # process's jobs claimed while it runs
+    resume_interrupted_jobs()
+    start_job_monitor()
+
+@app.on_event("startup")
+def start_history_logging():
+    start_history_writer()
+
+@app.on_event("startup")
+def start_model_registry():
+    # Optionally load OCR/keyword models now so the first request doesn't pay for it
+    if settings.MODEL_WARMUP:
+        model_registry.warm_up()
+    model_registry.start_idle_reaper()
+
+@app.on_event("shutdown")
+def stop_ingestion_workers():
+    shutdown_ingestion_workers()
+
+@app.on_event("shutdown")
+def stop_history_logging():
+    # Write out queued history rows before the process exits
+    stop_history_writer()
+
+@app.on_event("shutdown")
+def stop_password_hashing():
+    shutdown_password_pool()
+
+@app.on_event("shutdown")
+def stop_model_registry():
+    model_registry.stop_idle_reaper()
+
+@app.on_event("shutdown")
+async def stop_llm_client():
+    close_clients()
+    await close_async_client()
+
+@app.on_event("shutdown")
+async def stop_search_client():
+    await close_search_client()
+
+# Google search remains public
+app.include_router(google_search_router, prefix="/api/search", tags=["Google Search"])
+app.include_router(library_search_router, prefix="/api/search", tags=["Library Search"])
+
+@app.get("/")
+def home():
     return {"message": "Welcome to Personalized Learning System"}
\ No newline at end of file
@@ -0,0 +1,89 @@
+import os
+import re
+import tempfile
+import pytest
+
+# Settings are read when app.core.config is first imported, so the test environment is set
+# up before any test module imports the app: placeholder API keys, a throwaway SQLite
+# database, no on-disk LLM/embedding caches and cheap bcrypt hashes.
+_TEST_DIR = tempfile.mkdtemp(prefix="pls-tests-")
+for _name in (
+    "OPENAI_API_KEY", "GOOGLE_API_KEY", "GOOGLE_CSE_ID", "GOOGLE_CUSTOM_API_KEY", "SERPER_API_KEY",
+    "FIRECRAWL_API_KEY", "LANGSMITH_ENDPOINT", "LANGSMITH_API_KEY", "LANGSMITH_PROJECT",
+):
+    os.environ.setdefault(_name, "test")
+os.environ.update({
+    "LANGSMITH_TRACING": "false",
+    "JWT_SECRET_KEY": "test-secret",
+    "DATABASE_URL": f"sqlite:///{os.path.join(_TEST_DIR, 'test.db')}",
+    "LLM_CACHE_ENABLED": "false",
+    "EMBEDDING_CACHE_ENABLED": "false",
+    "BCRYPT_ROUNDS": "4",
+    "PASSWORD_HASH_PROCESSES": "1",
+})
+
+# get_settings() loads a developer's .env with override=True, which would put their real
+# database and keys back in place of the ones above; make it fill in unset variables only.
+import dotenv  # noqa: E402
+_load_dotenv = dotenv.load_dotenv
+dotenv.load_dotenv = lambda *args, **kwargs: _load_dotenv(*args, **{**kwargs, "override": False})
+try:
+    from app.core.config import settings  # noqa: E402
+finally:
+    dotenv.load_dotenv = _load_dotenv
+assert settings.DATABASE_URL.startswith(f"sqlite:///{_TEST_DIR}"), "Tests must not run against a real database"
+
+from tests.stub_openai import StubOpenAI  # noqa: E402
+
+class WordEncoding:
+    """Stand-in for a tiktoken encoding where every word, with its trailing whitespace, is one
+       token; it makes token counts in assertions easy to work out and needs no downloads.
+    """
+
+    TOKEN = re.compile(r"\S+\s*|\s+")
+
+    def __init__(self):
+        self._ids, self._pieces = {}, []
+
+    def encode(self, text, disallowed_special=()):
+        tokens = []
+        for piece in self.TOKEN.findall(text):
+            if piece not in self._ids:
+                self._ids[piece] = len(self._pieces)
+                self._pieces.append(piece)
+            tokens.append(self._ids[piece])
+        return tokens
+
+    def decode(self, tokens):
+        return "".join(self._pieces[token] for token in tokens)
+
+    def decode_with_offsets(self, tokens):
+        offsets, position = [], 0
+        for token in tokens:
+            offsets.append(position)
+            position += len(self._pieces[token])
+        return self.decode(tokens), offsets
+
+@pytest.fixture
+def word_encoding(monkeypatch):
+    """Tokenise by words in the chunker and the context packer."""
+    from app.llm import context, embeddings
+    encoding = WordEncoding()
+    monkeypatch.setattr(embeddings, "get_encoding", lambda model=None: encoding)
+    monkeypatch.setattr(context, "get_encoding", lambda: encoding)
+    context.count_tokens.cache_clear()
+    yield encoding
+    context.count_tokens.cache_clear()
+
+@pytest.fixture
+def stub_openai(monkeypatch):
+    """A local stand-in for the OpenAI API that the shared LLM client is pointed at."""
+    from app.core.config import settings
+    from app.llm import client
+    server = StubOpenAI()
+    server.start()
+    monkeypatch.setattr(settings, "OPENAI_BASE_URL", server.base_url)
+    client.close_clients()
+    yield server
+    client.close_clients()
+    server.stop()
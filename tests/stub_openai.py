@@ -0,0 +1,136 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A minimal local stand-in for the OpenAI HTTP API (embeddings and chat completions, plain or
+# streamed), served from a background thread. It records what it was sent, how many requests
+# were in flight at once and how many streams the client hung up on, and can be told to
+# answer the first requests with 429s or to enforce the API's per-request input limits.
+
+MAX_EMBEDDING_INPUTS = 2048
+
+def stub_vector(text: str) -> list:
+    """The vector the stub returns for a text; derived from the text so tests can check order."""
+    return [float(len(text)), float(sum(map(ord, text)) % 997), 1.0]
+
+class StubOpenAI:
+    def __init__(self):
+        self.latency = 0.0
+        self.fail_first = 0  # Requests answered with 429 before any succeeds
+        self.reply = "Stub answer."
+        self.stream_pieces = 5
+        self.stream_interval = 0.0
+        self.max_batch_tokens = None  # Reject embedding requests over this many (word) tokens
+        self.requests = []
+        self.max_in_flight = 0
+        self.disconnects = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub._handle(self, body)
+
+        class Server(ThreadingHTTPServer):
+            request_queue_size = 1024  # Load tests open hundreds of connections at once
+            daemon_threads = True
+
+        self._server = Server(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def paths(self) -> list:
+        with self._lock:
+            return [path for path, _ in self.requests]
+
+    def _handle(self, handler, body):
+        with self._lock:
+            self.requests.append((handler.path, body))
+            failing = self.fail_first > 0
+            self.fail_first -= int(failing)
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if failing:
+                self._send(handler, 429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                           {"Retry-After": "0"})
+            elif handler.path.endswith("/embeddings"):
+                self._embeddings(handler, body)
+            elif body.get("stream"):
+                self._stream(handler, body)
+            else:
+                self._send(handler, 200, {
+                    "id": "chatcmpl-stub", "object": "chat.completion", "created": 0, "model": body["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": self.reply}}],
+                    "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+                })
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _embeddings(self, handler, body):
+        inputs = body["input"]
+        tokens = sum(len(text.split()) for text in inputs)
+        if len(inputs) > MAX_EMBEDDING_INPUTS or (self.max_batch_tokens and tokens > self.max_batch_tokens):
+            self._send(handler, 400, {"error": {"message": "Too many inputs", "type": "invalid_request_error"}})
+            return
+        # Items are returned in reverse to check that the client orders them by index
+        data = [{"object": "embedding", "index": i, "embedding": stub_vector(text)} for i, text in enumerate(inputs)]
+        self._send(handler, 200, {
+            "object": "list", "data": data[::-1], "model": body["model"],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    def _stream(self, handler, body):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.end_headers()
+        chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0, "model": body["model"]}
+        try:
+            for i in range(self.stream_pieces):
+                delta = {"index": 0, "delta": {"content": f"piece{i} "}, "finish_reason": None}
+                self._event(handler, {**chunk, "choices": [delta]})
+                time.sleep(self.stream_interval)
+            usage = {"prompt_tokens": 10, "completion_tokens": self.stream_pieces,
+                     "total_tokens": 10 + self.stream_pieces}
+            self._event(handler, {**chunk, "choices": [], "usage": usage})
+            handler.wfile.write(b"data: [DONE]\n\n")
+            handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            with self._lock:
+                self.disconnects += 1
+
+    @staticmethod
+    def _event(handler, payload):
+        handler.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+        handler.wfile.flush()
+
+    @staticmethod
+    def _send(handler, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
@@ -0,0 +1,116 @@
+import asyncio
+import time
+import pytest
+from sqlalchemy import event
+from app.auth import auth
+from app.auth.auth import Principal, PrincipalCache, create_access_token, get_current_user
+from app.core.database import SessionLocal, async_engine, init_db
+from app.models.user import User
+
+ALICE = Principal(id=1, username="alice", role="user")
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(auth.time, "time", clock.time)
+    return clock
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = PrincipalCache(max_entries=10, ttl_seconds=30)
+    cache.put("token", ALICE, token_expires_at=clock.now + 3600)
+    clock.now += 29
+    assert cache.get("token") == ALICE
+    clock.now += 2
+    assert cache.get("token") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 0}
+
+def test_entries_never_outlive_the_token(clock):
+    cache = PrincipalCache(max_entries=10, ttl_seconds=300)
+    cache.put("token", ALICE, token_expires_at=clock.now + 10)
+    clock.now += 11
+    assert cache.get("token") is None
+
+def test_least_recently_used_entries_are_evicted(clock):
+    cache = PrincipalCache(max_entries=2, ttl_seconds=300)
+    cache.put("a", ALICE, clock.now + 600)
+    cache.put("b", ALICE, clock.now + 600)
+    cache.get("a")
+    cache.put("c", ALICE, clock.now + 600)
+    assert cache.get("b") is None
+    assert cache.get("a") == ALICE and cache.get("c") == ALICE
+
+def test_invalidating_a_user_drops_all_their_tokens(clock):
+    cache = PrincipalCache(max_entries=10, ttl_seconds=300)
+    bob = Principal(id=2, username="bob", role="user")
+    cache.put("a1", ALICE, clock.now + 600)
+    cache.put("a2", ALICE, clock.now + 600)
+    cache.put("b1", bob, clock.now + 600)
+    cache.invalidate_user(ALICE.id)
+    assert cache.get("a1") is None and cache.get("a2") is None
+    assert cache.get("b1") == bob
+
+def test_a_zero_size_cache_stores_nothing(clock):
+    cache = PrincipalCache(max_entries=0, ttl_seconds=300)
+    cache.put("token", ALICE, clock.now + 600)
+    assert cache.get("token") is None
+
+@pytest.fixture
+def user():
+    init_db()
+    db = SessionLocal()
+    user = User(username="cache-bench", password_hash="unused", role="user")
+    db.add(user)
+    db.commit()
+    yield user
+    db.delete(user)
+    db.commit()
+    db.close()
+
+def test_updating_the_user_row_invalidates_cached_principals(user, monkeypatch):
+    monkeypatch.setattr(auth, "principal_cache", PrincipalCache(max_entries=10, ttl_seconds=300))
+    token = create_access_token({"sub": str(user.id)})
+    assert asyncio.run(get_current_user(token)).role == "user"
+
+    db = SessionLocal()
+    db.get(User, user.id).role = "admin"
+    db.commit()
+    db.close()
+
+    assert asyncio.run(get_current_user(token)).role == "admin"
+
+def test_benchmark_cached_token_resolution_skips_the_database(user, monkeypatch):
+    # Microbenchmark: resolve the same token repeatedly with and without the principal cache
+    token = create_access_token({"sub": str(user.id)})
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(async_engine.sync_engine, "before_cursor_execute", listener)
+
+    async def resolve(times):
+        started = time.perf_counter()
+        for _ in range(times):
+            await get_current_user(token)
+        return time.perf_counter() - started
+
+    async def run():
+        monkeypatch.setattr(auth, "principal_cache", PrincipalCache(max_entries=0, ttl_seconds=300))
+        uncached = await resolve(200)
+        uncached_queries = len(statements)
+        monkeypatch.setattr(auth, "principal_cache", PrincipalCache(max_entries=10, ttl_seconds=300))
+        cached = await resolve(200)
+        return uncached, uncached_queries, cached, len(statements) - uncached_queries
+
+    try:
+        uncached, uncached_queries, cached, cached_queries = asyncio.run(run())
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", listener)
+    print(f"\nget_current_user x200: uncached {uncached * 1000:.1f} ms, cached {cached * 1000:.1f} ms")
+    assert uncached_queries == 200
+    assert cached_queries == 1
+    assert cached < uncached
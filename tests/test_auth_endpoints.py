@@ -0,0 +1,55 @@
+import asyncio
+import httpx
+import pytest
+from app.auth import passwords
+from app.core.database import SessionLocal
+from app.models.user import User
+
+# End-to-end through the app's routers: hashing and verification run in the password
+# process pool, so these also check that what is sent to the workers can be pickled.
+
+@pytest.fixture
+def app():
+    from main import app
+    yield app
+    passwords.shutdown_password_pool()
+    db = SessionLocal()
+    db.query(User).filter(User.username.like("e2e-%")).delete(synchronize_session=False)
+    db.commit()
+    db.close()
+
+async def _register_and_login(app, username, password, login_password):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        registered = await http.post("/api/auth/register", json={"username": username, "password": password})
+        duplicate = await http.post("/api/auth/register", json={"username": username, "password": password})
+        login = await http.post("/api/auth/login", data={"username": username, "password": login_password})
+        books = None
+        if login.status_code == 200:
+            token = login.json()["access_token"]
+            books = await http.get("/api/pdf/list_books", headers={"Authorization": f"Bearer {token}"})
+    return registered, duplicate, login, books
+
+def test_a_registered_user_can_log_in(app):
+    registered, duplicate, login, books = asyncio.run(_register_and_login(app, "e2e-alice", "s3cret", "s3cret"))
+    assert registered.status_code == 200
+    assert registered.json()["username"] == "e2e-alice"
+    assert duplicate.status_code == 400
+    assert login.status_code == 200
+    assert login.json()["token_type"] == "bearer"
+    assert books.status_code == 200
+
+    db = SessionLocal()
+    stored = db.query(User).filter(User.username == "e2e-alice").one().password_hash
+    db.close()
+    assert stored.startswith("$2b$04$")  # bcrypt at the configured cost, not the plain password
+
+def test_a_wrong_password_is_rejected(app):
+    _, _, login, _ = asyncio.run(_register_and_login(app, "e2e-bob", "s3cret", "wrong"))
+    assert login.status_code == 401
+
+def test_hashing_is_refused_when_too_many_are_pending(app, monkeypatch):
+    monkeypatch.setattr(passwords.settings, "PASSWORD_HASH_MAX_PENDING", 0)
+    registered, _, _, _ = asyncio.run(_register_and_login(app, "e2e-carol", "s3cret", "s3cret"))
+    assert registered.status_code == 503
+    assert registered.headers["Retry-After"] == "1"
@@ -0,0 +1,51 @@
+from app.llm.embeddings import chunk_spans, chunk_text
+
+# With the word_encoding fixture a token is a word with its trailing whitespace.
+
+def _sentence(i, words=5):
+    return " ".join([f"s{i}"] * (words - 1) + [f"s{i}."])
+
+def test_chunks_are_exact_trimmed_slices_within_the_token_limit(word_encoding):
+    text = " ".join(_sentence(i) for i in range(40))
+    spans = list(chunk_spans(text, max_tokens=22, overlap_tokens=0))
+    assert len(spans) > 1
+    for start, end, tokens in spans:
+        chunk = text[start:end]
+        assert chunk == chunk.strip()
+        assert tokens <= 22
+        assert len(chunk.split()) <= 22
+    assert chunk_text(text, max_tokens=22, overlap_tokens=0) == [text[start:end] for start, end, _ in spans]
+
+def test_chunks_end_at_sentence_boundaries_and_cover_the_text(word_encoding):
+    text = " ".join(_sentence(i) for i in range(40))
+    spans = list(chunk_spans(text, max_tokens=22, overlap_tokens=0))
+    assert all(text[end - 1] == "." for _, end, _ in spans)
+    assert " ".join(text[start:end] for start, end, _ in spans) == text  # No overlap, nothing lost
+    assert [tokens for _, _, tokens in spans][:-1] == [20] * (len(spans) - 1)  # Four sentences each
+
+def test_chunks_repeat_the_last_sentences_of_the_previous_one(word_encoding):
+    text = " ".join(_sentence(i) for i in range(20))
+    chunks = chunk_text(text, max_tokens=20, overlap_tokens=5)
+    for previous, current in zip(chunks, chunks[1:]):
+        last_sentence = previous.rsplit(". ", 1)[-1]
+        assert current.startswith(last_sentence)
+    assert chunks[-1].endswith(_sentence(19))
+
+def test_overlap_is_capped_at_half_a_chunk(word_encoding):
+    text = " ".join(_sentence(i) for i in range(20))
+    assert chunk_text(text, max_tokens=10, overlap_tokens=50) == chunk_text(text, max_tokens=10, overlap_tokens=5)
+
+def test_a_sentence_longer_than_a_chunk_is_split_between_words(word_encoding):
+    text = "Intro. " + " ".join(f"w{i}" for i in range(25)) + "."
+    spans = list(chunk_spans(text, max_tokens=10, overlap_tokens=0))
+    assert all(tokens <= 10 for _, _, tokens in spans)
+    assert " ".join(text[start:end] for start, end, _ in spans).split() == text.split()
+
+def test_a_paragraph_break_ends_a_mostly_full_chunk(word_encoding):
+    text = _sentence(0, 8) + "\n\n" + _sentence(1, 8) + " " + _sentence(2, 8)
+    chunks = chunk_text(text, max_tokens=10, overlap_tokens=0)
+    assert chunks[0] == _sentence(0, 8)
+
+def test_empty_and_blank_text_has_no_chunks(word_encoding):
+    assert list(chunk_spans("", max_tokens=10)) == []
+    assert list(chunk_spans(" \n\n  ", max_tokens=10)) == []
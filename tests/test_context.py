@@ -0,0 +1,31 @@
+from app.llm.context import build_context, pack_passages, truncate_to_tokens
+
+# With the word_encoding fixture every word is a token and the passage separator costs 2.
+
+def test_duplicates_and_passages_inside_chosen_ones_are_dropped(word_encoding):
+    passages = ["the cell membrane controls transport", "The  cell membrane", "the cell membrane controls transport"]
+    assert pack_passages(passages, 100) == ["the cell membrane controls transport"]
+
+def test_a_passage_containing_chosen_ones_replaces_them(word_encoding):
+    passages = ["cell membrane", "mitosis has four phases", "the cell membrane controls transport"]
+    assert pack_passages(passages, 100) == ["the cell membrane controls transport", "mitosis has four phases"]
+
+def test_a_containing_passage_that_does_not_fit_leaves_the_chosen_one(word_encoding):
+    passages = ["cell membrane", "the cell membrane controls transport of ions and water"]
+    assert pack_passages(passages, 5) == ["cell membrane"]
+
+def test_passages_that_do_not_fit_are_skipped_for_shorter_later_ones(word_encoding):
+    passages = ["one two three", "four five six seven eight", "nine"]
+    # 3 + (2 + 5) is over budget; 3 + (2 + 1) fits
+    assert pack_passages(passages, 7) == ["one two three", "nine"]
+
+def test_an_oversized_first_passage_is_truncated(word_encoding):
+    assert pack_passages(["a b c d e f"], 3) == ["a b c "]
+    assert truncate_to_tokens("a b c", 0) == ""
+
+def test_chosen_passages_are_sorted_by_order(word_encoding):
+    assert pack_passages(["late chunk", "early chunk"], 100, order=[7, 2]) == ["early chunk", "late chunk"]
+
+def test_build_context_falls_back_to_the_start_of_the_book(word_encoding):
+    assert build_context([], "chapter one begins here", 2) == "chapter one "
+    assert build_context(["first", "second"], "unused", 100) == "first\n\n---\n\nsecond"
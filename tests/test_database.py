@@ -0,0 +1,101 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from sqlalchemy import create_engine, text
+from app.core.config import settings
+from app.core.database import _engine_options, async_database_url, create_db_engine
+
+WRITERS = 16
+WRITES_PER_WRITER = 50
+READERS = 4
+
+def test_async_urls_use_the_async_driver_of_the_same_database():
+    assert async_database_url("sqlite:///./data/app.db") == "sqlite+aiosqlite:///./data/app.db"
+    assert async_database_url("postgresql://u:p@db:5432/app") == "postgresql+asyncpg://u:p@db:5432/app"
+
+def test_only_server_databases_get_a_sized_pool():
+    assert _engine_options("sqlite:///x.db") == {"connect_args": {"check_same_thread": False}}
+    options = _engine_options("postgresql://u:p@db/app")
+    assert options["pool_size"] == settings.DB_POOL_SIZE
+    assert options["pool_pre_ping"] is True
+
+def test_sqlite_connections_are_tuned_on_connect(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == settings.SQLITE_BUSY_TIMEOUT_MS
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+    engine.dispose()
+
+def _hammer(engine):
+    """WRITERS threads each commit WRITES_PER_WRITER single-row transactions while READERS
+       threads count rows; returns (seconds, errors).
+    """
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS bench_writes"))
+        conn.execute(text("CREATE TABLE bench_writes (id INTEGER PRIMARY KEY, writer INTEGER, n INTEGER)"))
+    errors = []
+    done = False
+
+    def write(writer):
+        for n in range(WRITES_PER_WRITER):
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text("INSERT INTO bench_writes (id, writer, n) VALUES (:id, :writer, :n)"),
+                                 {"id": writer * WRITES_PER_WRITER + n, "writer": writer, "n": n})
+            except Exception as e:
+                errors.append(e)
+
+    def read(_):
+        while not done:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT COUNT(*) FROM bench_writes")).scalar()
+            except Exception as e:
+                errors.append(e)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(WRITERS + READERS) as pool:
+        readers = [pool.submit(read, i) for i in range(READERS)]
+        for future in [pool.submit(write, i) for i in range(WRITERS)]:
+            future.result()
+        done = True
+        for future in readers:
+            future.result()
+    elapsed = time.perf_counter() - started
+    with engine.begin() as conn:
+        written = conn.execute(text("SELECT COUNT(*) FROM bench_writes")).scalar()
+        conn.execute(text("DROP TABLE bench_writes"))
+    assert written + len(errors) >= WRITERS * WRITES_PER_WRITER
+    return elapsed, errors
+
+def _report(name, elapsed, errors):
+    writes = WRITERS * WRITES_PER_WRITER
+    print(f"\n{name}: {writes} writes by {WRITERS} threads with {READERS} readers in {elapsed:.2f}s "
+          f"({writes / elapsed:.0f}/s), {len(errors)} errors")
+
+def test_benchmark_concurrent_writers_on_sqlite(tmp_path):
+    # Benchmark: the tuned engine against SQLAlchemy's defaults (rollback journal, readers
+    # blocking the writer) under the same write load. The tuned engine must not fail a write.
+    tuned = create_db_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    default = create_engine(f"sqlite:///{tmp_path / 'default.db'}", connect_args={"check_same_thread": False})
+    try:
+        tuned_seconds, tuned_errors = _hammer(tuned)
+        default_seconds, default_errors = _hammer(default)
+    finally:
+        tuned.dispose()
+        default.dispose()
+    _report("sqlite tuned", tuned_seconds, tuned_errors)
+    _report("sqlite default", default_seconds, default_errors)
+    assert tuned_errors == []
+
+@pytest.mark.skipif(not os.getenv("BENCHMARK_POSTGRES_URL"), reason="set BENCHMARK_POSTGRES_URL to run")
+def test_benchmark_concurrent_writers_on_postgres():
+    engine = create_db_engine(os.environ["BENCHMARK_POSTGRES_URL"])
+    try:
+        elapsed, errors = _hammer(engine)
+    finally:
+        engine.dispose()
+    _report("postgres", elapsed, errors)
+    assert errors == []
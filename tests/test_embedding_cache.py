@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from app.llm import embeddings
+from app.llm.embedding_cache import EmbeddingCache
+from app.llm.embeddings import EMBEDDING_MODEL, embed_chunks, embed_query
+from tests.stub_openai import stub_vector
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = EmbeddingCache(str(tmp_path / "embedding_cache.sqlite3"), max_entries=3)
+    monkeypatch.setattr(embeddings, "get_embedding_cache", lambda: cache)
+    return cache
+
+def test_get_many_returns_none_for_unknown_texts(cache):
+    cache.put_many(EMBEDDING_MODEL, ["known"], [[1.0, 2.0]])
+    found = cache.get_many(EMBEDDING_MODEL, ["known", "unknown"])
+    assert np.array_equal(found[0], np.array([1.0, 2.0], dtype=np.float32))
+    assert found[1] is None
+    assert cache.get_many("other-model", ["known"]) == [None]
+
+def test_least_recently_used_entries_are_evicted(cache):
+    cache.put_many(EMBEDDING_MODEL, ["a", "b", "c"], [[1.0], [2.0], [3.0]])
+    cache.get_many(EMBEDDING_MODEL, ["a"])
+    cache.put_many(EMBEDDING_MODEL, ["d"], [[4.0]])
+    assert len(cache) == 3
+    assert [vector is not None for vector in cache.get_many(EMBEDDING_MODEL, ["a", "b", "c", "d"])] == [
+        True, False, True, True
+    ]
+
+def test_the_entry_limit_holds_across_processes_sharing_the_file(cache, tmp_path):
+    other_process = EmbeddingCache(str(tmp_path / "embedding_cache.sqlite3"), max_entries=3)
+    cache.put_many(EMBEDDING_MODEL, ["a", "b"], [[1.0], [2.0]])
+    other_process.put_many(EMBEDDING_MODEL, ["c", "d"], [[3.0], [4.0]])
+    cache.put_many(EMBEDDING_MODEL, ["e"], [[5.0]])
+    assert len(cache) == len(other_process) == 3
+
+def test_cached_chunks_are_not_sent_again(stub_openai, cache):
+    chunks = ["first passage", "second passage"]
+    first = embed_chunks(chunks, token_counts=[2, 2])
+    second = embed_chunks(chunks, token_counts=[2, 2])
+    assert len(stub_openai.requests) == 1
+    assert [list(vector) for vector in second] == first == [stub_vector(chunk) for chunk in chunks]
+
+def test_repeated_texts_are_embedded_once(stub_openai, cache):
+    chunks = ["same passage", "other passage", "same passage"]
+    vectors = embed_chunks(chunks, token_counts=[2, 2, 2])
+    assert [body["input"] for _, body in stub_openai.requests] == [["same passage", "other passage"]]
+    assert vectors[0] == vectors[2] == stub_vector("same passage")
+
+def test_query_embeddings_bypass_the_cache(stub_openai, cache, word_encoding):
+    assert embed_query("what is entropy?") == stub_vector("what is entropy?")
+    assert embed_query("what is entropy?") == stub_vector("what is entropy?")
+    assert len(cache) == 0
+    assert len(stub_openai.requests) == 2
@@ -0,0 +1,55 @@
+from app.core.config import settings
+from app.llm.embeddings import pack_batches, embed_chunks, create_chunk_embeddings
+from tests.stub_openai import stub_vector
+
+def test_pack_batches_respects_token_and_item_budgets():
+    counts = [40, 30, 50, 10, 10, 10, 90]
+    batches = pack_batches(counts, max_tokens=100, max_items=3)
+    assert batches == [[0, 1], [2, 3, 4], [5, 6]]
+    for batch in batches:
+        assert len(batch) <= 3
+        assert sum(counts[i] for i in batch) <= 100
+
+def test_pack_batches_gives_an_oversized_chunk_its_own_batch():
+    assert pack_batches([10, 500, 10], max_tokens=100, max_items=10) == [[0], [1], [2]]
+
+def test_pack_batches_keeps_every_index_once_in_order():
+    counts = [(i * 37) % 120 + 1 for i in range(1000)]
+    batches = pack_batches(counts, max_tokens=1000, max_items=64)
+    assert [i for batch in batches for i in batch] == list(range(1000))
+
+def test_pack_batches_of_nothing():
+    assert pack_batches([], max_tokens=100, max_items=10) == []
+
+def test_embed_chunks_splits_a_large_book_into_bounded_concurrent_batches(stub_openai, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_MAX_TOKENS", 2000)
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_MAX_ITEMS", 64)
+    monkeypatch.setattr(settings, "EMBEDDING_MAX_CONCURRENCY", 4)
+    stub_openai.latency = 0.02
+    stub_openai.max_batch_tokens = 2000
+    chunks = [f"chunk {i} " + "word " * 20 for i in range(3000)]
+
+    vectors = embed_chunks(chunks, token_counts=[len(chunk.split()) for chunk in chunks])
+
+    assert vectors == [stub_vector(chunk) for chunk in chunks]
+    sent = [body["input"] for path, body in stub_openai.requests]
+    assert all(len(inputs) <= 64 for inputs in sent)
+    assert sorted(text for inputs in sent for text in inputs) == sorted(chunks)
+    assert 1 < stub_openai.max_in_flight <= 4
+
+def test_embed_chunks_retries_rate_limited_batches(stub_openai):
+    stub_openai.fail_first = 2
+    chunks = ["first passage", "second passage"]
+    assert embed_chunks(chunks, token_counts=[2, 2]) == [stub_vector(chunk) for chunk in chunks]
+    assert len(stub_openai.requests) == 3
+
+def test_create_chunk_embeddings_returns_chunks_vectors_and_spans(stub_openai, word_encoding, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_MAX_TOKENS", 200)
+    text = " ".join(f"Sentence number {i} of the book." for i in range(500))
+
+    chunks, vectors, spans = create_chunk_embeddings(text)
+
+    assert len(chunks) == len(vectors) == len(spans) > 1
+    assert [text[start:end] for start, end in spans] == chunks
+    assert vectors == [stub_vector(chunk) for chunk in chunks]
+    assert len(stub_openai.requests) > 1
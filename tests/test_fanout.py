@@ -0,0 +1,43 @@
+import asyncio
+from app.llm.fanout import fan_out
+
+def test_results_keep_input_order_and_concurrency_is_bounded():
+    running, peak = 0, 0
+
+    async def worker(item):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01 * (5 - item % 5))  # Later items finish first
+        running -= 1
+        return item * 2
+
+    results = asyncio.run(fan_out(list(range(20)), worker, limit=4, timeout=5))
+    assert [result.index for result in results] == list(range(20))
+    assert [result.value for result in results] == [item * 2 for item in range(20)]
+    assert all(result.ok for result in results)
+    assert peak == 4
+
+def test_a_failing_or_slow_item_does_not_abort_the_others():
+    async def worker(item):
+        if item == "fail":
+            raise RuntimeError("model error")
+        if item == "slow":
+            await asyncio.sleep(1)
+        return item.upper()
+
+    results = asyncio.run(fan_out(["a", "fail", "slow", "b"], worker, limit=4, timeout=0.1))
+    assert [(result.value, result.error) for result in results] == [
+        ("A", None),
+        (None, "model error"),
+        (None, "Timed out after 0.1 seconds."),
+        ("B", None),
+    ]
+    assert [result.ok for result in results] == [True, False, False, True]
+
+def test_a_limit_below_one_still_makes_progress():
+    async def worker(item):
+        return item
+
+    results = asyncio.run(fan_out([1, 2], worker, limit=0, timeout=1))
+    assert [result.value for result in results] == [1, 2]
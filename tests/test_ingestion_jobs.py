@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime, timedelta
+import httpx
+import pytest
+from app.api import pdf_processing
+from app.auth.auth import create_access_token
+from app.core.database import SessionLocal, init_db
+from app.db.crud.job_crud import claim_interrupted_job, get_interrupted_jobs, refresh_jobs, release_jobs
+from app.models.book import Book
+from app.models.job import IngestionJob
+from app.models.user import User
+from app.services import ingestion
+
+@pytest.fixture
+def db():
+    init_db()
+    session = SessionLocal()
+    yield session
+    session.query(IngestionJob).delete()
+    session.query(Book).filter(Book.filename.like("job-test-%")).delete(synchronize_session=False)
+    session.query(User).filter(User.username.like("job-test-%")).delete(synchronize_session=False)
+    session.commit()
+    session.close()
+
+def _job(db, job_id, status="running", age_seconds=600):
+    job = IngestionJob(
+        id=job_id, user_id=1, filename=f"{job_id}.pdf", file_path=f"/tmp/{job_id}.pdf", status=status,
+        stage="embed", progress=0.5, updated_at=datetime.utcnow() - timedelta(seconds=age_seconds),
+    )
+    db.add(job)
+    db.commit()
+    return job
+
+def test_only_jobs_not_refreshed_within_the_lease_are_interrupted(db):
+    _job(db, "stale")
+    _job(db, "fresh", age_seconds=5)
+    _job(db, "done", status="succeeded")
+    cutoff = datetime.utcnow() - timedelta(seconds=60)
+    assert [job.id for job in get_interrupted_jobs(db, cutoff)] == ["stale"]
+
+def test_an_interrupted_job_is_claimed_by_one_process_only(db):
+    _job(db, "stale")
+    cutoff = datetime.utcnow() - timedelta(seconds=60)
+    other_process = SessionLocal()
+    try:
+        assert claim_interrupted_job(db, "stale", cutoff)
+        assert not claim_interrupted_job(other_process, "stale", cutoff)
+    finally:
+        other_process.close()
+    job = db.get(IngestionJob, "stale")
+    db.refresh(job)
+    assert (job.status, job.stage, job.progress) == ("queued", None, 0.0)
+
+def test_refreshed_jobs_are_not_taken_over(db):
+    _job(db, "held")
+    refresh_jobs(db, ["held"])
+    assert not claim_interrupted_job(db, "held", datetime.utcnow() - timedelta(seconds=60))
+
+def test_released_jobs_are_resumed_at_once(db):
+    _job(db, "released", age_seconds=0)
+    release_jobs(db, ["released"])
+    assert claim_interrupted_job(db, "released", datetime.utcnow() - timedelta(seconds=60))
+
+def test_resume_submits_each_interrupted_job_once(db, monkeypatch):
+    _job(db, "stale")
+    submitted = []
+    monkeypatch.setattr(ingestion, "submit_ingestion", submitted.append)
+    ingestion.resume_interrupted_jobs()
+    ingestion.resume_interrupted_jobs()  # e.g. a second server process starting up
+    assert submitted == ["stale"]
+
+def test_a_job_failing_during_shutdown_is_released_not_failed(db, monkeypatch):
+    job = _job(db, "interrupted", age_seconds=0)
+    stopping = ingestion.threading.Event()
+    stopping.set()
+    monkeypatch.setattr(ingestion, "_stopping", stopping)
+    ingestion._fail(db, job, "A process in the process pool was terminated abruptly")
+    db.refresh(job)
+    assert (job.status, job.error) == ("queued", None)
+    assert claim_interrupted_job(db, "interrupted", datetime.utcnow() - timedelta(seconds=60))
+
+def test_a_job_failing_otherwise_is_failed(db):
+    job = _job(db, "broken", age_seconds=0)
+    ingestion._fail(db, job, "not a PDF")
+    db.refresh(job)
+    assert (job.status, job.error) == ("failed", "not a PDF")
+
+def test_a_job_resumed_after_its_book_was_stored_does_not_store_it_again(db, monkeypatch):
+    job = _job(db, "stored", age_seconds=0)
+    job.filename = "job-test-stored.pdf"
+    book = Book(filename="job-test-stored.pdf", text_content="Already stored.", user_id=1)
+    db.add(book)
+    db.commit()
+
+    def extract(path):
+        raise AssertionError("the pipeline ran again")
+
+    monkeypatch.setattr(ingestion, "extract_pages_from_pdf", extract)
+    ingestion.run_ingestion("stored")
+    db.refresh(job)
+    assert (job.status, job.book_id, job.error) == ("succeeded", book.id, None)
+    assert db.query(Book).filter(Book.filename == "job-test-stored.pdf").count() == 1
+
+def test_uploads_with_the_same_name_are_stored_per_job(db, tmp_path, monkeypatch):
+    from main import app
+    monkeypatch.setattr(pdf_processing, "BOOKS_FOLDER", str(tmp_path))
+    monkeypatch.setattr(pdf_processing, "submit_ingestion", lambda job_id: None)
+    users = [User(username=f"job-test-{i}", password_hash="unused") for i in range(2)]
+    db.add_all(users)
+    db.commit()
+
+    async def upload(user, content):
+        transport = httpx.ASGITransport(app=app)
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user.id)})}"}
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as http:
+            response = await http.post("/api/pdf/upload_pdf", files={"file": ("notes.pdf", content, "application/pdf")})
+        return response.json()["job_id"]
+
+    job_ids = [asyncio.run(upload(user, f"%PDF {i}".encode())) for i, user in enumerate(users)]
+    jobs = [db.get(IngestionJob, job_id) for job_id in job_ids]
+    assert [job.file_path for job in jobs] == [str(tmp_path / f"{job_id}.pdf") for job_id in job_ids]
+
+    jobs[0].status = "cancelled"
+    db.commit()
+    ingestion.run_ingestion(job_ids[0])  # A cancelled job deletes its own file only
+    assert not (tmp_path / f"{job_ids[0]}.pdf").exists()
+    assert (tmp_path / f"{job_ids[1]}.pdf").read_bytes() == b"%PDF 1"
@@ -0,0 +1,95 @@
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+import pytest
+from app.core.config import settings
+from app.db import embedding_store
+from app.db.library_index import LibraryIndex, match_expression
+from app.llm import vector_index
+from app.services import library_search
+from app.services.library_search import RRF_K, chunk_start_offsets, reciprocal_rank_fusion, search_library
+from tests.stub_openai import stub_vector
+
+def test_keys_ranked_well_by_both_rankings_come_first():
+    lexical = ["a", "b", "c"]
+    semantic = ["b", "d", "a"]
+    fused = reciprocal_rank_fusion([lexical, semantic])
+    assert [key for key, _ in fused] == ["b", "a", "d", "c"]
+    scores = dict(fused)
+    assert scores["b"] == pytest.approx(1 / (RRF_K + 2) + 1 / (RRF_K + 1))
+    assert scores["c"] == pytest.approx(1 / (RRF_K + 3))
+
+def test_fusion_handles_one_sided_and_empty_rankings():
+    assert reciprocal_rank_fusion([]) == []
+    assert reciprocal_rank_fusion([[], ["x", "y"]]) == [("x", 1 / (RRF_K + 1)), ("y", 1 / (RRF_K + 2))]
+
+def test_a_small_k_favours_top_ranks():
+    # With k=0, first place in one ranking beats second place in both
+    fused = reciprocal_rank_fusion([["a", "b"], ["c", "b"]], k=0)
+    assert fused[0][0] in ("a", "c")
+    assert dict(fused)["b"] == pytest.approx(1.0)
+
+def test_chunk_start_offsets_assume_chunks_tile_the_text():
+    assert chunk_start_offsets(["abc", "de", "f"]) == [0, 3, 5]
+    assert chunk_start_offsets([]) == []
+
+def test_match_expression_quotes_every_word():
+    assert match_expression('Newton\'s "laws" OR motion*') == '"newton" OR "s" OR "laws" OR "or" OR "motion"'
+    assert match_expression("?!") is None
+
+def test_bm25_index_searches_only_the_given_books(tmp_path):
+    index = LibraryIndex(str(tmp_path / "fts.db"))
+    index.index_book(1, ["photosynthesis in plants", "cell division", "plants need light for photosynthesis"])
+    index.index_book(2, ["photosynthesis overview"])
+    assert index.indexed_book_ids([1, 2, 3]) == {1, 2}
+
+    hits = index.search([1], "photosynthesis plants")
+    assert set(hits) == {(1, 0), (1, 2)}
+    assert (2, 0) in index.search([1, 2], "photosynthesis")
+
+    index.index_book(1, ["only geology now"])  # Reindexing replaces the book's chunks
+    assert index.search([1], "photosynthesis") == []
+    index.delete_book(2)
+    assert index.indexed_book_ids([1, 2]) == {1}
+
+LIBRARY_BOOKS = 40
+CHUNKS_PER_BOOK = 200
+
+@pytest.fixture
+def library(tmp_path, monkeypatch, stub_openai, word_encoding):
+    """LIBRARY_BOOKS stored books, more than the old fixed cache of 16 indexes held."""
+    monkeypatch.setattr(embedding_store, "EMBEDDINGS_FOLDER", str(tmp_path))
+    monkeypatch.setattr(vector_index, "_index_cache", OrderedDict())
+    index = LibraryIndex(str(tmp_path / "fts.db"))
+    monkeypatch.setattr(library_search, "get_library_index", lambda: index)
+    books = []
+    for book_id in range(1, LIBRARY_BOOKS + 1):
+        chunks = [f"book {book_id} passage {i} about topic{i % 7}" for i in range(CHUNKS_PER_BOOK)]
+        path, _ = embedding_store.write_book_embeddings(book_id, chunks, [stub_vector(chunk) for chunk in chunks])
+        books.append(SimpleNamespace(id=book_id, filename=f"book{book_id}.pdf", page_offsets=None, embedding_path=path))
+    loads = []
+    read_chunk_table = vector_index.read_chunk_table
+    monkeypatch.setattr(vector_index, "read_chunk_table", lambda path: loads.append(path) or read_chunk_table(path))
+    return books, loads
+
+def _timed_search(books, query):
+    started = time.perf_counter()
+    results = search_library(books, query, top_k=10)
+    return results, time.perf_counter() - started
+
+def test_benchmark_library_search_keeps_every_index_of_a_large_library_loaded(library, monkeypatch):
+    books, loads = library
+    _, cold = _timed_search(books, "topic3 passage")
+    assert len(loads) == LIBRARY_BOOKS
+    results, warm = _timed_search(books, "topic5 passage")
+    assert len(loads) == LIBRARY_BOOKS  # Nothing reloaded
+    assert len(results) == 10
+
+    monkeypatch.setattr(settings, "VECTOR_INDEX_CACHE_SIZE", 16)  # The previous fixed size
+    monkeypatch.setattr(vector_index, "_index_cache", OrderedDict())
+    _timed_search(books, "topic1 passage")
+    loads.clear()
+    _, thrashing = _timed_search(books, "topic2 passage")
+    assert len(loads) == LIBRARY_BOOKS
+    print(f"\nlibrary search over {LIBRARY_BOOKS} books: cold {cold * 1000:.1f} ms, "
+          f"warm {warm * 1000:.1f} ms, with a 16-index cache {thrashing * 1000:.1f} ms")
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.llm import client
+from app.llm.client import (
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+    RateLimiter,
+    achat_completion,
+    astream_chat_completion,
+    chat_completion,
+    metrics,
+)
+
+MESSAGES = [{"role": "user", "content": "Explain entropy in one line."}]
+
+@pytest.fixture
+def chat_limiter(monkeypatch):
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=100000)
+    monkeypatch.setitem(client._limiters, "chat", limiter)
+    return limiter
+
+def test_waiting_interactive_calls_go_before_bulk_ones():
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=100000)  # One request per 0.1s
+    limiter._requests = 0
+    order = []
+
+    def call(name, priority):
+        limiter.acquire(1, priority)
+        order.append(name)
+
+    bulk = [threading.Thread(target=call, args=(f"bulk{i}", PRIORITY_BULK)) for i in range(2)]
+    for thread in bulk:
+        thread.start()
+    time.sleep(0.02)  # The bulk calls are queued first
+    interactive = threading.Thread(target=call, args=("interactive", PRIORITY_INTERACTIVE))
+    interactive.start()
+    for thread in [*bulk, interactive]:
+        thread.join(5)
+    assert order[0] == "interactive"
+    assert sorted(order[1:]) == ["bulk0", "bulk1"]
+
+def test_requests_are_paced_by_the_request_bucket():
+    limiter = RateLimiter(requests_per_minute=1200, tokens_per_minute=100000)  # One request per 0.05s
+    limiter._requests = 0
+    started = time.monotonic()
+    for _ in range(4):
+        limiter.acquire(1)
+    assert time.monotonic() - started >= 0.15
+
+def test_unused_reserved_tokens_are_returned():
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=1000)
+    limiter.acquire(600)
+    limiter.settle(reserved=600, used=100)
+    assert limiter._tokens == pytest.approx(900, abs=5)
+
+def test_rate_limited_calls_are_retried_and_counted(stub_openai, chat_limiter):
+    stub_openai.fail_first = 2
+    assert chat_completion(MESSAGES, endpoint="test_retry") == "Stub answer."
+    entry = metrics.snapshot()["test_retry"]
+    assert (entry["requests"], entry["retries"], entry["rate_limited"], entry["errors"]) == (1, 2, 2, 0)
+    assert (entry["prompt_tokens"], entry["completion_tokens"]) == (10, 5)
+
+def test_calls_fail_once_retries_are_used_up(stub_openai, chat_limiter):
+    stub_openai.fail_first = 5
+    with pytest.raises(client.openai.RateLimitError):
+        chat_completion(MESSAGES, endpoint="test_give_up", max_retries=1)
+    entry = metrics.snapshot()["test_give_up"]
+    assert (entry["retries"], entry["errors"]) == (1, 1)
+    assert len(stub_openai.requests) == 2
+
+def test_async_calls_use_the_shared_model_setting(stub_openai, chat_limiter):
+    assert asyncio.run(achat_completion(MESSAGES, endpoint="test_async")) == "Stub answer."
+    path, body = stub_openai.requests[0]
+    assert path == "/v1/chat/completions"
+    assert body["model"] == client.settings.LLM_MODEL
+
+def test_streamed_completions_yield_pieces_and_settle_usage(stub_openai, chat_limiter):
+    async def collect():
+        return [piece async for piece in astream_chat_completion(MESSAGES, endpoint="test_stream", max_tokens=500)]
+
+    assert "".join(asyncio.run(collect())) == "piece0 piece1 piece2 piece3 piece4 "
+    assert chat_limiter._tokens == pytest.approx(chat_limiter.token_capacity - 15, abs=5)
+
+def test_a_stream_closed_early_closes_the_upstream_connection(stub_openai, chat_limiter):
+    stub_openai.stream_pieces = 200
+    stub_openai.stream_interval = 0.01
+
+    async def read_one_piece():
+        stream = astream_chat_completion(MESSAGES, endpoint="test_disconnect", max_tokens=500)
+        first = await stream.__anext__()
+        await stream.aclose()  # What the response does when the client disconnects
+        return first
+
+    assert asyncio.run(read_one_piece()) == "piece0 "
+    deadline = time.monotonic() + 3
+    while stub_openai.disconnects == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert stub_openai.disconnects == 1
+    # Reserved: prompt estimate + 500 completion tokens; only the estimated use stays charged
+    assert chat_limiter._tokens >= chat_limiter.token_capacity - 20
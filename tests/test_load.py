@@ -0,0 +1,59 @@
+import asyncio
+import os
+import time
+import httpx
+import pytest
+from fastapi import FastAPI
+from app.core.config import settings
+from app.llm import client
+from app.llm.client import RateLimiter, achat_completion, chat_completion
+
+# Load test for the async request path: N concurrent requests, each waiting on a slow
+# (stubbed) LLM call, against an async handler and against a sync handler like the ones
+# the routers used to have. Sync handlers run in Starlette's threadpool (40 threads), so
+# they finish in about N / 40 rounds of the LLM latency; async handlers hold every request
+# on the event loop and finish in about one (plus the client's own per-request overhead).
+
+CONCURRENT_REQUESTS = 200
+LLM_LATENCY_SECONDS = 1.0
+MESSAGES = [{"role": "user", "content": "Summarise chapter one."}]
+
+def _app():
+    app = FastAPI()
+
+    @app.get("/async")
+    async def async_endpoint():
+        return {"answer": await achat_completion(MESSAGES, endpoint="load_async")}
+
+    @app.get("/sync")
+    def sync_endpoint():
+        return {"answer": chat_completion(MESSAGES, endpoint="load_sync")}
+
+    return app
+
+async def _load(app, path: str) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as http:
+        started = time.monotonic()
+        responses = await asyncio.gather(*(http.get(path) for _ in range(CONCURRENT_REQUESTS)))
+        elapsed = time.monotonic() - started
+    assert all(response.status_code == 200 for response in responses)
+    return elapsed
+
+@pytest.fixture
+def slow_llm(stub_openai, monkeypatch):
+    stub_openai.latency = LLM_LATENCY_SECONDS
+    monkeypatch.setattr(settings, "LLM_MAX_CONNECTIONS", CONCURRENT_REQUESTS)
+    monkeypatch.setitem(client._limiters, "chat", RateLimiter(100000, 100000000))
+    return stub_openai
+
+@pytest.mark.skipif(not os.getenv("RUN_LOAD_TESTS"), reason="set RUN_LOAD_TESTS=1 to run")
+def test_async_handlers_hold_hundreds_of_concurrent_llm_calls(slow_llm):
+    app = _app()
+    async_seconds = asyncio.run(_load(app, "/async"))
+    sync_seconds = asyncio.run(_load(app, "/sync"))
+
+    thread_bound = CONCURRENT_REQUESTS / 40 * LLM_LATENCY_SECONDS
+    assert slow_llm.max_in_flight == CONCURRENT_REQUESTS  # Reached during the async run
+    assert async_seconds < thread_bound / 2
+    assert sync_seconds >= thread_bound * 0.9
@@ -0,0 +1,57 @@
+import time
+from types import SimpleNamespace
+import pytest
+from app.core import model_registry as registry_module
+from app.core.model_registry import ModelRegistry
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(registry_module, "time", SimpleNamespace(monotonic=clock, perf_counter=time.perf_counter))
+    return clock
+
+@pytest.fixture
+def registry():
+    registry = ModelRegistry(idle_ttl_seconds=60)
+    loads = []
+    registry.register("model", lambda: loads.append(1) or object())
+    registry.loads = loads
+    return registry
+
+def test_models_are_loaded_once_on_first_use(registry):
+    first = registry.get("model")
+    assert registry.get("model") is first
+    assert len(registry.loads) == 1
+    assert registry.stats()["model"]["uses"] == 2
+
+def test_unknown_models_are_an_error(registry):
+    with pytest.raises(RuntimeError):
+        registry.get("missing")
+
+def test_idle_models_are_evicted_and_reloaded(registry, clock):
+    registry.get("model")
+    clock.now += 61
+    assert registry.evict_idle() == ["model"]
+    assert not registry.stats()["model"]["loaded"]
+    registry.get("model")
+    assert len(registry.loads) == 2
+
+def test_warmed_up_models_are_evicted_when_idle(registry, clock):
+    registry.warm_up()
+    clock.now += 30
+    assert registry.evict_idle() == []
+    clock.now += 31
+    assert registry.evict_idle() == ["model"]
+
+def test_borrowed_models_are_not_evicted(registry, clock):
+    with registry.use("model"):
+        clock.now += 61
+        assert registry.evict_idle() == []
+    assert registry.stats()["model"]["loaded"]
@@ -0,0 +1,69 @@
+import threading
+import time
+import fitz
+from app.core.config import settings
+from app.core.model_registry import ModelRegistry
+from app.db.crud import pdf_crud
+from app.db.crud.pdf_crud import PARALLEL_MIN_PAGES, extract_pages_with_pypdf, needs_ocr, ocr_missing_pages
+
+def _write_pdf(path, pages):
+    document = fitz.open()
+    for text in pages:
+        document.new_page().insert_text((72, 72), text)
+    document.save(str(path))
+    document.close()
+
+def test_large_documents_are_extracted_in_page_order_across_the_process_pool(tmp_path):
+    pages = [f"Page number {i}" for i in range(PARALLEL_MIN_PAGES + 15)]
+    _write_pdf(tmp_path / "book.pdf", pages)
+    try:
+        extracted = extract_pages_with_pypdf(str(tmp_path / "book.pdf"))
+        assert pdf_crud._extraction_pool is not None
+    finally:
+        pdf_crud.shutdown_extraction_pool()
+    assert [page.strip() for page in extracted] == pages
+
+def test_small_documents_are_extracted_in_process(tmp_path):
+    _write_pdf(tmp_path / "short.pdf", ["Only page"])
+    assert [page.strip() for page in extract_pages_with_pypdf(str(tmp_path / "short.pdf"))] == ["Only page"]
+    assert pdf_crud._extraction_pool is None
+
+def test_pages_without_a_usable_text_layer_need_ocr():
+    assert needs_ocr("")
+    assert needs_ocr("   \n 12 ")
+    assert needs_ocr("□■□■□■□■□■□■□■□■□■□■ ok")
+    assert not needs_ocr("An ordinary page of text, with punctuation (and numbers: 42).")
+
+class SerialCheckingReader:
+    """Stand-in for an EasyOCR reader that records whether readtext was ever entered concurrently."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.overlapped = False
+        self.shapes = []
+
+    def readtext(self, image, detail=0, paragraph=True):
+        with self.lock:
+            self.running += 1
+            self.overlapped |= self.running > 1
+            self.shapes.append(image.shape)
+        time.sleep(0.02)
+        with self.lock:
+            self.running -= 1
+        return [f"ocr {image.shape[0]}"]
+
+def test_pages_are_ocrd_concurrently_without_sharing_the_reader_between_threads(tmp_path, monkeypatch):
+    _write_pdf(tmp_path / "scanned.pdf", [""] * 6 + ["This page has a perfectly readable text layer."])
+    reader = SerialCheckingReader()
+    registry = ModelRegistry()
+    registry.register("easyocr", lambda: reader)
+    monkeypatch.setattr(pdf_crud, "model_registry", registry)
+    monkeypatch.setattr(settings, "OCR_WORKERS", 4)
+
+    pages = ocr_missing_pages(str(tmp_path / "scanned.pdf"), ["", "", "", "", "", "", "kept text layer " * 3])
+
+    assert len(reader.shapes) == 6
+    assert not reader.overlapped
+    assert all(page.startswith("ocr ") for page in pages[:6])
+    assert pages[6] == "kept text layer " * 3
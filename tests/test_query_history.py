@@ -0,0 +1,78 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+import httpx
+import pytest
+from app.auth.auth import create_access_token
+from app.core.database import SessionLocal
+from app.db.crud.question_answering_crud import decode_history_cursor, encode_history_cursor
+from app.models.history import QueryHistory
+from app.models.user import User
+
+def test_a_cursor_decodes_to_the_row_it_was_made_from():
+    row = QueryHistory(id=42, created_at=datetime(2024, 5, 1, 12, 30, 15, 123456))
+    assert decode_history_cursor(encode_history_cursor(row)) == (row.created_at, 42)
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "bm8tc2VwYXJhdG9y", "MjAyNC0wMS0wMXxhYmM="])
+def test_malformed_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_history_cursor(cursor)
+
+@pytest.fixture
+def history():
+    """A user with 7 history rows, two of them sharing a timestamp; yields (token, queries newest first)."""
+    from main import app
+    db = SessionLocal()
+    user = User(username="history-reader", password_hash="unused", role="user")
+    db.add(user)
+    db.commit()
+    base = datetime(2024, 1, 1)
+    times = [base + timedelta(minutes=i) for i in (0, 1, 2, 3, 3, 4, 5)]
+    rows = [QueryHistory(user_id=user.id, query=f"q{i}", response=f"a{i}", created_at=t) for i, t in enumerate(times)]
+    db.add_all(rows)
+    db.commit()
+    newest_first = [row.query for row in sorted(rows, key=lambda row: (row.created_at, row.id), reverse=True)]
+    yield app, create_access_token({"sub": str(user.id)}), newest_first
+    db.query(QueryHistory).filter(QueryHistory.user_id == user.id).delete()
+    db.delete(user)
+    db.commit()
+    db.close()
+
+async def _pages(app, token, limit):
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": f"Bearer {token}"}
+    pages, cursor = [], None
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as http:
+        while True:
+            params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+            response = await http.get("/api/qa/history", params=params)
+            if response.status_code != 200:
+                return response
+            pages.append([json.loads(line)["query"] for line in response.text.splitlines()])
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                return pages
+
+def test_paging_with_cursors_returns_every_row_once_newest_first(history):
+    app, token, newest_first = history
+    pages = asyncio.run(_pages(app, token, limit=3))
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [query for page in pages for query in page] == newest_first
+
+@pytest.mark.parametrize("limit", [0, 201])
+def test_a_limit_out_of_range_is_a_validation_error(history, limit):
+    app, token, _ = history
+    assert asyncio.run(_pages(app, token, limit)).status_code == 422
+
+def test_a_malformed_cursor_is_a_bad_request(history):
+    app, token, _ = history
+
+    async def fetch():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.get("/api/qa/history", params={"cursor": "garbage"},
+                                  headers={"Authorization": f"Bearer {token}"})
+
+    response = asyncio.run(fetch())
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid history cursor."
@@ -0,0 +1,50 @@
+import asyncio
+import httpx
+import pytest
+from app.api import question_answering
+from app.auth.auth import create_access_token
+from app.core.database import SessionLocal
+from app.models.book import Book
+from app.models.user import User
+
+@pytest.fixture
+def asker():
+    from main import app
+    db = SessionLocal()
+    user = User(username="qa-asker", password_hash="unused")
+    db.add(user)
+    db.commit()
+    db.add(Book(filename="qa-asker.pdf", text_content="The mitochondria is the powerhouse of the cell.", user_id=user.id))
+    db.commit()
+    yield app, create_access_token({"sub": str(user.id)})
+    db.query(Book).filter(Book.user_id == user.id).delete()
+    db.delete(user)
+    db.commit()
+    db.close()
+
+def _ask(app, token):
+    async def ask():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.post("/api/qa/ask", json={"question": "What is the mitochondria?"},
+                                   headers={"Authorization": f"Bearer {token}"})
+    return asyncio.run(ask())
+
+def test_answers_from_passages_do_not_load_the_book_text(stub_openai, word_encoding, asker, monkeypatch):
+    app, token = asker
+    monkeypatch.setattr(question_answering, "search_book", lambda book, question, top_k: ["Retrieved passage."])
+
+    async def no_text(db, book_id):
+        raise AssertionError("the book text was loaded")
+
+    monkeypatch.setattr(question_answering, "aget_book_text", no_text)
+    response = _ask(app, token)
+    assert response.status_code == 200
+    prompt = stub_openai.requests[0][1]["messages"][-1]["content"]
+    assert "Retrieved passage." in prompt and "powerhouse" not in prompt
+
+def test_a_book_without_passages_falls_back_to_its_text(stub_openai, word_encoding, asker):
+    app, token = asker
+    response = _ask(app, token)
+    assert response.status_code == 200
+    assert "powerhouse of the cell" in stub_openai.requests[0][1]["messages"][-1]["content"]
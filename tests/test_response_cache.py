@@ -0,0 +1,52 @@
+import pytest
+from app.llm import response_cache
+from app.llm.response_cache import ResponseCache, response_key
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "llm_responses.sqlite3")
+
+def _key(i):
+    return response_key("gpt-4o", [{"role": "user", "content": f"question {i}"}], {})
+
+def test_exact_and_similar_lookups(path):
+    cache = ResponseCache(path, max_entries=10)
+    cache.put(_key(1), "qa", "answer 1", book_id=7, vector=[1.0, 0.0])
+    assert cache.get(_key(1)) == "answer 1"
+    assert cache.get(_key(2)) is None
+    assert cache.find_similar("qa", [0.99, 0.05], threshold=0.95) == "answer 1"
+    assert cache.find_similar("qa", [0.0, 1.0], threshold=0.95) is None
+    assert cache.find_similar("quiz", [1.0, 0.0], threshold=0.95) is None
+
+def test_entries_expire_after_the_ttl(path, monkeypatch):
+    cache = ResponseCache(path, max_entries=10, ttl_seconds=60)
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    cache.put(_key(1), "qa", "answer 1")
+    now[0] += 61
+    assert cache.get(_key(1)) is None
+
+def test_replacing_an_entry_does_not_grow_the_cache(path):
+    cache = ResponseCache(path, max_entries=10)
+    cache.put(_key(1), "qa", "first")
+    cache.put(_key(1), "qa", "second")
+    assert len(cache) == 1
+    assert cache.get(_key(1)) == "second"
+
+def test_the_entry_limit_holds_across_processes_sharing_the_file(path):
+    first, second = ResponseCache(path, max_entries=3), ResponseCache(path, max_entries=3)
+    first.put(_key(1), "qa", "1")
+    first.put(_key(2), "qa", "2")
+    second.put(_key(3), "qa", "3")
+    second.put(_key(4), "qa", "4")
+    first.put(_key(5), "qa", "5")
+    assert len(first) == len(second) == 3
+    assert first.get(_key(1)) is None and first.get(_key(5)) == "5"
+
+def test_invalidating_a_book_drops_only_its_entries(path):
+    cache = ResponseCache(path, max_entries=10)
+    cache.put(_key(1), "qa", "1", book_id=1)
+    cache.put(_key(2), "qa", "2", book_id=1)
+    cache.put(_key(3), "qa", "3", book_id=2)
+    assert cache.invalidate_book(1) == 2
+    assert len(cache) == 1
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import httpx
+import pytest
+from app.auth.auth import create_access_token
+from app.core.database import SessionLocal
+from app.llm.syllabus_llm import generate_syllabus_summary, parse_batch_summaries
+from app.models.book import Book
+from app.models.user import User
+
+TOPICS = ["Thermodynamics", "Optics", "Waves"]
+
+def test_summaries_are_matched_by_topic_name():
+    content = json.dumps({"summaries": [
+        {"topic": "waves ", "summary": "About waves."},
+        {"topic": "Thermodynamics", "summary": " About heat. "},
+        {"topic": "Optics", "summary": "About light."},
+    ]})
+    assert parse_batch_summaries(content, TOPICS) == ["About heat.", "About light.", "About waves."]
+
+def test_unnamed_summaries_fall_back_to_position_when_all_are_present():
+    content = json.dumps({"summaries": [{"summary": "One."}, {"summary": "Two."}, {"summary": "Three."}]})
+    assert parse_batch_summaries(content, TOPICS) == ["One.", "Two.", "Three."]
+
+def test_missing_or_empty_summaries_are_none():
+    content = json.dumps({"summaries": [
+        {"topic": "Optics", "summary": "About light."},
+        {"topic": "Waves", "summary": ""},
+    ]})
+    assert parse_batch_summaries(content, TOPICS) == [None, "About light.", None]
+
+def test_unparseable_replies_give_no_summaries():
+    assert parse_batch_summaries("not json", TOPICS) == [None, None, None]
+    assert parse_batch_summaries("[1, 2]", TOPICS) == [None, None, None]
+
+def test_batched_mode_retries_topics_missing_from_the_reply(stub_openai, word_encoding):
+    stub_openai.reply = json.dumps({"summaries": [
+        {"topic": "Thermodynamics", "summary": "About heat."},
+        {"topic": "Optics", "summary": "About light."},
+    ]})
+    summaries = asyncio.run(generate_syllabus_summary("Some book text.", TOPICS, "short", mode="batched"))
+    assert [entry["topic"] for entry in summaries] == TOPICS
+    assert [entry["summary"] for entry in summaries[:2]] == ["About heat.", "About light."]
+    assert summaries[2]["summary"] == stub_openai.reply  # The single-topic retry's reply
+    assert len(stub_openai.requests) == 2
+
+@pytest.fixture
+def reader():
+    """A user with one book (no embeddings, so summaries use the start of the book); yields (app, token)."""
+    from main import app
+    db = SessionLocal()
+    user = User(username="syllabus-reader", password_hash="unused")
+    db.add(user)
+    db.commit()
+    db.add(Book(filename="syllabus-reader.pdf", text_content="Heat flows from hot to cold.", user_id=user.id))
+    db.commit()
+    yield app, create_access_token({"sub": str(user.id)})
+    db.query(Book).filter(Book.user_id == user.id).delete()
+    db.delete(user)
+    db.commit()
+    db.close()
+
+async def _stream(app, token, body):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return await http.post("/api/syllabus/summarize/stream", json=body,
+                               headers={"Authorization": f"Bearer {token}"})
+
+def _events(response):
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines.get("event", "message"), json.loads(lines["data"])))
+    return events
+
+def test_a_repeated_topic_is_streamed_and_summarised_separately(stub_openai, word_encoding, reader):
+    app, token = reader
+    response = asyncio.run(_stream(app, token, {"topics": ["Heat", "Heat"], "summary_type": "short"}))
+    events = _events(response)
+    deltas = [data for event, data in events if event == "message"]
+    assert [data["index"] for data in deltas] == [0] * 5 + [1] * 5
+    assert all(data["topic"] == "Heat" for data in deltas)
+    event, done = events[-1]
+    assert event == "done"
+    assert done["summaries"] == [{"topic": "Heat", "summary": "piece0 piece1 piece2 piece3 piece4"}] * 2
+
+@pytest.mark.parametrize("mode", ["batched", "sideways"])
+def test_streaming_rejects_modes_it_does_not_support(stub_openai, reader, mode):
+    app, token = reader
+    response = asyncio.run(_stream(app, token, {"topics": ["Heat"], "summary_type": "short", "mode": mode}))
+    assert response.status_code == 400
+    assert stub_openai.requests == []